@@ -0,0 +1,45 @@
+"""
+_stubs.py — Doublures partagées par les benchmarks
+
+pjsua2 n'est pas nécessaire pour mesurer le code Python du bridge : un module
+minimal suffit à définir et instancier _AudioPort / _SipCallHandler.
+À installer AVANT d'importer sipbridge.
+"""
+
+import sys
+import types
+
+def install_pjsua2_stub():
+    """Module pjsua2 minimal : de quoi définir et instancier les handlers."""
+    if "sipbridge" in sys.modules:
+        raise RuntimeError("sipbridge déjà importé : installer le stub avant")
+    pj = types.ModuleType("pjsua2")
+
+    class _Base:
+        def __init__(self, *args, **kwargs):
+            pass
+
+    pj.AudioMediaPort = type("AudioMediaPort", (_Base,), {})
+    pj.Call = type("Call", (_Base,), {})
+    pj.Account = type("Account", (_Base,), {})
+    pj.PJSUA_INVALID_ID = -1
+    pj.PJMEDIA_FRAME_TYPE_AUDIO = 1
+    pj.__getattr__ = lambda name: type(name, (_Base,), {})
+    sys.modules["pjsua2"] = pj
+
+
+class ByteVector(list):
+    """pj.ByteVector : liste d'octets redimensionnable."""
+
+    def resize(self, n: int):
+        del self[n:]
+        self.extend([0] * (n - len(self)))
+
+
+class MediaFrame:
+    """pj.MediaFrame minimal pour onFrameReceived / onFrameRequested."""
+
+    def __init__(self, pcm: bytes = b""):
+        self.buf = ByteVector(pcm)
+        self.size = len(pcm)
+        self.type = 1
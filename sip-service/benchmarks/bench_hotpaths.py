@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+bench_hotpaths.py — Micro-benchmarks des chemins par frame du bridge
+
+Cas mesurés (pjsua2 remplacé par un stub, voir _stubs.py) :
+  codec.*      pcm16_to_ulaw / ulaw_to_pcm16 — audioop, et le fallback
+               Python pur dans un sous-process où audioop est masqué
+  ws_codec.*   _WsAudioCodec hors µ-law 8k (--ws-audio-format) : L16 24kHz
+               (rééchantillonnage 8k↔24k) et A-law, une frame de 20ms
+  envelope     _WsSession._media_message : µ-law + base64 + JSON d'une frame
+  ws_to_sip    _WsSession._ws_to_sip : parsing d'un message reçu (media
+               décodé + feed_audio, marks, clear) par un faux WebSocket
+  port.*       _AudioPort : feed_audio, onFrameRequested, onFrameReceived +
+               get_frames, cycle queue_mark / get_ready_marks
+  numbers.*    _normalize_number, _SipCallHandler._parse_caller
+
+Pour chaque cas : --repeat séries de N appels, on garde le meilleur et la
+médiane en µs par opération. Seuils (µs/op, médiane) dans thresholds.json ;
+--baseline compare à un rapport JSON précédent (--max-regression en %).
+Code de sortie 1 si un seuil ou la régression max est dépassé.
+
+Usage :
+    python benchmarks/bench_hotpaths.py
+    python benchmarks/bench_hotpaths.py --json > hotpaths.json
+    python benchmarks/bench_hotpaths.py --baseline hotpaths.json --max-regression 15
+    python benchmarks/bench_hotpaths.py --cases codec,envelope
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from _stubs import MediaFrame, install_pjsua2_stub
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_THRESHOLDS = os.path.join(BENCH_DIR, "thresholds.json")
+
+
+def _measure(fn, number: int, repeat: int) -> dict:
+    """fn(number) exécute number opérations ; renvoie µs/op (meilleur, médiane)."""
+    fn(max(1, number // 10))   # pré-chauffe
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        fn(number)
+        samples.append((time.perf_counter_ns() - t0) / number / 1000)
+    return {
+        "best_us": round(min(samples), 3),
+        "median_us": round(statistics.median(samples), 3),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+# ── Cas ───────────────────────────────────────────────────
+
+def _codec_cases(sb, prefix: str) -> dict:
+    pcm = bytes(range(256)) * 2 + bytes(range(64))       # 320 octets = 20ms à 8kHz
+    ulaw = sb.pcm16_to_ulaw(pcm)
+
+    def encode(n):
+        for _ in range(n):
+            sb.pcm16_to_ulaw(pcm)
+
+    def decode(n):
+        for _ in range(n):
+            sb.ulaw_to_pcm16(ulaw)
+
+    return {f"{prefix}.encode": encode, f"{prefix}.decode": decode}
+
+
+def _ws_codec_cases(sb) -> dict:
+    pcm = bytes(range(256)) * 2 + bytes(range(64))       # 20ms à 8kHz
+    l16 = sb._WsAudioCodec(sb._WsAudioFormat.parse("audio/l16;24000"), 8000)
+    alaw = sb._WsAudioCodec(sb._WsAudioFormat.parse("audio/x-alaw;8000"), 8000)
+    l16_payload = l16.encode(pcm)                        # 960 octets = 20ms à 24kHz
+    alaw_payload = alaw.encode(pcm)
+
+    def l16_encode(n):
+        for _ in range(n):
+            l16.encode(pcm)
+
+    def l16_decode(n):
+        for _ in range(n):
+            l16.decode(l16_payload)
+
+    def alaw_encode(n):
+        for _ in range(n):
+            alaw.encode(pcm)
+
+    def alaw_decode(n):
+        for _ in range(n):
+            alaw.decode(alaw_payload)
+
+    return {
+        "ws_codec.l16_24k_encode": l16_encode,
+        "ws_codec.l16_24k_decode": l16_decode,
+        "ws_codec.alaw_encode": alaw_encode,
+        "ws_codec.alaw_decode": alaw_decode,
+    }
+
+
+def _session(sb, bridge):
+    return sb._WsSession(
+        bridge, "bench0000-0000", "+33612345678", "+33491234567",
+        sb.CallDirection.INBOUND, {"restaurantId": "bench"}, "",
+        bridge.config.audio,
+    )
+
+
+def _envelope_cases(sb, bridge) -> dict:
+    session = _session(sb, bridge)
+    pcm = b"\x01\x02" * bridge.config.audio.samples_per_frame
+
+    def envelope(n):
+        for _ in range(n):
+            session._media_message(pcm)
+
+    return {"envelope": envelope}
+
+
+class _ReplayWs:
+    """Faux WebSocket : itère sur des messages pré-encodés, absorbe les envois."""
+
+    def __init__(self, messages: list[str]):
+        self._messages = messages
+        self.close_code = 1000
+
+    def __aiter__(self):
+        return self._gen()
+
+    async def _gen(self):
+        for msg in self._messages:
+            yield msg
+
+    async def send(self, msg):
+        pass
+
+
+def _ws_to_sip_cases(sb, bridge) -> dict:
+    audio_cfg = bridge.config.audio
+    payload = base64.b64encode(sb.pcm16_to_ulaw(b"\x01\x02" * audio_cfg.samples_per_frame)).decode()
+    media = json.dumps({"event": "media", "streamSid": "bench", "media": {"payload": payload}})
+    # Réponse IA typique : des frames, une mark par segment, un clear de temps en temps
+    pattern = [media] * 48 + [json.dumps({"event": "mark", "streamSid": "bench", "mark": {"name": "seg"}}),
+                              json.dumps({"event": "clear", "streamSid": "bench"})]
+
+    def ws_to_sip(n):
+        session = _session(sb, bridge)
+        session.audio_port = sb._AudioPort("bench0000-0000", audio_cfg)
+        session._connected = True
+        messages = (pattern * (n // len(pattern) + 1))[:n]
+        asyncio.run(session._ws_to_sip(_ReplayWs(messages)))
+
+    return {"ws_to_sip": ws_to_sip}
+
+
+def _port_cases(sb, bridge) -> dict:
+    audio_cfg = bridge.config.audio
+    pcm = b"\x01\x02" * audio_cfg.samples_per_frame
+
+    def feed(n):
+        port = sb._AudioPort("bench0000-0000", audio_cfg)
+        for _ in range(n):
+            port.feed_audio(pcm)
+
+    def frame_requested(n):
+        port = sb._AudioPort("bench0000-0000", audio_cfg)
+        port.feed_audio(pcm * n)
+        frame = MediaFrame()
+        for _ in range(n):
+            port.onFrameRequested(frame)
+
+    def frame_received(n):
+        port = sb._AudioPort("bench0000-0000", audio_cfg)
+        frame = MediaFrame(pcm)
+        for _ in range(n):
+            port.onFrameReceived(frame)
+            port.get_frames()
+
+    def marks(n):
+        # Une mark par frame jouée, relevée comme dans _sip_to_ws
+        port = sb._AudioPort("bench0000-0000", audio_cfg)
+        frame = MediaFrame()
+        for _ in range(n):
+            port.feed_audio(pcm)
+            port.queue_mark("seg")
+            port.onFrameRequested(frame)
+            port.get_ready_marks()
+
+    return {
+        "port.feed_audio": feed,
+        "port.on_frame_requested": frame_requested,
+        "port.on_frame_received": frame_received,
+        "port.mark_cycle": marks,
+    }
+
+
+def _number_cases(sb) -> dict:
+    numbers = ["+33612345678", "0033612345678", "0612345678", "612345678"]
+    uris = ['"Client" <sip:0612345678@sip.example.com>', "<sip:+33491234567@10.0.0.1:5060>", "sip:anonymous@x"]
+
+    def normalize(n):
+        for i in range(n):
+            sb._normalize_number(numbers[i & 3])
+
+    def parse_caller(n):
+        for i in range(n):
+            sb._SipCallHandler._parse_caller(uris[i % 3])
+
+    return {"numbers.normalize": normalize, "numbers.parse_caller": parse_caller}
+
+
+# Nombre d'opérations par série, selon le coût du cas
+_NUMBER = {
+    "codec_fallback": 200,
+    "ws_codec.l16_24k_encode": 5000,
+    "ws_codec.l16_24k_decode": 5000,
+    "ws_to_sip": 2000,
+    "port.on_frame_requested": 2000,
+    "port.mark_cycle": 2000,
+}
+
+
+def run_cases(selected: list[str], repeat: int, codec: str) -> dict:
+    if codec == "fallback":
+        sys.modules["audioop"] = None     # ImportError → fallback Python pur
+    install_pjsua2_stub()
+    sys.path.insert(0, SERVICE_DIR)
+    import logging
+    import sipbridge as sb
+    logging.getLogger("sip-bridge").setLevel(logging.WARNING)
+
+    bridge = sb.SipBridge(sb.BridgeConfig(sip=sb.SipConfig(username="+33491234567")))
+    cases = {}
+    if codec == "fallback":
+        cases.update(_codec_cases(sb, "codec_fallback"))
+    else:
+        cases.update(_codec_cases(sb, "codec_audioop"))
+        cases.update(_ws_codec_cases(sb))
+        cases.update(_envelope_cases(sb, bridge))
+        cases.update(_ws_to_sip_cases(sb, bridge))
+        cases.update(_port_cases(sb, bridge))
+        cases.update(_number_cases(sb))
+
+    results = {}
+    for name, fn in cases.items():
+        if selected and not any(name.startswith(s) for s in selected):
+            continue
+        number = _NUMBER.get(name, _NUMBER.get(name.split(".")[0], 20000))
+        results[name] = _measure(fn, number, repeat)
+    return results
+
+
+def _check(results: dict, thresholds: dict, baseline: dict, max_regression: float) -> list[str]:
+    failures = []
+    for name, r in results.items():
+        limit = thresholds.get(name)
+        if limit is not None and r["median_us"] > limit:
+            failures.append(f"{name}: {r['median_us']} µs/op > seuil {limit} µs/op")
+        base = baseline.get(name)
+        if base and max_regression > 0:
+            ratio = r["median_us"] / base["median_us"] - 1
+            if ratio * 100 > max_regression:
+                failures.append(f"{name}: +{ratio * 100:.1f}% vs baseline ({base['median_us']} → {r['median_us']} µs/op)")
+    return failures
+
+
+def main():
+    p = argparse.ArgumentParser(description="Micro-benchmarks des chemins par frame du bridge")
+    p.add_argument("--cases", default="", help="Préfixes des cas à lancer, séparés par des virgules (défaut: tous)")
+    p.add_argument("--repeat", type=int, default=7, help="Séries par cas (défaut: 7)")
+    p.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="Seuils µs/op (défaut: benchmarks/thresholds.json)")
+    p.add_argument("--baseline", default="", help="Rapport JSON précédent à comparer")
+    p.add_argument("--max-regression", type=float, default=20.0, help="Régression max vs baseline en %% (défaut: 20)")
+    p.add_argument("--no-fallback", action="store_true", help="Ne pas mesurer le codec fallback (sous-process)")
+    p.add_argument("--json", action="store_true", help="Sortie JSON")
+    p.add_argument("--worker", choices=["audioop", "fallback"], help=argparse.SUPPRESS)
+    args = p.parse_args()
+    selected = [c for c in args.cases.split(",") if c]
+
+    if args.worker:
+        print(json.dumps(run_cases(selected, args.repeat, args.worker)))
+        return
+
+    results = {}
+    workers = ["audioop"] if args.no_fallback else ["audioop", "fallback"]
+    for codec in workers:
+        # Un process par variante : le choix du codec se fait à l'import
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", codec,
+             "--repeat", str(args.repeat), "--cases", args.cases],
+            cwd=SERVICE_DIR, capture_output=True, text=True, check=True,
+        )
+        results.update(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    thresholds = {}
+    if args.thresholds and os.path.exists(args.thresholds):
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("results", {})
+    failures = _check(results, thresholds, baseline, args.max_regression)
+
+    report = {
+        "benchmark": "hotpaths",
+        "python": sys.version.split()[0],
+        "results": results,
+        "thresholds": thresholds,
+        "failures": failures,
+        "passed": not failures,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'cas':28s} {'médiane':>10s} {'meilleur':>10s} {'seuil':>9s}")
+        for name, r in results.items():
+            limit = thresholds.get(name)
+            print(f"{name:28s} {r['median_us']:7.2f} µs {r['best_us']:7.2f} µs "
+                  f"{(f'{limit:g} µs') if limit is not None else '—':>9s}")
+        for failure in failures:
+            print(f"RÉGRESSION {failure}")
+        print("OK" if report["passed"] else f"{len(failures)} régression(s)")
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+bench_ipc.py — Coût CPU par frame : WebSocket loopback vs socket Unix
+
+Un serveur média d'écho tourne dans un process séparé (ws:// ou unix://).
+Côté bridge, on passe par _open_media_stream (le même code que _WsSession) :
+chaque frame de 20ms est encodée comme dans _sip_to_ws (µ-law + base64 +
+JSON), envoyée, puis l'écho est relu et décodé comme dans _ws_to_sip.
+
+On mesure le CPU du process bridge (time.process_time) par frame aller-retour —
+le serveur n'est pas compté — et le débit.
+
+Usage :
+    python benchmarks/bench_ipc.py
+    python benchmarks/bench_ipc.py --frames 20000 --json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+_HEADER = struct.Struct(">I")
+
+
+# ── Serveur d'écho (sous-process) ─────────────────────────
+
+async def _serve_unix(path: str):
+    async def handle(reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(_HEADER.size)
+                data = await reader.readexactly(_HEADER.unpack(header)[0])
+                writer.write(header + data)
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()
+
+    server = await asyncio.start_unix_server(handle, path=path)
+    print("ready", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+async def _serve_ws(port: int):
+    import websockets
+
+    async def handle(ws):
+        async for msg in ws:
+            await ws.send(msg)
+
+    async with websockets.serve(handle, "127.0.0.1", port):
+        print("ready", flush=True)
+        await asyncio.Future()
+
+
+# ── Client (process bridge) ───────────────────────────────
+
+async def _client(target: str, frames: int) -> dict:
+    from sipbridge import _open_media_stream, pcm16_to_ulaw, ulaw_to_pcm16
+
+    pcm = bytes(320)
+    async with _open_media_stream(target) as ws:
+        it = ws.__aiter__()
+        # Pré-chauffe (connexion, imports, caches)
+        for _ in range(100):
+            await ws.send(json.dumps({"event": "media", "media": {"payload": "", "timestamp": 0}}))
+            await it.__anext__()
+
+        cpu0, wall0 = time.process_time(), time.perf_counter()
+        for ts in range(frames):
+            payload = base64.b64encode(pcm16_to_ulaw(pcm)).decode("ascii")
+            await ws.send(json.dumps({"event": "media", "media": {"payload": payload, "timestamp": ts * 20}}))
+            raw = await it.__anext__()
+            data = json.loads(raw)
+            ulaw_to_pcm16(base64.b64decode(data["media"]["payload"]))
+        cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+
+    return {
+        "frames": frames,
+        "cpu_us_per_frame": round(cpu / frames * 1e6, 2),
+        "wall_us_per_frame": round(wall / frames * 1e6, 2),
+        "frames_per_sec": round(frames / wall),
+    }
+
+
+def _run_transport(kind: str, frames: int, port: int) -> dict:
+    tmpdir = tempfile.mkdtemp(prefix="bench-ipc-")
+    if kind == "unix":
+        path = os.path.join(tmpdir, "media.sock")
+        target, serve_args = f"unix://{path}", ["--serve", "unix", "--path", path]
+    else:
+        target, serve_args = f"ws://127.0.0.1:{port}/media-stream", ["--serve", "ws", "--port", str(port)]
+
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), *serve_args],
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        server.stdout.readline()  # "ready"
+        result = asyncio.run(_client(target, frames))
+    finally:
+        server.terminate()
+        server.wait(timeout=5)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return {"transport": kind, "target": target, **result}
+
+
+def main():
+    p = argparse.ArgumentParser(description="Coût par frame : WebSocket loopback vs socket Unix")
+    p.add_argument("--frames", type=int, default=10000, help="Frames aller-retour par transport (défaut: 10000)")
+    p.add_argument("--port", type=int, default=5970, help="Port du serveur WebSocket (défaut: 5970)")
+    p.add_argument("--json", action="store_true", help="Sortie JSON")
+    p.add_argument("--serve", choices=["ws", "unix"], help=argparse.SUPPRESS)
+    p.add_argument("--path", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.serve == "unix":
+        asyncio.run(_serve_unix(args.path))
+        return
+    if args.serve == "ws":
+        asyncio.run(_serve_ws(args.port))
+        return
+
+    results = [_run_transport(kind, args.frames, args.port) for kind in ("ws", "unix")]
+    ws, unix = results
+    saved = ws["cpu_us_per_frame"] - unix["cpu_us_per_frame"]
+    report = {
+        "benchmark": "ipc",
+        "python": sys.version.split()[0],
+        "results": results,
+        "cpu_us_saved_per_frame": round(saved, 2),
+        "cpu_saved_pct": round(saved / ws["cpu_us_per_frame"] * 100, 1) if ws["cpu_us_per_frame"] else 0.0,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for r in results:
+        print(f"{r['transport']:5s} {r['cpu_us_per_frame']:8.2f} µs CPU/frame  "
+              f"{r['wall_us_per_frame']:8.2f} µs wall/frame  {r['frames_per_sec']:7d} frames/s")
+    print(f"unix:// économise {report['cpu_us_saved_per_frame']} µs CPU par frame aller-retour "
+          f"({report['cpu_saved_pct']}%)")
+
+
+if __name__ == "__main__":
+    main()
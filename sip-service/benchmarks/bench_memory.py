@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+bench_memory.py — Mémoire par appel du SIP Bridge
+
+pjsua2 est remplacé par un stub (classes de base vides) : on mesure l'état
+Python que le bridge alloue par appel, pas les buffers C de pjsip.
+
+Pour N appels simulés (process neuf par N) :
+  - CallRecord + _SipCallHandler + _AudioPort + _WsSession, comme dans
+    onIncomingCall / onCallMediaState ;
+  - un état "en régime" : --tx-buffer-ms d'audio IA en attente de lecture,
+    quelques frames client en attente, une mark en cours.
+
+On mesure la RSS du process et les allocations Python (tracemalloc) avant /
+après, rapportées par appel. Code de sortie 1 si les allocations par appel
+dépassent --max-kb-per-call (seuil de régression).
+
+Usage :
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --calls 10,100,500 --json
+    python benchmarks/bench_memory.py --max-kb-per-call 30
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from _stubs import MediaFrame, install_pjsua2_stub
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _rss_kb() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_worker(calls: int, tx_buffer_ms: int) -> dict:
+    import gc
+    import logging
+    import tracemalloc
+    from datetime import datetime, timezone
+
+    install_pjsua2_stub()
+    import sipbridge as sb
+    logging.getLogger("sip-bridge").setLevel(logging.WARNING)
+
+    bridge = sb.SipBridge(sb.BridgeConfig(custom_params={"restaurantId": "bench"}))
+    audio_cfg = bridge.config.audio
+    frame = b"\x01\x02" * audio_cfg.samples_per_frame
+    ulaw_frame = sb.pcm16_to_ulaw(frame)
+
+    def make_call(i: int):
+        handler = sb._SipCallHandler(bridge, None, sb.CallDirection.INBOUND)
+        sid = handler.call_sid
+        record = sb.CallRecord(
+            sid=sid,
+            direction=sb.CallDirection.INBOUND,
+            from_number=f"06{i:08d}",
+            to_number="+33491234567",
+            status=sb.CallStatus.ACTIVE,
+            created_at=datetime.now(timezone.utc).isoformat(),
+            custom_params=dict(handler.custom_params),
+            ws_target=handler.ws_target or bridge.default_ws_target,
+            _call_ref=handler,
+        )
+        bridge.active_calls[sid] = record
+        port = sb._AudioPort(sid, audio_cfg)
+        handler.audio_port = port
+        handler.session = sb._WsSession(
+            bridge, sid, record.from_number, record.to_number, record.direction,
+            record.custom_params, handler.ws_target, audio_cfg, handler.listen_targets,
+        )
+        handler.session.audio_port = port
+        # Régime établi : audio IA en attente (décodé frame par frame comme
+        # dans _ws_to_sip), frames client en attente, une mark
+        for _ in range(tx_buffer_ms // audio_cfg.frame_ms):
+            port.feed_audio(sb.ulaw_to_pcm16(ulaw_frame))
+        port.queue_mark("reply-1")
+        for _ in range(5):
+            port.onFrameReceived(MediaFrame(frame))
+
+    make_call(-1)   # premier appel hors mesure (caches, imports paresseux)
+    bridge.active_calls.clear()
+    gc.collect()
+
+    tracemalloc.start()
+    rss0 = _rss_kb()
+    traced0 = tracemalloc.get_traced_memory()[0]
+    for i in range(calls):
+        make_call(i)
+    gc.collect()
+    traced = tracemalloc.get_traced_memory()[0] - traced0
+    rss = _rss_kb() - rss0
+    tracemalloc.stop()
+
+    return {
+        "calls": calls,
+        "tx_buffer_ms": tx_buffer_ms,
+        "python_kb_per_call": round(traced / 1024 / calls, 2),
+        "rss_kb_per_call": round(rss / calls, 2),
+        "python_kb_total": round(traced / 1024),
+        "rss_kb_total": rss,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Mémoire par appel du SIP Bridge (pjsua2 simulé)")
+    p.add_argument("--calls", default="10,100,500", help="Nombres d'appels simulés (défaut: 10,100,500)")
+    p.add_argument("--tx-buffer-ms", type=int, default=1000,
+                   help="Audio IA en attente de lecture par appel (défaut: 1000)")
+    p.add_argument("--max-kb-per-call", type=float, default=28.0,
+                   help="Seuil : allocations Python max par appel en KB (défaut: 28)")
+    p.add_argument("--json", action="store_true", help="Sortie JSON")
+    p.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.worker:
+        sys.path.insert(0, SERVICE_DIR)
+        print(json.dumps(run_worker(args.worker, args.tx_buffer_ms)))
+        return
+
+    results = []
+    for calls in (int(n) for n in args.calls.split(",")):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", str(calls),
+             "--tx-buffer-ms", str(args.tx_buffer_ms)],
+            cwd=SERVICE_DIR, capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    worst = max(r["python_kb_per_call"] for r in results)
+    report = {
+        "benchmark": "memory",
+        "python": sys.version.split()[0],
+        "results": results,
+        "max_kb_per_call": args.max_kb_per_call,
+        "passed": worst <= args.max_kb_per_call,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'appels':>7s} {'python/appel':>13s} {'rss/appel':>11s} {'python total':>13s} {'rss total':>11s}")
+        for r in results:
+            print(f"{r['calls']:7d} {r['python_kb_per_call']:10.2f} KB {r['rss_kb_per_call']:8.2f} KB "
+                  f"{r['python_kb_total']:10d} KB {r['rss_kb_total']:8d} KB")
+        verdict = "OK" if report["passed"] else "RÉGRESSION"
+        print(f"{verdict} : {worst:.2f} KB/appel (seuil {args.max_kb_per_call:g} KB)")
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
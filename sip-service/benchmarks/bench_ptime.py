@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+bench_ptime.py — Callbacks et CPU par appel selon le ptime (--ptime)
+
+Un process neuf par ptime (pjsua2 simulé, voir _stubs.py) :
+  - N appels : _AudioPort + _WsSession avec le vrai _sip_to_ws (encodage +
+    envoi) et le vrai _ws_to_sip (audio IA reçu en chunks de 20ms, comme
+    un serveur média, quel que soit le ptime) sur de faux WebSockets ;
+  - un thread qui imite l'horloge média pjsip : toutes les ptime ms,
+    onFrameReceived puis onFrameRequested sur chaque port.
+
+On mesure le CPU du process (time.process_time) rapporté par appel, les
+callbacks pjsip et messages WS par seconde d'appel, et le retard de
+l'horloge (p99) — au prix de ptime ms de latence en plus par sens.
+
+Usage :
+    python benchmarks/bench_ptime.py
+    python benchmarks/bench_ptime.py --ptimes 10,20,60 --calls 200 --duration 10 --json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from _stubs import MediaFrame, install_pjsua2_stub
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _SinkWs:
+    """Côté serveur média : compte les messages envoyés par le bridge."""
+
+    close_code = 1000
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, msg: str):
+        self.sent += 1
+
+
+class _AiWs(_SinkWs):
+    """Audio IA : un chunk µ-law de 20ms toutes les 20ms jusqu'à la fin."""
+
+    def __init__(self, payload: str, end: float):
+        super().__init__()
+        self._msg = json.dumps({"event": "media", "media": {"payload": payload}})
+        self._end = end
+
+    def __aiter__(self):
+        return self._gen()
+
+    async def _gen(self):
+        import asyncio
+        import time
+        while time.monotonic() < self._end:
+            yield self._msg
+            await asyncio.sleep(0.02)
+
+
+def run_worker(ptime: int, calls: int, duration: float) -> dict:
+    import asyncio
+    import base64
+    import logging
+    import threading
+    import time
+
+    install_pjsua2_stub()
+    import sipbridge as sb
+    logging.getLogger("sip-bridge").setLevel(logging.WARNING)
+
+    audio_cfg = sb.AudioConfig(frame_ms=ptime)
+    bridge = sb.SipBridge(sb.BridgeConfig(audio=audio_cfg))
+    payload = base64.b64encode(sb.pcm16_to_ulaw(b"\x01\x02" * 160)).decode()
+    rx_pcm = b"\x03\x04" * audio_cfg.samples_per_frame
+
+    ports, sessions = [], []
+    for i in range(calls):
+        sid = f"bench{i:04d}-0000"
+        port = sb._AudioPort(sid, audio_cfg)
+        session = sb._WsSession(bridge, sid, "a", "b", sb.CallDirection.INBOUND, {},
+                                "", audio_cfg)
+        session.audio_port = port
+        session._connected = True
+        ports.append(port)
+        sessions.append(session)
+
+    stop = threading.Event()
+    callbacks = [0]
+    lateness_ms: list[float] = []
+
+    def media_clock():
+        period = ptime / 1000
+        rx, tx = MediaFrame(rx_pcm), MediaFrame()
+        deadline = time.perf_counter() + period
+        while not stop.is_set():
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            lateness_ms.append((time.perf_counter() - deadline) * 1000)
+            for port in ports:
+                port.onFrameReceived(rx)
+                port.onFrameRequested(tx)
+            callbacks[0] += 2 * len(ports)
+            deadline += period
+
+    async def workload():
+        end = time.monotonic() + duration
+        sinks = [_SinkWs() for _ in sessions]
+
+        async def call(session, sink):
+            ai = _AiWs(payload, end)
+            uplink = asyncio.ensure_future(session._sip_to_ws(sink))
+            await session._ws_to_sip(ai)
+            session.stop()
+            await uplink
+
+        await asyncio.gather(*(call(s, k) for s, k in zip(sessions, sinks)))
+        return sum(k.sent for k in sinks)
+
+    clock = threading.Thread(target=media_clock, daemon=True)
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    clock.start()
+    sent = asyncio.run(workload())
+    stop.set()
+    clock.join()
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+
+    call_sec = calls * wall
+    lateness_ms.sort()
+    return {
+        "ptime_ms": ptime,
+        "calls": calls,
+        "duration_sec": round(wall, 2),
+        "callbacks_per_call_sec": round(callbacks[0] / call_sec, 1),
+        "ws_msgs_per_call_sec": round(sent / call_sec, 1),
+        "cpu_pct_per_call": round(cpu / call_sec * 100, 3),
+        "cpu_pct_total": round(cpu / wall * 100, 1),
+        "clock_p99_late_ms": round(lateness_ms[int(0.99 * (len(lateness_ms) - 1))], 2) if lateness_ms else 0.0,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Callbacks et CPU par appel selon le ptime")
+    p.add_argument("--ptimes", default="10,20,40,60", help="ptime à comparer en ms (défaut: 10,20,40,60)")
+    p.add_argument("--calls", type=int, default=100, help="Appels simulés (défaut: 100)")
+    p.add_argument("--duration", type=float, default=5.0, help="Durée par ptime en sec (défaut: 5)")
+    p.add_argument("--json", action="store_true", help="Sortie JSON")
+    p.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.worker:
+        sys.path.insert(0, SERVICE_DIR)
+        print(json.dumps(run_worker(args.worker, args.calls, args.duration)))
+        return
+
+    results = []
+    for ptime in (int(v) for v in args.ptimes.split(",")):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", str(ptime),
+             "--calls", str(args.calls), "--duration", str(args.duration)],
+            cwd=SERVICE_DIR, capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    report = {"benchmark": "ptime", "python": sys.version.split()[0], "results": results}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'ptime':>6s} {'callbacks/s':>12s} {'msgs WS/s':>10s} {'CPU/appel':>10s} {'CPU total':>10s} {'horloge p99':>12s}")
+    for r in results:
+        print(f"{r['ptime_ms']:4d}ms {r['callbacks_per_call_sec']:12.1f} {r['ws_msgs_per_call_sec']:10.1f} "
+              f"{r['cpu_pct_per_call']:9.3f}% {r['cpu_pct_total']:9.1f}% {r['clock_p99_late_ms']:10.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+bench_runtime_profile.py — Latence de queue des callbacks média selon le profil runtime
+
+Chaque profil tourne dans un process neuf (GC, uvloop et switch interval sont
+process-wide) :
+  - un tas "de démarrage" d'objets longue durée, puis apply_runtime_profile /
+    freeze_gc comme dans SipBridge.run ;
+  - un thread qui imite l'horloge média pjsip : toutes les 20ms il prend le
+    verrou TX et copie une frame (onFrameRequested) ;
+  - la boucle asyncio qui simule N appels (JSON + base64 par frame, avec des
+    cycles pour faire travailler le GC).
+
+On mesure le retard de fin de callback par rapport à l'échéance (p50, p99,
+p99.9, max) — c'est ce retard qui produit les trous audio.
+
+Usage :
+    python benchmarks/bench_runtime_profile.py
+    python benchmarks/bench_runtime_profile.py --calls 200 --duration 10 --json
+    python benchmarks/bench_runtime_profile.py --profiles default,low-latency
+"""
+
+import argparse
+import dataclasses
+import json
+import os
+import subprocess
+import sys
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Profils mesurés : les préréglages de sipbridge + chaque réglage isolé
+EXTRA_PROFILES = {
+    "gc-freeze": {"gc_freeze": True},
+    "gc-thresholds": {"gc_thresholds": (10000, 20, 100)},
+    "switch-1ms": {"switch_interval_ms": 1.0},
+}
+
+
+def _resolve_profile(name: str):
+    from sipbridge import RUNTIME_PROFILES, RuntimeConfig
+    if name in RUNTIME_PROFILES:
+        return RUNTIME_PROFILES[name]
+    return RuntimeConfig(**EXTRA_PROFILES[name])
+
+
+def _percentile(sorted_samples: list[float], q: float) -> float:
+    idx = min(len(sorted_samples) - 1, int(q * len(sorted_samples)))
+    return sorted_samples[idx]
+
+
+def run_worker(profile: str, calls: int, duration: float, frame_ms: int, heap: int) -> dict:
+    """Exécuté dans le sous-process : applique le profil et mesure."""
+    import asyncio
+    import base64
+    import gc
+    import threading
+    import time
+
+    from sipbridge import apply_runtime_profile, freeze_gc, runtime_loop_factory
+
+    cfg = _resolve_profile(profile)
+    apply_runtime_profile(cfg)
+
+    # Tas de démarrage (modules, config, routes...) que le GC doit parcourir
+    # à chaque collecte gen2 tant qu'il n'est pas gelé.
+    startup_heap = [{"id": i, "tags": [i, str(i)]} for i in range(heap)]
+    freeze_gc(cfg)
+
+    frame = 1.0 / 1000 * frame_ms
+    frame_bytes = 8 * frame_ms * 2          # 8kHz, 16 bits
+    tx_lock = threading.Lock()
+    tx_buffer = bytearray(frame_bytes * 50)
+    lateness_ms: list[float] = []
+    stop = threading.Event()
+
+    def media_clock():
+        deadline = time.perf_counter() + frame
+        while not stop.is_set():
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            with tx_lock:
+                chunk = bytes(tx_buffer[:frame_bytes])
+            lateness_ms.append((time.perf_counter() - deadline) * 1000)
+            deadline += frame
+            del chunk
+
+    async def simulated_call(idx: int, end: float):
+        payload = bytes(range(256))[: frame_bytes // 2]
+        while time.perf_counter() < end:
+            msg = json.dumps({
+                "event": "media",
+                "streamSid": f"call-{idx}",
+                "media": {"payload": base64.b64encode(payload).decode()},
+            })
+            decoded = json.loads(msg)
+            # Cycle de référence : seul le GC le libère
+            a, b = {"msg": decoded}, {}
+            a["peer"], b["peer"] = b, a
+            with tx_lock:
+                tx_buffer[:frame_bytes] = payload * 2
+            await asyncio.sleep(frame)
+
+    async def workload():
+        end = time.perf_counter() + duration
+        await asyncio.gather(*(simulated_call(i, end) for i in range(calls)))
+
+    gc_before = [s["collections"] for s in gc.get_stats()]
+    clock = threading.Thread(target=media_clock, daemon=True)
+    clock.start()
+    asyncio.run(workload(), loop_factory=runtime_loop_factory(cfg))
+    stop.set()
+    clock.join()
+    gc_after = [s["collections"] for s in gc.get_stats()]
+    del startup_heap
+
+    samples = sorted(lateness_ms)
+    return {
+        "profile": profile,
+        "config": dataclasses.asdict(cfg),
+        "frames": len(samples),
+        "p50_ms": round(_percentile(samples, 0.50), 3),
+        "p99_ms": round(_percentile(samples, 0.99), 3),
+        "p999_ms": round(_percentile(samples, 0.999), 3),
+        "max_ms": round(samples[-1], 3),
+        "late_frames": sum(1 for s in samples if s > frame_ms),
+        "gc_collections": [b - a for a, b in zip(gc_before, gc_after)],
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Latence des callbacks média par profil runtime")
+    p.add_argument("--profiles", default="default,gc-freeze,gc-thresholds,switch-1ms,low-latency",
+                   help="Profils à comparer, séparés par des virgules")
+    p.add_argument("--calls", type=int, default=100, help="Appels simulés sur la boucle (défaut: 100)")
+    p.add_argument("--duration", type=float, default=5.0, help="Durée par profil en sec (défaut: 5)")
+    p.add_argument("--frame-ms", type=int, default=20, help="Période de l'horloge média (défaut: 20)")
+    p.add_argument("--heap", type=int, default=300_000, help="Objets longue durée au démarrage (défaut: 300000)")
+    p.add_argument("--json", action="store_true", help="Sortie JSON")
+    p.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.worker:
+        sys.path.insert(0, SERVICE_DIR)
+        print(json.dumps(run_worker(args.worker, args.calls, args.duration, args.frame_ms, args.heap)))
+        return
+
+    results = []
+    for profile in args.profiles.split(","):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", profile,
+             "--calls", str(args.calls), "--duration", str(args.duration),
+             "--frame-ms", str(args.frame_ms), "--heap", str(args.heap)],
+            cwd=SERVICE_DIR, capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    report = {"benchmark": "runtime_profile", "python": sys.version.split()[0],
+              "calls": args.calls, "duration_sec": args.duration, "results": results}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'profil':15s} {'frames':>7s} {'p50':>8s} {'p99':>8s} {'p99.9':>8s} {'max':>8s} {'>frame':>7s}  gc(gen0/1/2)")
+    for r in results:
+        gcs = "/".join(str(c) for c in r["gc_collections"])
+        print(f"{r['profile']:15s} {r['frames']:7d} {r['p50_ms']:7.2f}ms {r['p99_ms']:7.2f}ms "
+              f"{r['p999_ms']:7.2f}ms {r['max_ms']:7.2f}ms {r['late_frames']:7d}  {gcs}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py — Temps de démarrage à froid du SIP Bridge
+
+Mesure, dans des process neufs :
+  1. le temps d'import de sipbridge (chemin de démarrage) et des modules
+     différés (httpx, websockets) pour référence ;
+  2. avec --spawn : le temps entre le lancement de main-sipbridge.py et
+     chaque étape de readiness (/health, puis api/endpoint/transport/registered
+     via /ready).
+
+Usage :
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --spawn --runs 3 -- \\
+        --sip-username 33491234567 --sip-password s3cr3t --sip-domain sip.ovh.fr
+    python benchmarks/bench_startup.py --json > startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_time_ms(module: str) -> float:
+    """Temps d'import d'un module dans un interpréteur neuf (hors démarrage Python)."""
+    code = (
+        "import time; t = time.perf_counter(); "
+        f"import {module}; "
+        "print((time.perf_counter() - t) * 1000)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=SERVICE_DIR, capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _summary(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "min_ms": round(samples[0], 1),
+        "median_ms": round(statistics.median(samples), 1),
+        "max_ms": round(samples[-1], 1),
+    }
+
+
+def bench_imports(runs: int) -> dict:
+    results = {}
+    for module in ("sipbridge", "httpx", "websockets.legacy.client"):
+        results[module] = _summary([_import_time_ms(module) for _ in range(runs)])
+    return results
+
+
+def _get(url: str) -> tuple[int, dict]:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+def bench_spawn(bridge_args: list[str], port: int, timeout: float) -> dict:
+    """Lance le bridge et chronomètre /health puis chaque étape de /ready."""
+    cmd = [sys.executable, os.path.join(SERVICE_DIR, "main-sipbridge.py"),
+           "--api-port", str(port), *bridge_args]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=SERVICE_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    health_ms = None
+    last_ready: dict = {}
+    try:
+        deadline = t0 + timeout
+        while time.perf_counter() < deadline and proc.poll() is None:
+            try:
+                if health_ms is None:
+                    status, _ = _get(f"http://127.0.0.1:{port}/health")
+                    if status == 200:
+                        health_ms = (time.perf_counter() - t0) * 1000
+                status, last_ready = _get(f"http://127.0.0.1:{port}/ready")
+                if status == 200:
+                    break
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    return {
+        "health_ms": round(health_ms, 1) if health_ms is not None else None,
+        "ready": bool(last_ready.get("ready")),
+        # Étapes mesurées par le bridge, relatives à la création de SipBridge
+        "stages_ms": {
+            stage: info.get("ms")
+            for stage, info in last_ready.get("stages", {}).items()
+        },
+        "exit_code": proc.returncode,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark du démarrage à froid du SIP Bridge")
+    p.add_argument("--runs", type=int, default=5, help="Nombre de mesures (défaut: 5)")
+    p.add_argument("--spawn", action="store_true", help="Lancer aussi le bridge complet (nécessite pjsua2)")
+    p.add_argument("--port", type=int, default=5960, help="Port API du bridge lancé (défaut: 5960)")
+    p.add_argument("--timeout", type=float, default=30.0, help="Attente max de /ready en sec (défaut: 30)")
+    p.add_argument("--json", action="store_true", help="Sortie JSON")
+    p.add_argument("bridge_args", nargs="*", help="Arguments passés à main-sipbridge.py (après --)")
+    args = p.parse_args()
+
+    report = {"benchmark": "startup", "python": sys.version.split()[0],
+              "imports": bench_imports(args.runs)}
+    if args.spawn:
+        report["spawn"] = [
+            bench_spawn(args.bridge_args, args.port, args.timeout)
+            for _ in range(args.runs)
+        ]
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for module, r in report["imports"].items():
+        print(f"import {module:28s} median {r['median_ms']:7.1f} ms  (min {r['min_ms']}, max {r['max_ms']})")
+    for i, run in enumerate(report.get("spawn", []), 1):
+        stages = "  ".join(f"{k}={v}ms" for k, v in run["stages_ms"].items())
+        print(f"spawn #{i}: /health {run['health_ms']} ms  ready={run['ready']}  {stages}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+replay_trace.py — Rejoue une trace d'appel (--trace-dir) hors ligne
+
+La trace est réinjectée dans le vrai code du bridge (pjsua2 simulé, voir
+_stubs.py) :
+  - events WS entrants (media / mark / clear / stop) → _WsSession._ws_to_sip
+    via un faux WebSocket, l'audio ré-encodé dans le format WS de l'appel
+    (event WS_FORMAT de la trace, µ-law 8k à défaut) ;
+  - frames SIP reçues → _AudioPort.onFrameReceived, puis encodage vers le WS
+    (_media_message) comme dans _sip_to_ws ;
+  - horloge pjsip simulée (onFrameRequested toutes les frame_ms à partir du
+    démarrage média) et relevé des marks jouées (get_ready_marks).
+
+--speed real respecte les instants enregistrés (retard mesuré par event),
+--speed fast enchaîne tout sur un temps virtuel (coût CPU pur). Rapport :
+coût par event, retard, et pour chaque mark l'écart entre l'écho rejoué et
+l'écho enregistré (instant et playedMs). Code de sortie 1 si la dérive des
+marks dépasse --max-mark-drift-ms ou si un playedMs diffère.
+
+Usage :
+    python benchmarks/replay_trace.py traces/<call_sid>.sbtrace
+    python benchmarks/replay_trace.py traces/*.sbtrace --speed real --json
+    python benchmarks/replay_trace.py trace.sbtrace --max-mark-drift-ms 40
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+
+from _stubs import MediaFrame, install_pjsua2_stub
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_KINDS = ("STATE", "MEDIA_START", "SIP_FRAME", "WS_MEDIA", "WS_MARK",
+          "WS_CLEAR", "WS_STOP", "WS_OTHER", "MARK_ECHO", "WS_FORMAT")
+
+
+def _summary(samples: list[float]) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "p50": round(statistics.median(ordered), 2),
+        "p99": round(ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))], 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+class _ReplayWs:
+    """
+    Faux WebSocket dont l'itération pilote tout le rejeu : entre deux
+    messages WS, il exécute les frames SIP et les ticks de l'horloge pjsip
+    dus. Le temps passé par _ws_to_sip entre deux next() est le coût de
+    traitement de l'event.
+    """
+
+    def __init__(self, sb, meta: dict, records: list, session, port, realtime: bool):
+        self.sb = sb
+        self.kinds = sb._CallTrace
+        self.names = {getattr(self.kinds, n): n.lower() for n in _KINDS}
+        self.meta = meta
+        self.records = records
+        self.session = session
+        self.port = port
+        self.realtime = realtime
+        self.close_code = 1000
+        self.sent_media = 0
+        self.counts: dict[str, int] = {}
+        self.ws_us: list[float] = []
+        self.sip_us: list[float] = []
+        self.tick_us: list[float] = []
+        self.lateness_ms: list[float] = []
+        self.echoes: list[tuple[int, dict]] = []   # (t_us, mark)
+        self._start = 0.0
+        # Côté serveur média : encode l'audio WS dans le format de la session
+        self._ws_codec = session._codec
+
+    async def send(self, msg: str):
+        self.sent_media += 1
+
+    def __aiter__(self):
+        return self._drive()
+
+    async def _at(self, t_us: int):
+        """Mode real : attendre l'instant enregistré, noter le retard."""
+        if not self.realtime:
+            return
+        loop = asyncio.get_running_loop()
+        due = self._start + t_us / 1e6
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.lateness_ms.append((loop.time() - due) * 1000)
+
+    def _now_us(self, t_us: int) -> int:
+        if self.realtime:
+            return int((asyncio.get_running_loop().time() - self._start) * 1e6)
+        return t_us
+
+    async def _tick(self, t_us: int, frame):
+        t0 = time.perf_counter_ns()
+        self.port.onFrameRequested(frame)
+        ready = self.port.get_ready_marks()
+        self.tick_us.append((time.perf_counter_ns() - t0) / 1000)
+        for mark in ready:
+            self.echoes.append((self._now_us(t_us), mark))
+            await self.session._send(self, json.dumps({"event": "mark", "mark": mark}))
+
+    def _set_format(self, spec: str):
+        """Format WS de l'appel : codec de la session et encodeur côté serveur, comme en prod."""
+        fmt = self.sb._WsAudioFormat.parse(spec)
+        clock_rate = self.meta["clockRate"]
+        self.session._codec = self.sb._WsAudioCodec(fmt, clock_rate)
+        self._ws_codec = self.sb._WsAudioCodec(fmt, clock_rate)
+
+    def _audio(self, payload: bytes) -> bytes:
+        """µ-law enregistré, ou silence de la bonne taille si la trace n'a pas l'audio."""
+        if self.meta.get("audio"):
+            return payload
+        return b"\xff" * int.from_bytes(payload, "little")
+
+    async def _drive(self):
+        k = self.kinds
+        sb = self.sb
+        frame_us = self.meta["frameMs"] * 1000
+        out_frame = MediaFrame()
+        self._start = asyncio.get_running_loop().time()
+        # L'horloge pjsip démarre avec le port audio
+        starts = [t for t, kind, _ in self.records if kind == k.MEDIA_START]
+        next_tick = starts[0] if starts else None
+
+        for t_us, kind, payload in self.records:
+            while next_tick is not None and next_tick <= t_us:
+                await self._at(next_tick)
+                await self._tick(next_tick, out_frame)
+                next_tick += frame_us
+            name = self.names.get(kind, str(kind))
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+            if kind == k.SIP_FRAME:
+                await self._at(t_us)
+                t0 = time.perf_counter_ns()
+                self.port.onFrameReceived(MediaFrame(sb.ulaw_to_pcm16(self._audio(payload))))
+                while (pcm := self.port.get_frames()) is not None:
+                    await self.session._send(self, self.session._media_message(pcm))
+                self.sip_us.append((time.perf_counter_ns() - t0) / 1000)
+                continue
+            if kind == k.WS_FORMAT:
+                self._set_format(payload.decode())
+                continue
+            if kind == k.WS_MEDIA:
+                # La trace garde l'audio WS en µ-law au clock rate du port
+                audio = self._audio(payload)
+                if not self._ws_codec.native:
+                    audio = self._ws_codec.encode(sb.ulaw_to_pcm16(audio))
+                msg = {"event": "media", "media": {"payload": base64.b64encode(audio).decode()}}
+            elif kind == k.WS_MARK:
+                msg = {"event": "mark", "mark": {"name": payload.decode()}}
+            elif kind == k.WS_CLEAR:
+                msg = {"event": "clear"}
+            elif kind == k.WS_STOP:
+                msg = {"event": "stop"}
+            elif kind == k.WS_OTHER:
+                msg = {"event": payload.decode()}
+            else:
+                continue   # STATE, MEDIA_START, MARK_ECHO : pas d'entrée à rejouer
+            await self._at(t_us)
+            t0 = time.perf_counter_ns()
+            yield json.dumps(msg)
+            self.ws_us.append((time.perf_counter_ns() - t0) / 1000)
+
+        # Fin de trace sans stop : laisser l'audio en attente se jouer
+        # (marks de fin de réponse), au plus 60s de temps simulé
+        if next_tick is not None:
+            end = next_tick + 60_000_000
+            while next_tick < end and self.port.pending_marks():
+                await self._at(next_tick)
+                await self._tick(next_tick, out_frame)
+                next_tick += frame_us
+
+
+def _compare_marks(records: list, echoes: list, kinds) -> list[dict]:
+    """Appairage par nom et rang : i-ème écho de "x" rejoué ↔ i-ème enregistré."""
+    recorded: dict[str, list] = {}
+    for t_us, kind, payload in records:
+        if kind == kinds.MARK_ECHO:
+            played = int.from_bytes(payload[:4], "little")
+            recorded.setdefault(payload[4:].decode(), []).append((t_us, played))
+    seen: dict[str, int] = {}
+    marks = []
+    for t_us, mark in echoes:
+        name = mark["name"]
+        rank = seen.get(name, 0)
+        seen[name] = rank + 1
+        entry = {"name": name, "replayMs": round(t_us / 1000, 1), "replayPlayedMs": mark["playedMs"]}
+        if rank < len(recorded.get(name, [])):
+            rec_t, rec_played = recorded[name][rank]
+            entry.update({
+                "recordedMs": round(rec_t / 1000, 1),
+                "recordedPlayedMs": rec_played,
+                "driftMs": round((t_us - rec_t) / 1000, 1),
+            })
+        marks.append(entry)
+    missing = sum(len(v) for v in recorded.values()) - sum(min(seen.get(n, 0), len(v)) for n, v in recorded.items())
+    if missing:
+        marks.append({"missing": missing})
+    return marks
+
+
+def replay(sb, path: str, realtime: bool) -> dict:
+    kinds = sb._CallTrace
+    meta, records = kinds.read(path)
+    audio_cfg = sb.AudioConfig(frame_ms=meta["frameMs"], clock_rate=meta["clockRate"])
+    bridge = sb.SipBridge(sb.BridgeConfig(audio=audio_cfg))
+    sid = meta["callSid"]
+    port = sb._AudioPort(sid, audio_cfg)
+    session = sb._WsSession(
+        bridge, sid, "", "", sb.CallDirection(meta["direction"]), {},
+        "", audio_cfg,
+    )
+    session.audio_port = port
+    session._connected = True
+    ws = _ReplayWs(sb, meta, records, session, port, realtime)
+
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    asyncio.run(session._ws_to_sip(ws))
+    wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+
+    marks = _compare_marks(records, ws.echoes, kinds)
+    drifts = [abs(m["driftMs"]) for m in marks if "driftMs" in m]
+    played_mismatch = sum(1 for m in marks if "recordedPlayedMs" in m and m["recordedPlayedMs"] != m["replayPlayedMs"])
+    trace_ms = records[-1][0] / 1000 if records else 0.0
+    return {
+        "trace": path,
+        "callSid": sid,
+        "speed": "real" if realtime else "fast",
+        "audio": bool(meta.get("audio")),
+        "ws_format": str(session._codec.format),
+        "trace_ms": round(trace_ms, 1),
+        "replay_ms": round(wall * 1000, 1),
+        "cpu_ms": round(cpu * 1000, 1),
+        "records": ws.counts,
+        "ws_sent": ws.sent_media,
+        "ws_event_us": _summary(ws.ws_us),
+        "sip_frame_us": _summary(ws.sip_us),
+        "tick_us": _summary(ws.tick_us),
+        "lateness_ms": _summary(ws.lateness_ms),
+        "mark_drift_ms": _summary(drifts),
+        "played_mismatch": played_mismatch,
+        "marks": marks,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Rejoue des traces d'appel (--trace-dir) hors ligne")
+    p.add_argument("traces", nargs="+", help="Fichiers .sbtrace")
+    p.add_argument("--speed", choices=["fast", "real"], default="fast",
+                   help="fast = temps virtuel, le plus vite possible ; real = instants enregistrés (défaut: fast)")
+    p.add_argument("--max-mark-drift-ms", type=float, default=None,
+                   help="Seuil : écart max entre écho de mark rejoué et enregistré (défaut: pas de seuil)")
+    p.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = p.parse_args()
+
+    install_pjsua2_stub()
+    sys.path.insert(0, SERVICE_DIR)
+    import logging
+    import sipbridge as sb
+    logging.getLogger("sip-bridge").setLevel(logging.WARNING)
+
+    results = [replay(sb, path, args.speed == "real") for path in args.traces]
+    failures = []
+    for r in results:
+        if r["played_mismatch"]:
+            failures.append(f"{r['trace']}: {r['played_mismatch']} mark(s) avec un playedMs différent")
+        drift = r["mark_drift_ms"].get("max")
+        if args.max_mark_drift_ms is not None and drift is not None and drift > args.max_mark_drift_ms:
+            failures.append(f"{r['trace']}: dérive des marks {drift}ms > {args.max_mark_drift_ms:g}ms")
+
+    report = {
+        "benchmark": "replay_trace",
+        "python": sys.version.split()[0],
+        "results": results,
+        "failures": failures,
+        "passed": not failures,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for r in results:
+            counts = " ".join(f"{k}={v}" for k, v in sorted(r["records"].items()))
+            print(f"{r['trace']} ({r['speed']}, {'audio' if r['audio'] else 'sans audio'}, WS {r['ws_format']})")
+            print(f"  trace {r['trace_ms']:.0f}ms → rejeu {r['replay_ms']:.0f}ms (CPU {r['cpu_ms']:.0f}ms)  {counts}")
+            for label in ("ws_event_us", "sip_frame_us", "tick_us", "lateness_ms", "mark_drift_ms"):
+                s = r[label]
+                if s["count"]:
+                    print(f"  {label:14s} p50={s['p50']:<8g} p99={s['p99']:<8g} max={s['max']:<8g} (n={s['count']})")
+            for m in r["marks"]:
+                if "missing" in m:
+                    print(f"  marks enregistrées non rejouées : {m['missing']}")
+                elif "driftMs" in m:
+                    print(f"  mark {m['name']!r}: {m['recordedMs']}ms → {m['replayMs']}ms ({m['driftMs']:+}ms), "
+                          f"played {m['recordedPlayedMs']} → {m['replayPlayedMs']}ms")
+                else:
+                    print(f"  mark {m['name']!r}: {m['replayMs']}ms (pas d'écho enregistré)")
+        for failure in failures:
+            print(f"ÉCART {failure}")
+        print("OK" if report["passed"] else f"{len(failures)} écart(s)")
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
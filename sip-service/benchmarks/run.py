@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+run.py — Benchmarks à seuil, un seul rapport JSON (pré-déploiement / CI)
+
+Lance bench_hotpaths.py et bench_memory.py avec --json, agrège leurs rapports
+et sort en 1 si l'un d'eux dépasse son seuil. Les benchmarks comparatifs
+(ipc, runtime_profile, startup) n'ont pas de seuil et restent manuels.
+
+Usage :
+    python benchmarks/run.py > bench-report.json
+    python benchmarks/run.py --baseline bench-report.json --max-regression 15
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _run(script: str, args: list[str]) -> dict:
+    out = subprocess.run([sys.executable, os.path.join(BENCH_DIR, script), "--json", *args],
+                         capture_output=True, text=True)
+    if not out.stdout.strip():
+        return {"benchmark": script, "passed": False, "error": out.stderr.strip()[-2000:]}
+    return json.loads(out.stdout)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmarks à seuil, rapport JSON agrégé")
+    p.add_argument("--baseline", default="", help="Rapport run.py précédent à comparer (hot paths)")
+    p.add_argument("--max-regression", type=float, default=20.0, help="Régression max vs baseline en %% (défaut: 20)")
+    p.add_argument("--max-kb-per-call", type=float, default=28.0, help="Seuil mémoire par appel en KB (défaut: 28)")
+    args = p.parse_args()
+
+    hot_args = ["--max-regression", str(args.max_regression)]
+    if args.baseline:
+        # La baseline de bench_hotpaths est son propre rapport : on l'extrait
+        with open(args.baseline) as f:
+            previous = json.load(f)
+        hot_baseline = os.path.join(BENCH_DIR, ".baseline-hotpaths.json")
+        with open(hot_baseline, "w") as f:
+            json.dump(previous["benchmarks"]["hotpaths"], f)
+        hot_args += ["--baseline", hot_baseline]
+
+    try:
+        reports = {
+            "hotpaths": _run("bench_hotpaths.py", hot_args),
+            "memory": _run("bench_memory.py", ["--max-kb-per-call", str(args.max_kb_per_call)]),
+        }
+    finally:
+        if args.baseline:
+            os.unlink(hot_baseline)
+
+    passed = all(r.get("passed") for r in reports.values())
+    print(json.dumps({"python": sys.version.split()[0], "passed": passed, "benchmarks": reports}, indent=2))
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,9 +17,17 @@ Usage :
 """
 
 import argparse
+import dataclasses
 import asyncio
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import re
 import sys
+import time
+from datetime import datetime, timezone
 
 from sipbridge import (
     SipBridge,
@@ -28,12 +36,132 @@ from sipbridge import (
     NatConfig,
     AudioConfig,
     CallbackConfig,
+    AdmissionConfig,
+    DialerConfig,
+    RUNTIME_PROFILES,
+    runtime_loop_factory,
 )
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s — %(message)s",
-)
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s — %(message)s"
+
+
+# ── Logging ───────────────────────────────────────────────
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par record, avec le call SID en champ dédié."""
+
+    # Les messages du bridge sont préfixés par "[<sid[:8]>]"
+    _TAG_RE = re.compile(r"^\[([0-9a-f]{8})\]")
+
+    def format(self, record: logging.LogRecord) -> str:
+        msg = record.getMessage()
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": msg,
+        }
+        call_sid = getattr(record, "call_sid", None)
+        if call_sid is None:
+            m = self._TAG_RE.match(msg)
+            if m:
+                call_sid = m.group(1)
+        if call_sid:
+            entry["call_sid"] = call_sid
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Échantillonne les événements par frame : au plus `rate` records par
+    seconde et par template de message. Le nombre de records supprimés
+    depuis le dernier émis est ajouté en attribut `suppressed`.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self._windows: dict[str, list] = {}   # template → [window_start, count, suppressed]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0:
+            return False
+        now = time.monotonic()
+        w = self._windows.get(record.msg)
+        if w is None or now - w[0] >= 1.0:
+            suppressed = w[2] if w else 0
+            self._windows[record.msg] = [now, 1, 0]
+            record.suppressed = suppressed
+            return True
+        if w[1] < self.rate:
+            w[1] += 1
+            record.suppressed = w[2]
+            w[2] = 0
+            return True
+        w[2] += 1
+        return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler non bloquant : le thread appelant (callback pjsip, boucle
+    asyncio) ne formate rien et ne fait jamais d'I/O. Si la file est pleine
+    le record est abandonné plutôt que d'ajouter de la gigue audio.
+    """
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatage différé au thread listener (le QueueHandler standard
+        # formate ici, dans le thread appelant).
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # Appelé par logging.shutdown() : vide la file avant la sortie
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        super().close()
+
+
+def setup_logging(level: str = "INFO", fmt: str = "text", use_async: bool = False,
+                  queue_size: int = 10000, media_log_rate: float = 5.0):
+    """Configure le logging du process. Retourne le QueueListener (ou None)."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for h in list(root.handlers):
+        root.removeHandler(h)
+
+    # Événements par frame : limités/échantillonnés avant même la file
+    logging.getLogger("sip-bridge.media").addFilter(RateLimitFilter(media_log_rate))
+
+    if not use_async:
+        root.addHandler(handler)
+        return None
+
+    q: queue.Queue = queue.Queue(maxsize=queue_size)
+    qh = DroppingQueueHandler(q)
+    qh.listener = logging.handlers.QueueListener(q, handler, respect_handler_level=True)
+    qh.listener.start()
+    root.addHandler(qh)
+    return qh.listener
 
 
 def _parse_param(s: str) -> tuple[str, str]:
@@ -44,6 +172,17 @@ def _parse_param(s: str) -> tuple[str, str]:
     return k.strip(), v.strip()
 
 
+_TARGET_FORMAT_RE = re.compile(r"^(.+?)=((?:audio/)?[a-z0-9-]+(?:[;/](?:rate=)?\d+)?)$", re.IGNORECASE)
+
+
+def _parse_target_format(s: str) -> tuple[str, str]:
+    """Parse 'url=format' → (url, format) ; le format peut lui-même contenir 'rate='."""
+    m = _TARGET_FORMAT_RE.match(s.strip())
+    if not m:
+        raise argparse.ArgumentTypeError(f"Format attendu : URL=FORMAT (ex: ws://ia:5050/media-stream=audio/pcm;24000), reçu : {s!r}")
+    return m.group(1), m.group(2)
+
+
 def parse_args(argv=None) -> BridgeConfig:
     p = argparse.ArgumentParser(
         prog="main-sipbridge",
@@ -58,6 +197,13 @@ def parse_args(argv=None) -> BridgeConfig:
     sip.add_argument("--sip-port",      type=int, default=0,        help="Port SIP local (0=auto)")
     sip.add_argument("--sip-transport", default="udp", choices=["udp", "tcp", "tls"], help="Transport SIP (défaut: udp)")
     sip.add_argument("--sip-reg-timeout", type=int, default=300,    help="Intervalle ré-enregistrement en sec (défaut: 300)")
+    sip.add_argument("--sip-reg-retry", type=int, default=30,       help="Nouvel essai après un REGISTER en échec, en sec (défaut: 30)")
+    sip.add_argument("--sip-registrar", action="append", default=[], metavar="URI",
+                     help="Registrar/proxy enregistré en parallèle, répétable (défaut: sip:<domaine>)")
+    sip.add_argument("--registrar-probe-sec", type=float, default=15.0,
+                     help="Plusieurs registrars : sonde REGISTER toutes les N sec, 0=désactivé (défaut: 15)")
+    sip.add_argument("--registrar-probe-timeout", type=float, default=5.0,
+                     help="Sonde sans réponse après N sec → registrar hors service (défaut: 5)")
 
     # ── NAT ──
     nat = p.add_argument_group("NAT")
@@ -69,34 +215,165 @@ def parse_args(argv=None) -> BridgeConfig:
 
     # ── Audio ──
     audio = p.add_argument_group("Audio")
+    audio.add_argument("--ptime",       type=int, default=20, choices=[10, 20, 30, 40, 60],
+                       help="Packetization time en ms : SDP (a=ptime) et frame du port audio (défaut: 20)")
     audio.add_argument("--no-ec",       action="store_true",        help="Désactiver l'echo cancellation")
     audio.add_argument("--ec-tail-ms",  type=int, default=200,      help="Echo cancel tail en ms (défaut: 200)")
     audio.add_argument("--vad",         action="store_true",        help="Activer VAD côté SIP")
     audio.add_argument("--rx-gain",     type=float, default=0.0,    help="Gain audio reçu du client en dB (défaut: 0)")
     audio.add_argument("--tx-gain",     type=float, default=0.0,    help="Gain audio envoyé au client en dB (défaut: 0)")
+    audio.add_argument("--rx-agc",      action="store_true",        help="AGC sur l'audio reçu du client (numpy)")
+    audio.add_argument("--tx-agc",      action="store_true",        help="AGC sur l'audio envoyé au client (numpy)")
+    audio.add_argument("--agc-target-dbfs", type=float, default=-20.0, help="Niveau cible de l'AGC en dBFS (défaut: -20)")
+    audio.add_argument("--agc-max-gain-db", type=float, default=24.0, help="Gain max de l'AGC en dB (défaut: 24)")
+    audio.add_argument("--rx-highpass-hz", type=float, default=0.0, help="Passe-haut (DC/ronflette) sur l'audio reçu, 0=désactivé (ex: 80)")
+    audio.add_argument("--tx-highpass-hz", type=float, default=0.0, help="Passe-haut sur l'audio envoyé, 0=désactivé")
+    audio.add_argument("--rx-noise-gate", type=float, default=0.0, help="Noise gate sur l'audio reçu en dBFS, 0=désactivé (ex: -50)")
+    audio.add_argument("--tx-noise-gate", type=float, default=0.0, help="Noise gate sur l'audio envoyé en dBFS, 0=désactivé")
+    audio.add_argument("--dsp-budget-us", type=int, default=1000, help="CPU max de la chaîne DSP par 20ms d'audio en µs, 0=illimité (défaut: 1000)")
+    audio.add_argument("--rx-queue-frames", type=int, default=250,
+                       help="Audio client en attente de la session WS, en frames de 20ms (défaut: 250 = 5s)")
 
     # ── Bridge ──
     bridge = p.add_argument_group("Bridge")
-    bridge.add_argument("--ws-target",          default="ws://localhost:5050/media-stream", help="WebSocket cible (défaut: ws://localhost:5050/media-stream)")
+    bridge.add_argument("--ws-target",          action="append", default=None, metavar="URL[*POIDS]",
+                        help="WebSocket cible, ou unix:///chemin/socket pour un serveur local ; "
+                             "répétable pour répartir les appels (défaut: ws://localhost:5050/media-stream)")
+    bridge.add_argument("--ws-balance",         choices=["least-active", "weighted"], default="least-active",
+                        help="Répartition entre plusieurs --ws-target (défaut: least-active)")
+    bridge.add_argument("--ws-eject-failures",  type=int, default=3,
+                        help="Échecs de connexion consécutifs avant éjection d'une cible (défaut: 3)")
+    bridge.add_argument("--ws-eject-sec",       type=float, default=30.0, help="Durée d'éjection d'une cible en sec (défaut: 30)")
+    bridge.add_argument("--ws-connect-timeout", type=float, default=5.0,
+                        help="Timeout de connexion à une cible en sec avant repli sur la suivante (défaut: 5)")
+    bridge.add_argument("--ws-audio-format",    default="audio/x-mulaw;8000", metavar="FORMAT",
+                        help="Audio sur le WS : audio/x-mulaw, audio/x-alaw, audio/l16|audio/pcm;8000|16000|24000 (défaut: audio/x-mulaw;8000)")
+    bridge.add_argument("--ws-target-format",   type=_parse_target_format, action="append", default=[], metavar="URL=FORMAT",
+                        help="Format audio propre à une --ws-target (répétable)")
+    bridge.add_argument("--listen-target",      action="append", default=[], metavar="URL",
+                        help="WebSocket secondaire en écoute seule — transcription, QA (répétable)")
+    bridge.add_argument("--listen-queue-frames", type=int, default=50, help="File max par listener en frames de 20ms (défaut: 50 = 1s)")
+    bridge.add_argument("--ws-resume-grace",    type=float, default=10.0,
+                        help="WS perdu sans stop : reprise pendant N sec sans raccrocher, 0=désactivé (défaut: 10)")
+    bridge.add_argument("--ws-resume-buffer-frames", type=int, default=250,
+                        help="Audio client gardé pendant la coupure, en frames de 20ms (défaut: 250 = 5s)")
     bridge.add_argument("--api-port",           type=int, default=5060, help="Port de l'API REST (défaut: 5060)")
     bridge.add_argument("--no-auto-answer",     action="store_true", help="Ne pas décrocher automatiquement les appels entrants")
     bridge.add_argument("--max-call-duration",  type=int, default=600, help="Durée max d'un appel en sec, 0=illimité (défaut: 600)")
+    bridge.add_argument("--media-timeout",      type=int, default=30, help="Raccroche si aucun audio SIP reçu depuis N sec, 0=désactivé (défaut: 30)")
+    bridge.add_argument("--rtp-stats-interval", type=float, default=5.0,
+                        help="Relevé des stats RTP/RTCP par appel toutes les N sec, 0=désactivé (défaut: 5)")
     bridge.add_argument("--max-concurrent-calls", type=int, default=10, help="Appels simultanés max (défaut: 10)")
+    bridge.add_argument("--drain-timeout",      type=int, default=300,
+                        help="SIGTERM : attente max des appels en cours en sec, 0=arrêt immédiat (défaut: 300)")
+    bridge.add_argument("--no-drain-unregister", action="store_true",
+                        help="Ne pas dé-enregistrer le compte SIP pendant le drain")
     bridge.add_argument("--param", type=_parse_param, action="append", default=[], metavar="key=value",
                         help="Paramètre custom passé dans chaque WebSocket start (répétable)")
 
+    # ── Admission ──
+    adm = p.add_argument_group("Admission (shedding sous charge)")
+    adm.add_argument("--no-admission",          action="store_true", help="Désactiver le contrôle d'admission dynamique")
+    adm.add_argument("--max-loop-lag-ms",       type=float, default=50.0, help="Retard max de la boucle asyncio en ms (défaut: 50, 0=ignoré)")
+    adm.add_argument("--max-poll-latency-ms",   type=float, default=40.0, help="Retard max du poll pjsip en ms (défaut: 40, 0=ignoré)")
+    adm.add_argument("--max-rx-backlog",        type=int, default=25, help="Frames SIP (de 20ms) en attente max par appel (défaut: 25, 0=ignoré)")
+    adm.add_argument("--max-cpu",               type=float, default=85.0, help="CPU max du process en %% (défaut: 85, 0=ignoré)")
+    adm.add_argument("--retry-after",           type=int, default=5, help="Retry-After renvoyé aux appels refusés en sec (défaut: 5)")
+
+    # ── Dialer ──
+    dialer = p.add_argument_group("Dialer (POST /api/calls/batch)")
+    dialer.add_argument("--dialer-cps",          type=float, default=1.0, help="Appels sortants lancés par seconde max (défaut: 1)")
+    dialer.add_argument("--dialer-max-outbound", type=int, default=0, help="Appels de campagne simultanés, 0=max-concurrent-calls (défaut: 0)")
+    dialer.add_argument("--dialer-ring-timeout", type=int, default=30, help="Timeout sonnerie par défaut en sec (défaut: 30)")
+    dialer.add_argument("--dialer-max-queued",   type=int, default=1000, help="Appels en file max (défaut: 1000)")
+    dialer.add_argument("--dialer-batch-ttl",    type=float, default=3600.0, help="Campagne terminée oubliée après N sec (défaut: 3600)")
+
+    # ── Logging ──
+    log = p.add_argument_group("Logging")
+    log.add_argument("--log-level",      default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="Niveau de log (défaut: INFO)")
+    log.add_argument("--log-format",     default="text", choices=["text", "json"], help="Format : texte ou JSON une ligne par record (défaut: text)")
+    log.add_argument("--log-async",      action="store_true", help="Écriture des logs dans un thread dédié (QueueHandler) — aucune I/O sur le chemin audio")
+    log.add_argument("--log-queue-size", type=int, default=10000, help="Taille de la file de logs async, au-delà les records sont abandonnés (défaut: 10000)")
+    log.add_argument("--media-log-rate", type=float, default=5.0, help="Événements DEBUG par frame : max par seconde et par type (défaut: 5, 0=aucun)")
+
+    # ── Événements ──
+    ev = p.add_argument_group("Événements (GET /api/events)")
+    ev.add_argument("--event-history",    type=int, default=1000, help="Événements gardés pour la reprise Last-Event-ID (défaut: 1000)")
+    ev.add_argument("--event-queue-size", type=int, default=256, help="File max par abonné SSE, au-delà il est déconnecté (défaut: 256)")
+
+    # ── Cluster ──
+    cl = p.add_argument_group("Cluster")
+    cl.add_argument("--cluster-db",        default="", metavar="PATH",
+                    help="Annuaire d'appels partagé entre les bridges d'un même hôte (fichier SQLite sur disque local, pas de NFS) — vide = désactivé")
+    cl.add_argument("--node-id",           default="", help="Identifiant du node (défaut: <hostname>:<api-port>)")
+    cl.add_argument("--node-url",          default="", help="URL de l'API de ce node vue des autres (défaut: http://<hostname>:<api-port>)")
+    cl.add_argument("--cluster-heartbeat", type=float, default=2.0, help="Publication charge + appels toutes les N sec (défaut: 2)")
+    cl.add_argument("--cluster-node-ttl",  type=float, default=10.0, help="Node ignoré sans heartbeat depuis N sec (défaut: 10)")
+
+    # ── Clips audio ──
+    clips = p.add_argument_group("Clips audio (accueil, POST /api/calls/{sid}/play)")
+    clips.add_argument("--clips-dir",        default="", metavar="DIR", help="Clips pré-rendus <DIR>/<compte>/<nom>.wav (repli <DIR>/<nom>.wav) — vide = désactivé")
+    clips.add_argument("--clips-key",        default="", metavar="PARAM", help="Custom param qui désigne le compte (ex: restaurantId)")
+    clips.add_argument("--greeting-clip",    default="greeting", help="Clip joué dès que le média est actif, \"\" = aucun (défaut: greeting)")
+    clips.add_argument("--greeting-handoff", default="queue", choices=["queue", "cut"], help="Audio du WS à la suite de l'accueil ou qui le coupe (défaut: queue)")
+
+    # ── Debug ──
+    dbg = p.add_argument_group("Debug")
+    dbg.add_argument("--debug-token",          default=os.environ.get("DEBUG_TOKEN", ""),
+                     help="Active GET /debug/profile (header X-Debug-Token ou ?token=) — vide = désactivé. "
+                          "Préférer la variable DEBUG_TOKEN : un argument est visible dans ps")
+    dbg.add_argument("--profile-max-seconds",  type=int, default=60, help="Durée max d'une capture /debug/profile en sec (défaut: 60)")
+    dbg.add_argument("--trace-dir",            default="", metavar="DIR", help="Trace binaire par appel (<call_sid>.sbtrace) pour rejeu hors ligne — vide = désactivé")
+    dbg.add_argument("--trace-audio",          action="store_true", help="Garder l'audio dans les traces (µ-law, ~16 KB/s par appel)")
+
+    # ── Runtime ──
+    rt = p.add_argument_group("Runtime")
+    rt.add_argument("--runtime-profile",    default="default", choices=sorted(RUNTIME_PROFILES), help="Profil runtime prédéfini (défaut: default)")
+    rt.add_argument("--uvloop",             action=argparse.BooleanOptionalAction, default=None, help="Boucle uvloop (surcharge le profil)")
+    rt.add_argument("--gc-freeze",          action=argparse.BooleanOptionalAction, default=None, help="gc.freeze() après l'init (surcharge le profil)")
+    rt.add_argument("--gc-thresholds",      default=None, help="Seuils GC gen0,gen1,gen2 ex: 10000,20,100 (surcharge le profil)")
+    rt.add_argument("--switch-interval-ms", type=float, default=None, help="Intervalle de bascule du GIL en ms (surcharge le profil)")
+
     # ── Callbacks ──
     cb = p.add_argument_group("Callbacks")
     cb.add_argument("--status-callback-url",    default="",         help="URL de callback status")
     cb.add_argument("--incoming-callback-url",  default="",         help="URL appelée avant de décrocher un appel entrant")
     cb.add_argument("--callback-method",        default="POST", choices=["POST", "GET"], help="Méthode HTTP des callbacks (défaut: POST)")
     cb.add_argument("--callback-timeout",       type=float, default=5.0, help="Timeout callbacks en sec (défaut: 5)")
+    cb.add_argument("--incoming-cache-ttl",     type=float, default=60.0, help="Cache des décisions entrantes en sec, 0=désactivé (défaut: 60)")
+    cb.add_argument("--incoming-cache-stale",   type=float, default=300.0, help="Durée où une décision périmée est servie pendant sa revalidation (défaut: 300)")
+    cb.add_argument("--incoming-cache-reject-ttl", type=float, default=30.0, help="Cache des rejets en sec (défaut: 30)")
+    cb.add_argument("--incoming-cache-size",    type=int, default=1000, help="Entrées max du cache (défaut: 1000)")
 
     args = p.parse_args(argv)
 
+    setup_logging(
+        level=args.log_level,
+        fmt=args.log_format,
+        use_async=args.log_async,
+        queue_size=args.log_queue_size,
+        media_log_rate=args.media_log_rate,
+    )
+
     # Construire le dict de custom params
     custom_params = dict(args.param)
 
+    # Profil runtime + surcharges individuelles
+    runtime = dataclasses.replace(RUNTIME_PROFILES[args.runtime_profile])
+    if args.uvloop is not None:
+        runtime.uvloop = args.uvloop
+    if args.gc_freeze is not None:
+        runtime.gc_freeze = args.gc_freeze
+    if args.gc_thresholds:
+        try:
+            runtime.gc_thresholds = tuple(int(x) for x in args.gc_thresholds.split(","))
+        except ValueError:
+            p.error(f"--gc-thresholds invalide : {args.gc_thresholds!r} (attendu gen0,gen1,gen2)")
+        if len(runtime.gc_thresholds) != 3:
+            p.error(f"--gc-thresholds invalide : {args.gc_thresholds!r} (attendu gen0,gen1,gen2)")
+    if args.switch_interval_ms is not None:
+        runtime.switch_interval_ms = args.switch_interval_ms
+
     return BridgeConfig(
         sip=SipConfig(
             domain=args.sip_domain,
@@ -105,6 +382,10 @@ def parse_args(argv=None) -> BridgeConfig:
             port=args.sip_port,
             transport=args.sip_transport,
             reg_timeout=args.sip_reg_timeout,
+            reg_retry_sec=args.sip_reg_retry,
+            registrars=args.sip_registrar,
+            registrar_probe_sec=args.registrar_probe_sec,
+            registrar_probe_timeout_sec=args.registrar_probe_timeout,
         ),
         nat=NatConfig(
             stun_server=args.stun_server,
@@ -114,24 +395,84 @@ def parse_args(argv=None) -> BridgeConfig:
             ice_enabled=not args.no_ice,
         ),
         audio=AudioConfig(
+            frame_ms=args.ptime,
             ec_enabled=not args.no_ec,
             ec_tail_ms=args.ec_tail_ms,
             vad_enabled=args.vad,
             rx_gain=args.rx_gain,
             tx_gain=args.tx_gain,
+            rx_agc=args.rx_agc,
+            tx_agc=args.tx_agc,
+            agc_target_dbfs=args.agc_target_dbfs,
+            agc_max_gain_db=args.agc_max_gain_db,
+            rx_highpass_hz=args.rx_highpass_hz,
+            tx_highpass_hz=args.tx_highpass_hz,
+            rx_noise_gate_dbfs=args.rx_noise_gate,
+            tx_noise_gate_dbfs=args.tx_noise_gate,
+            dsp_budget_us=args.dsp_budget_us,
+            rx_queue_frames=args.rx_queue_frames,
         ),
         callbacks=CallbackConfig(
             status_callback_url=args.status_callback_url,
             incoming_callback_url=args.incoming_callback_url,
             callback_method=args.callback_method,
             callback_timeout=args.callback_timeout,
+            incoming_cache_ttl_sec=args.incoming_cache_ttl,
+            incoming_cache_stale_sec=args.incoming_cache_stale,
+            incoming_cache_reject_ttl_sec=args.incoming_cache_reject_ttl,
+            incoming_cache_size=args.incoming_cache_size,
+        ),
+        admission=AdmissionConfig(
+            enabled=not args.no_admission,
+            max_loop_lag_ms=args.max_loop_lag_ms,
+            max_poll_latency_ms=args.max_poll_latency_ms,
+            max_rx_backlog_frames=args.max_rx_backlog,
+            max_cpu_percent=args.max_cpu,
+            retry_after_sec=args.retry_after,
         ),
-        ws_target=args.ws_target,
+        dialer=DialerConfig(
+            cps=args.dialer_cps,
+            max_outbound=args.dialer_max_outbound,
+            ring_timeout_sec=args.dialer_ring_timeout,
+            max_queued=args.dialer_max_queued,
+            batch_ttl_sec=args.dialer_batch_ttl,
+        ),
+        runtime=runtime,
+        ws_targets=args.ws_target or ["ws://localhost:5050/media-stream"],
+        ws_balance=args.ws_balance,
+        ws_eject_failures=args.ws_eject_failures,
+        ws_eject_sec=args.ws_eject_sec,
+        ws_connect_timeout_sec=args.ws_connect_timeout,
+        ws_audio_format=args.ws_audio_format,
+        ws_target_formats=dict(args.ws_target_format),
+        listen_targets=args.listen_target,
+        listen_queue_frames=args.listen_queue_frames,
+        ws_resume_grace_sec=args.ws_resume_grace,
+        ws_resume_buffer_frames=args.ws_resume_buffer_frames,
         api_port=args.api_port,
         custom_params=custom_params,
         auto_answer=not args.no_auto_answer,
         max_call_duration=args.max_call_duration,
+        media_timeout_sec=args.media_timeout,
+        rtp_stats_interval_sec=args.rtp_stats_interval,
         max_concurrent_calls=args.max_concurrent_calls,
+        drain_timeout=args.drain_timeout,
+        drain_unregister=not args.no_drain_unregister,
+        event_history=args.event_history,
+        event_queue_size=args.event_queue_size,
+        debug_token=args.debug_token,
+        profile_max_seconds=args.profile_max_seconds,
+        trace_dir=args.trace_dir,
+        trace_audio=args.trace_audio,
+        clips_dir=args.clips_dir,
+        clips_key=args.clips_key,
+        greeting_clip=args.greeting_clip,
+        greeting_handoff=args.greeting_handoff,
+        cluster_db=args.cluster_db,
+        node_id=args.node_id,
+        node_url=args.node_url,
+        cluster_heartbeat_sec=args.cluster_heartbeat,
+        cluster_node_ttl_sec=args.cluster_node_ttl,
     )
 
 
@@ -142,8 +483,14 @@ def main():
         print("Erreur: --sip-username est requis", file=sys.stderr)
         sys.exit(1)
 
-    bridge = SipBridge(config)
-    asyncio.run(bridge.run())
+    try:
+        bridge = SipBridge(config)
+    except (ValueError, RuntimeError) as e:
+        # Config invalide détectée à la construction (format audio WS, ou
+        # rééchantillonnage sans numpy ni audioop...)
+        print(f"Erreur: {e}", file=sys.stderr)
+        sys.exit(1)
+    asyncio.run(bridge.run(), loop_factory=runtime_loop_factory(config.runtime))
 
 
 if __name__ == "__main__":
@@ -18,28 +18,47 @@ Usage :
     asyncio.run(bridge.run())
 """
 
+import gc
+import sys
 import json
 import asyncio
 import base64
 import struct
+import io
+import array
 import uuid
 import signal
 import logging
+import math
+import bisect
+import time
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from enum import Enum
 from typing import Optional, Any
-import queue
+from collections import OrderedDict, deque
 import threading
 from concurrent.futures import ThreadPoolExecutor
-from contextlib import asynccontextmanager
-
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager, contextmanager, AsyncExitStack
+import importlib.util
+import hmac
+import mmap
+import os
+import socket
+
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
-import httpx
+
+# httpx (callbacks) et websockets (sessions) ne sont pas sur le chemin de
+# démarrage : importés à la première utilisation, préchargés en tâche de
+# fond une fois le bridge prêt (voir SipBridge._prewarm_imports).
 
 logger = logging.getLogger("sip-bridge")
+# Événements par frame (20ms) — DEBUG uniquement, à limiter/échantillonner
+# côté handler (voir main-sipbridge.py --media-log-rate). Toujours appeler
+# en style lazy (%s) derrière isEnabledFor pour ne rien formater en prod.
+media_logger = logging.getLogger("sip-bridge.media")
 
 
 # ============================================================
@@ -55,6 +74,13 @@ class SipConfig:
     port: int = 0               # 0 = auto
     transport: str = "udp"      # udp | tcp | tls
     reg_timeout: int = 300      # secondes
+    # Registrars / proxies enregistrés en parallèle (un compte pjsip chacun).
+    # Vide = [sip:<domain>]. Les appels sortants passent par le plus rapide
+    # des registrars enregistrés.
+    registrars: list = field(default_factory=list)
+    reg_retry_sec: int = 30             # nouvel essai après un REGISTER en échec
+    registrar_probe_sec: float = 15.0   # re-REGISTER de sonde (latence, santé) si plusieurs registrars, 0=off
+    registrar_probe_timeout_sec: float = 5.0
 
 
 @dataclass
@@ -83,12 +109,30 @@ class AudioConfig:
     clock_rate: int = 8000
     channel_count: int = 1
     bits_per_sample: int = 16
+    # ptime : annoncé dans le SDP (a=ptime), horloge du pont de conférence et
+    # taille de frame du port audio (10, 20, 30, 40 ou 60). Les réglages en
+    # "frames" ci-dessous et ailleurs sont exprimés en frames de 20ms et
+    # convertis (scaled_frames) pour garder les mêmes durées.
     frame_ms: int = 20
     ec_enabled: bool = True
     ec_tail_ms: int = 200
     vad_enabled: bool = False
     rx_gain: float = 0.0
     tx_gain: float = 0.0
+    # Chaîne DSP (numpy, optionnel) par sens — rx = client → WS, tx = WS → client.
+    # Aucun étage actif = aucun traitement sur le chemin audio.
+    rx_agc: bool = False
+    tx_agc: bool = False
+    agc_target_dbfs: float = -20.0
+    agc_max_gain_db: float = 24.0
+    rx_highpass_hz: float = 0.0         # 0 = désactivé (ex: 80 → DC + ronflette)
+    tx_highpass_hz: float = 0.0
+    rx_noise_gate_dbfs: float = 0.0     # 0 = désactivé (ex: -50)
+    tx_noise_gate_dbfs: float = 0.0
+    dsp_budget_us: int = 1000           # CPU max par 20ms d'audio, au-delà (1s d'affilée) la chaîne est court-circuitée
+    rx_queue_frames: int = 250          # audio client en attente de la session WS (5s), au-delà les plus anciennes sont perdues
+
+    REFERENCE_FRAME_MS = 20
 
     @property
     def samples_per_frame(self) -> int:
@@ -98,6 +142,16 @@ class AudioConfig:
     def bytes_per_frame(self) -> int:
         return self.samples_per_frame * (self.bits_per_sample // 8)
 
+    def bytes_to_ms(self, n: int) -> int:
+        """Durée (ms) de n octets de PCM à ce format."""
+        return n * self.frame_ms // self.bytes_per_frame
+
+    def scaled_frames(self, frames_20ms: int) -> int:
+        """Frames de frame_ms couvrant la durée de frames_20ms frames de 20ms (0 reste 0)."""
+        if frames_20ms <= 0:
+            return frames_20ms
+        return max(1, math.ceil(frames_20ms * self.REFERENCE_FRAME_MS / self.frame_ms))
+
 
 @dataclass
 class CallbackConfig:
@@ -106,11 +160,66 @@ class CallbackConfig:
     incoming_callback_url: str = ""
     callback_method: str = "POST"
     callback_timeout: float = 5.0
+    # Cache des décisions de l'incoming callback, clé (from, to)
+    incoming_cache_ttl_sec: float = 60.0        # 0 = pas de cache
+    incoming_cache_stale_sec: float = 300.0     # servi périmé pendant la revalidation
+    incoming_cache_reject_ttl_sec: float = 30.0 # cache négatif (action=reject)
+    incoming_cache_size: int = 1000             # entrées max (LRU)
     status_callback_events: list = field(default_factory=lambda: [
         "initiated", "ringing", "answered", "completed",
     ])
 
 
+@dataclass
+class AdmissionConfig:
+    """Contrôle d'admission dynamique (charge réelle du process).
+
+    Un nouvel appel est refusé dès qu'un signal dépasse son seuil, avant que
+    la qualité audio des appels en cours ne se dégrade. 0 = signal ignoré.
+    """
+    enabled: bool = True
+    max_loop_lag_ms: float = 50.0       # retard de la boucle asyncio
+    max_poll_latency_ms: float = 40.0   # retard du poll pjsip (au-delà du libHandleEvents)
+    max_rx_backlog_frames: int = 25     # frames SIP (de 20ms) en attente sur l'appel le plus en retard
+    max_cpu_percent: float = 85.0       # CPU du process (100 = un cœur)
+    sample_interval_sec: float = 0.5
+    retry_after_sec: int = 5            # Retry-After renvoyé aux appels refusés
+
+
+@dataclass
+class DialerConfig:
+    """File d'appels sortants (POST /api/calls/batch) — pacing côté bridge."""
+    cps: float = 1.0                # appels lancés par seconde, max
+    max_outbound: int = 0           # appels du dialer en cours simultanément (0 = max_concurrent_calls)
+    ring_timeout_sec: int = 30      # timeout sonnerie par défaut des appels en file
+    max_queued: int = 1000          # appels en attente, toutes campagnes confondues
+    batch_ttl_sec: float = 3600.0   # campagne terminée oubliée après N sec
+
+
+@dataclass
+class RuntimeConfig:
+    """Profil runtime Python — boucle asyncio, GC, bascule du GIL."""
+    uvloop: bool = False                # boucle uvloop (si installé)
+    gc_freeze: bool = False             # gc.freeze() après l'init : les objets
+                                        # de démarrage ne sont plus parcourus
+    gc_thresholds: Optional[tuple] = None   # (gen0, gen1, gen2), None = défaut Python
+    switch_interval_ms: float = 0.0     # sys.setswitchinterval, 0 = défaut (5ms)
+
+
+# Profils prédéfinis (--runtime-profile). low-latency : moins de pauses GC
+# pendant les callbacks média et bascule du GIL plus fréquente pour que le
+# thread pjsip (onFrameRequested) soit ordonnancé plus vite.
+RUNTIME_PROFILES = {
+    "default": RuntimeConfig(),
+    "low-latency": RuntimeConfig(
+        uvloop=True,
+        gc_freeze=True,
+        gc_thresholds=(10000, 20, 100),
+        switch_interval_ms=1.0,
+    ),
+}
+
+
 @dataclass
 class BridgeConfig:
     """Config globale du bridge SIP."""
@@ -118,8 +227,33 @@ class BridgeConfig:
     nat: NatConfig = field(default_factory=NatConfig)
     audio: AudioConfig = field(default_factory=AudioConfig)
     callbacks: CallbackConfig = field(default_factory=CallbackConfig)
+    admission: AdmissionConfig = field(default_factory=AdmissionConfig)
+    dialer: DialerConfig = field(default_factory=DialerConfig)
+    runtime: RuntimeConfig = field(default_factory=RuntimeConfig)
     # WebSocket cible (le serveur qui traite l'audio, ex: OpenAI proxy)
     ws_target: str = "ws://localhost:5050/media-stream"
+    # Pool de serveurs média (répartition des sessions) — vide = [ws_target].
+    # Entrées "url" ou "url*poids". Un wsTarget explicite (callback, POST
+    # /api/calls) contourne le pool.
+    ws_targets: list = field(default_factory=list)
+    ws_balance: str = "least-active"    # least-active | weighted
+    ws_eject_failures: int = 3          # échecs de connexion consécutifs → éjection
+    ws_eject_sec: float = 30.0          # durée d'éjection avant nouvel essai
+    ws_connect_timeout_sec: float = 5.0
+    # Format de l'audio sur le WS (voir _WsAudioFormat) : par défaut, et par
+    # cible (url → format). Un mediaFormat par appel (API, callback) prime.
+    ws_audio_format: str = "audio/x-mulaw;8000"
+    ws_target_formats: dict = field(default_factory=dict)
+    # Cibles secondaires en écoute seule (transcription live, QA) —
+    # reçoivent les mêmes events que ws_target, leurs messages sont ignorés
+    listen_targets: list = field(default_factory=list)
+    # Taille de la file par consommateur secondaire (en frames, 50 = 1s à 20ms)
+    listen_queue_frames: int = 50
+    # Reprise de session : si le WebSocket tombe sans event "stop", l'appel SIP
+    # est gardé et on se reconnecte (backoff) pendant au plus N secondes.
+    # L'audio du client est bufferisé (N frames, les plus anciennes abandonnées).
+    ws_resume_grace_sec: float = 10.0   # 0 = désactivé (fin d'appel immédiate)
+    ws_resume_buffer_frames: int = 250  # 5s (frames de 20ms)
     # Port de l'API REST
     api_port: int = 5060
     # Paramètres custom passés dans chaque WebSocket "start" event
@@ -128,11 +262,87 @@ class BridgeConfig:
     # Comportement
     auto_answer: bool = True
     max_call_duration: int = 600        # secondes, 0 = illimité
+    media_timeout_sec: int = 30         # raccroche si aucun audio SIP reçu depuis N sec, 0 = désactivé
+    record_ttl_sec: int = 30            # CallRecord gardé N sec après la fin de l'appel
+    rtp_stats_interval_sec: float = 5.0 # relevé des stats RTP/RTCP par appel, 0 = désactivé
     max_concurrent_calls: int = 0      # 0 = illimité
+    # Drain (SIGTERM ou POST /api/drain) : refuse les nouveaux appels et
+    # attend la fin des appels en cours au plus drain_timeout secondes.
+    drain_timeout: int = 300            # secondes, 0 = arrêt immédiat sur SIGTERM
+    drain_unregister: bool = True       # dé-enregistrer le compte SIP pendant le drain
+    # GET /api/events — historique pour la reprise (Last-Event-ID) et file
+    # max par abonné (au-delà, l'abonné est déconnecté et doit reprendre)
+    event_history: int = 1000
+    event_queue_size: int = 256
+    # GET /debug/profile — désactivé tant qu'aucun token n'est configuré
+    debug_token: str = ""
+    profile_max_seconds: int = 60
+    # Mode cluster — annuaire partagé des appels (SQLite) ; vide = désactivé.
+    # node_id / node_url par défaut : <hostname>:<api_port> / http://<hostname>:<api_port>
+    cluster_db: str = ""
+    node_id: str = ""
+    node_url: str = ""
+    cluster_heartbeat_sec: float = 2.0
+    cluster_node_ttl_sec: float = 10.0
+    # Traces d'appel (rejeu hors ligne, benchmarks/replay_trace.py) — un
+    # fichier <call_sid>.sbtrace par appel ; vide = désactivé. trace_audio
+    # garde aussi l'audio (µ-law, ~16 KB/s par appel) au lieu des seules tailles.
+    trace_dir: str = ""
+    trace_audio: bool = False
+    # Clips pré-rendus (mmap) : <clips_dir>/<custom_params[clips_key]>/<nom>.wav,
+    # repli <clips_dir>/<nom>.wav — vide = désactivé. greeting_clip est joué dès
+    # que le média est actif ("" = pas d'accueil) ; greeting_handoff : l'audio
+    # du WS passe à la suite de l'accueil (queue) ou le coupe (cut).
+    clips_dir: str = ""
+    clips_key: str = ""
+    greeting_clip: str = "greeting"
+    greeting_handoff: str = "queue"     # queue | cut
+
+
+# ============================================================
+# RUNTIME PROFILE
+# ============================================================
+
+def runtime_loop_factory(cfg: RuntimeConfig):
+    """Loop factory pour asyncio.run(..., loop_factory=...) — None = boucle par défaut."""
+    if not cfg.uvloop:
+        return None
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("uvloop demandé mais non installé (pip install uvloop) — boucle asyncio par défaut")
+        return None
+    return uvloop.new_event_loop
+
+
+def apply_runtime_profile(cfg: RuntimeConfig):
+    """Réglages process-wide à appliquer avant de démarrer le bridge."""
+    if cfg.gc_thresholds:
+        gc.set_threshold(*cfg.gc_thresholds)
+    if cfg.switch_interval_ms > 0:
+        sys.setswitchinterval(cfg.switch_interval_ms / 1000.0)
+
+
+def freeze_gc(cfg: RuntimeConfig):
+    """À appeler une fois l'init terminée : collecte puis gèle le tas de démarrage."""
+    if cfg.gc_freeze:
+        gc.collect()
+        gc.freeze()
+        logger.info(f"GC : {gc.get_freeze_count()} objets gelés")
+
+
+def runtime_status() -> dict:
+    loop = asyncio.get_running_loop()
+    return {
+        "loop": f"{type(loop).__module__}.{type(loop).__name__}",
+        "gc_thresholds": list(gc.get_threshold()),
+        "gc_frozen": gc.get_freeze_count(),
+        "switch_interval_ms": round(sys.getswitchinterval() * 1000, 3),
+    }
 
 
 # ============================================================
-# µ-LAW CODEC
+# CODECS G.711 — µ-law, A-law
 # ============================================================
 
 try:
@@ -144,6 +354,18 @@ try:
     def ulaw_to_pcm16(data: bytes) -> bytes:
         return audioop.ulaw2lin(data, 2)
 
+    def pcm16_to_alaw(pcm: bytes) -> bytes:
+        return audioop.lin2alaw(pcm, 2)
+
+    def alaw_to_pcm16(data: bytes) -> bytes:
+        return audioop.alaw2lin(data, 2)
+
+    # Rééchantillonnage de secours si numpy est absent (voir _Resampler)
+    _ratecv = audioop.ratecv
+
+    def _byteswap16(pcm: bytes) -> bytes:
+        return audioop.byteswap(pcm, 2)
+
     logger.info("Codec µ-law : audioop (C natif)")
 
 except ImportError:
@@ -176,9 +398,403 @@ except ImportError:
     def ulaw_to_pcm16(data: bytes) -> bytes:
         return struct.pack(f"<{len(data)}h", *[_dec(b) for b in data])
 
+    _ALAW_SEG_END = [0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF]
+
+    def _aenc(s: int) -> int:
+        s >>= 3
+        if s >= 0:
+            mask = 0xD5
+        else:
+            mask = 0x55
+            s = -s - 1
+        for seg, end in enumerate(_ALAW_SEG_END):
+            if s <= end:
+                break
+        else:
+            return 0x7F ^ mask
+        return ((seg << 4) | ((s >> (seg if seg >= 2 else 1)) & 0x0F)) ^ mask
+
+    def _adec(b: int) -> int:
+        b ^= 0x55
+        seg = (b & 0x70) >> 4
+        t = (b & 0x0F) << 4
+        if seg == 0:
+            t += 8
+        else:
+            t = (t + 0x108) << (seg - 1)
+        return t if b & 0x80 else -t
+
+    def pcm16_to_alaw(pcm: bytes) -> bytes:
+        return bytes(_aenc(s) for s in struct.unpack(f"<{len(pcm)//2}h", pcm))
+
+    def alaw_to_pcm16(data: bytes) -> bytes:
+        return struct.pack(f"<{len(data)}h", *[_adec(b) for b in data])
+
+    _ratecv = None
+
+    def _byteswap16(pcm: bytes) -> bytes:
+        a = array.array("h", pcm)
+        a.byteswap()
+        return a.tobytes()
+
     logger.info("Codec µ-law : fallback Python pur")
 
 
+# ============================================================
+# FORMAT AUDIO WS — µ-law / A-law / L16 / PCM, rééchantillonnage en flux
+# ============================================================
+
+class _WsAudioFormat:
+    """
+    Format de l'audio sur le WebSocket : encodage + fréquence. Écritures
+    acceptées : "audio/x-mulaw;8000", "audio/l16;rate=16000", "l16/24000",
+    "alaw", "pcm16/16000"... (fréquence par défaut : 8000).
+
+    audio/l16 est le L16 du MIME (RFC 2586 / 3551) : big-endian, ordre
+    réseau. audio/pcm est le PCM16 little-endian brut (s16le) qu'attendent
+    la plupart des moteurs STT/TTS.
+    """
+
+    __slots__ = ("encoding", "rate")
+
+    RATES = {
+        "audio/x-mulaw": (8000,),
+        "audio/x-alaw": (8000,),
+        "audio/l16": (8000, 16000, 24000),
+        "audio/pcm": (8000, 16000, 24000),
+    }
+    _ALIASES = {
+        "mulaw": "audio/x-mulaw", "ulaw": "audio/x-mulaw", "pcmu": "audio/x-mulaw",
+        "alaw": "audio/x-alaw", "pcma": "audio/x-alaw",
+        "l16": "audio/l16",
+        "pcm": "audio/pcm", "pcm16": "audio/pcm", "s16le": "audio/pcm", "linear16": "audio/pcm",
+    }
+
+    def __init__(self, encoding: str, rate: int):
+        self.encoding = encoding
+        self.rate = rate
+
+    @classmethod
+    def parse(cls, spec: str) -> "_WsAudioFormat":
+        """Lève ValueError si le format n'est pas supporté."""
+        name, sep, rate = spec.strip().lower().partition(";")
+        if not sep and not name.startswith("audio/"):
+            name, _, rate = name.partition("/")        # "l16/24000"
+        encoding = cls._ALIASES.get(name, name)
+        rate = rate.strip().removeprefix("rate=")
+        if encoding not in cls.RATES:
+            raise ValueError(f"format audio WS inconnu: {spec!r} (attendu: {', '.join(cls.RATES)})")
+        if not rate:
+            rate = cls.RATES[encoding][0]
+        elif not rate.isdigit() or int(rate) not in cls.RATES[encoding]:
+            raise ValueError(f"fréquence non supportée pour {encoding}: {rate} (attendu: {cls.RATES[encoding]})")
+        return cls(encoding, int(rate))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, _WsAudioFormat) and (self.encoding, self.rate) == (other.encoding, other.rate)
+
+    def __hash__(self) -> int:
+        return hash((self.encoding, self.rate))
+
+    def __str__(self) -> str:
+        return f"{self.encoding};{self.rate}"
+
+    def media_format(self) -> dict:
+        """Bloc "mediaFormat" de l'event start (même forme que Twilio)."""
+        return {"encoding": self.encoding, "sampleRate": self.rate, "channels": 1}
+
+
+class _Resampler:
+    """
+    Rééchantillonneur PCM16 mono en flux, rapport rationnel up/down
+    (8k ↔ 16k / 24k) : insertion de zéros, FIR passe-bas (sinc fenêtré
+    Kaiser, coupure à la plus basse des deux Nyquist), décimation. L'historique
+    du filtre et la phase de décimation passent d'un chunk au suivant : pas de
+    discontinuité aux frontières, chunks de taille quelconque, sortie identique
+    à un traitement d'un seul bloc. Sans numpy : audioop.ratecv (interpolation
+    linéaire, sans filtre).
+    """
+
+    TAPS_PER_PHASE = 32
+    _KAISER_BETA = 7.0
+
+    __slots__ = ("in_rate", "out_rate", "up", "down", "np", "_h", "_tail", "_phase", "_state")
+
+    def __init__(self, in_rate: int, out_rate: int):
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        g = math.gcd(in_rate, out_rate)
+        self.up, self.down = out_rate // g, in_rate // g
+        self._state = None
+        try:
+            import numpy as np
+        except ImportError:
+            if _ratecv is None:
+                raise RuntimeError("rééchantillonnage impossible : ni numpy ni audioop (pip install numpy)")
+            self.np = None
+            return
+        self.np = np
+        taps = self.TAPS_PER_PHASE * max(self.up, self.down)
+        cutoff = 0.5 / max(self.up, self.down)      # en cycles par échantillon sur-échantillonné
+        t = np.arange(taps) - (taps - 1) / 2
+        h = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(taps, self._KAISER_BETA)
+        self._h = h * (self.up / h.sum())           # gain unité malgré les zéros insérés
+        self._tail = np.zeros(taps - 1)
+        self._phase = 0
+
+    def process(self, pcm: bytes) -> bytes:
+        if self.np is None:
+            out, self._state = _ratecv(pcm, 2, 1, self.in_rate, self.out_rate, self._state)
+            return out
+        np = self.np
+        x = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2)
+        if self.up > 1:
+            u = np.zeros(len(x) * self.up)
+            u[::self.up] = x
+        else:
+            u = x
+        # Un seul np.convolve par chunk : moins cher ici qu'un polyphase en
+        # plusieurs appels numpy, vu la taille des frames
+        buf = np.concatenate((self._tail, u))
+        self._tail = buf[len(u):]
+        y = np.convolve(buf, self._h, "valid")[self._phase::self.down]
+        self._phase = (self._phase - len(u)) % self.down
+        return np.clip(np.rint(y), -32768, 32767).astype("<i2").tobytes()
+
+
+class _WsAudioCodec:
+    """
+    Conversion PCM16 du port (clock_rate) ↔ format WS, une instance par
+    session (état des rééchantillonneurs). encode : port → WS, decode :
+    WS → port. native = µ-law au clock rate du port : les fonctions G.711
+    directement, aucun coût ajouté au chemin historique.
+    """
+
+    __slots__ = ("format", "native", "encode", "decode", "_up", "_down", "_g711_enc", "_g711_dec", "_swap")
+
+    _G711 = {
+        "audio/x-mulaw": (pcm16_to_ulaw, ulaw_to_pcm16),
+        "audio/x-alaw": (pcm16_to_alaw, alaw_to_pcm16),
+    }
+
+    def __init__(self, fmt: _WsAudioFormat, clock_rate: int):
+        self.format = fmt
+        self._g711_enc, self._g711_dec = self._G711.get(fmt.encoding, (None, None))
+        # Le PCM du port est little-endian ; L16 circule en ordre réseau
+        self._swap = fmt.encoding == "audio/l16"
+        resample = fmt.rate != clock_rate
+        self._up = _Resampler(clock_rate, fmt.rate) if resample else None
+        self._down = _Resampler(fmt.rate, clock_rate) if resample else None
+        self.native = fmt.encoding == "audio/x-mulaw" and not resample
+        if self._g711_enc is not None and not resample:
+            self.encode, self.decode = self._g711_enc, self._g711_dec
+        else:
+            self.encode, self.decode = self._encode, self._decode
+
+    def _encode(self, pcm: bytes) -> bytes:
+        if self._up is not None:
+            pcm = self._up.process(pcm)
+        if self._g711_enc is not None:
+            return self._g711_enc(pcm)
+        # audio/pcm : tel quel ; audio/l16 : big-endian
+        return _byteswap16(pcm) if self._swap else pcm
+
+    def _decode(self, data: bytes) -> bytes:
+        if self._g711_dec is not None:
+            pcm = self._g711_dec(data)
+        else:
+            pcm = data[:len(data) & ~1]
+            if self._swap:
+                pcm = _byteswap16(pcm)
+        return self._down.process(pcm) if self._down is not None else pcm
+
+
+# ============================================================
+# DSP — Gain, AGC, passe-haut, noise gate (numpy)
+# ============================================================
+
+class _DspChain:
+    """
+    Chaîne DSP d'un sens audio sur du PCM16 : passe-haut → gain → gate → AGC.
+
+    N'est créée (for_direction) que si au moins un étage est actif ; numpy est
+    importé à ce moment-là seulement. Le coût CPU est mesuré à chaque appel,
+    ramené à 20ms d'audio : au-delà de dsp_budget_us pendant 1s d'affilée, la
+    chaîne se court-circuite pour ne jamais faire prendre de retard au média.
+    """
+
+    _HP_BLOCK = 32              # passe-haut vectorisé par blocs (borne a^-k)
+    _AGC_FLOOR_DBFS = -55.0     # en dessous : silence, l'AGC ne remonte pas le bruit
+    # Constantes par frame de 20ms, converties selon frame_ms dans __init__
+    _AGC_ATTACK = 0.5           # fraction du chemin vers le gain cible par frame (baisse)
+    _AGC_RELEASE = 0.05         # idem en hausse — lent, pas de pompage
+    _GATE_FLOOR = 0.03          # atténuation gate fermé (~ -30 dB)
+    _GATE_HOLD_FRAMES = 10      # gate gardé ouvert 200ms après la voix
+    _OVER_BUDGET_FRAMES = 50
+
+    _numpy_warned = False
+
+    @classmethod
+    def for_direction(cls, direction: str, cfg: AudioConfig) -> Optional["_DspChain"]:
+        gain_db = cfg.rx_gain if direction == "rx" else cfg.tx_gain
+        agc = cfg.rx_agc if direction == "rx" else cfg.tx_agc
+        highpass_hz = cfg.rx_highpass_hz if direction == "rx" else cfg.tx_highpass_hz
+        gate_dbfs = cfg.rx_noise_gate_dbfs if direction == "rx" else cfg.tx_noise_gate_dbfs
+        if not (gain_db or agc or highpass_hz > 0 or gate_dbfs < 0):
+            return None
+        try:
+            import numpy
+        except ImportError:
+            if not cls._numpy_warned:
+                cls._numpy_warned = True
+                logger.warning("DSP audio configuré mais numpy absent (pip install numpy) — traitement désactivé")
+            return None
+        return cls(direction, cfg, numpy, gain_db, agc, highpass_hz, gate_dbfs)
+
+    def __init__(self, direction: str, cfg: AudioConfig, np, gain_db: float,
+                 agc: bool, highpass_hz: float, gate_dbfs: float):
+        self.np = np
+        self.direction = direction
+        self.frame_bytes = cfg.bytes_per_frame
+        scale = cfg.frame_ms / cfg.REFERENCE_FRAME_MS
+        self.budget_us = round(cfg.dsp_budget_us * scale)
+        self._agc_attack = 1 - (1 - self._AGC_ATTACK) ** scale
+        self._agc_release = 1 - (1 - self._AGC_RELEASE) ** scale
+        self._gate_hold_frames = cfg.scaled_frames(self._GATE_HOLD_FRAMES)
+        self._over_budget_frames = cfg.scaled_frames(self._OVER_BUDGET_FRAMES)
+        self.stages = []
+
+        self._gain = 10 ** (gain_db / 20) if gain_db else None
+        if self._gain is not None:
+            self.stages.append(f"gain({gain_db:+g}dB)")
+
+        self._hp_a = None
+        if highpass_hz > 0:
+            rc = 1.0 / (2 * math.pi * highpass_hz)
+            a = rc / (rc + 1.0 / cfg.clock_rate)
+            k = np.arange(self._HP_BLOCK)
+            self._hp_a = a
+            self._hp_pow = a ** k           # a^n
+            self._hp_inv = a ** -k          # a^-k
+            self._hp_x1 = 0.0               # dernier échantillon d'entrée
+            self._hp_y1 = 0.0               # dernier échantillon de sortie
+            self.stages.insert(0, f"highpass({highpass_hz:g}Hz)")
+
+        self._gate = None
+        if gate_dbfs < 0:
+            self._gate = 32768 * 10 ** (gate_dbfs / 20)
+            self._gate_gain = 1.0
+            self._gate_hold = 0
+            self.stages.append(f"gate({gate_dbfs:g}dBFS)")
+
+        self._agc = agc
+        if agc:
+            self._agc_target = 32768 * 10 ** (cfg.agc_target_dbfs / 20)
+            self._agc_floor = 32768 * 10 ** (self._AGC_FLOOR_DBFS / 20)
+            self._agc_max = 10 ** (cfg.agc_max_gain_db / 20)
+            self._agc_gain = 1.0
+            self.stages.append(f"agc({cfg.agc_target_dbfs:g}dBFS)")
+
+        self.frames = 0
+        self.total_us = 0.0
+        self.max_us = 0.0
+        self.bypassed = False
+        self._over_streak = 0
+
+    def process(self, pcm: bytes) -> bytes:
+        if self.bypassed or len(pcm) < 2:
+            return pcm
+        t0 = time.perf_counter()
+        np = self.np
+        x = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2).astype(np.float64)
+
+        if self._hp_a is not None:
+            x = self._highpass(x)
+        if self._gain is not None:
+            x *= self._gain
+        # Gate avant l'AGC : il juge le niveau réel, pas le bruit déjà remonté
+        if self._gate is not None:
+            x = self._apply_gate(x)
+        if self._agc:
+            x = self._apply_agc(x)
+
+        out = np.clip(x, -32768, 32767).astype("<i2").tobytes()
+        self._account((time.perf_counter() - t0) * 1e6 * self.frame_bytes / len(pcm))
+        return out
+
+    def _highpass(self, x):
+        """Passe-haut 1er ordre y[n] = a·(y[n-1] + x[n] - x[n-1]), vectorisé par blocs."""
+        np = self.np
+        a = self._hp_a
+        d = np.empty_like(x)
+        d[0] = x[0] - self._hp_x1
+        d[1:] = x[1:] - x[:-1]
+        d *= a
+        y = np.empty_like(x)
+        y_prev = self._hp_y1
+        for start in range(0, len(x), self._HP_BLOCK):
+            blk = d[start:start + self._HP_BLOCK]
+            n = len(blk)
+            # y[n] = a^(n+1)·y_prev + a^n·Σ a^-k·d[k]
+            acc = np.cumsum(blk * self._hp_inv[:n])
+            y[start:start + n] = self._hp_pow[:n] * (a * y_prev + acc)
+            y_prev = y[start + n - 1]
+        self._hp_x1 = x[-1]
+        self._hp_y1 = y_prev
+        return y
+
+    def _apply_agc(self, x):
+        np = self.np
+        rms = math.sqrt(float(np.dot(x, x)) / len(x))
+        prev = self._agc_gain
+        if rms > self._agc_floor:
+            target = min(self._agc_max, self._agc_target / rms)
+            rate = self._agc_attack if target < prev else self._agc_release
+            self._agc_gain = prev + (target - prev) * rate
+        if prev == self._agc_gain:
+            return x * prev
+        return x * np.linspace(prev, self._agc_gain, len(x))
+
+    def _apply_gate(self, x):
+        np = self.np
+        rms = math.sqrt(float(np.dot(x, x)) / len(x))
+        if rms >= self._gate:
+            self._gate_hold = self._gate_hold_frames
+        elif self._gate_hold > 0:
+            self._gate_hold -= 1
+        prev = self._gate_gain
+        self._gate_gain = 1.0 if self._gate_hold > 0 else self._GATE_FLOOR
+        if prev == self._gate_gain:
+            return x if prev == 1.0 else x * prev
+        return x * np.linspace(prev, self._gate_gain, len(x))
+
+    def _account(self, us_per_frame: float):
+        self.frames += 1
+        self.total_us += us_per_frame
+        if us_per_frame > self.max_us:
+            self.max_us = us_per_frame
+        if self.budget_us and us_per_frame > self.budget_us:
+            self._over_streak += 1
+            if self._over_streak >= self._over_budget_frames:
+                self.bypassed = True
+                logger.warning(
+                    f"DSP {self.direction} court-circuité : {us_per_frame:.0f}µs/frame "
+                    f"> budget {self.budget_us}µs depuis {self._over_streak} frames"
+                )
+        else:
+            self._over_streak = 0
+
+    def stats(self) -> dict:
+        return {
+            "stages": self.stages,
+            "frames": self.frames,
+            "avg_us": round(self.total_us / self.frames, 1) if self.frames else 0.0,
+            "max_us": round(self.max_us, 1),
+            "agc_gain_db": round(20 * math.log10(self._agc_gain), 1) if self._agc else None,
+            "bypassed": self.bypassed,
+        }
+
+
 # ============================================================
 # PJSIP — Import conditionnel
 # ============================================================
@@ -190,9 +806,7 @@ except ImportError:
     HAS_PJSIP = False
     logger.error("pjsua2 non disponible ! Voir sip-service/README.md")
 
-try:
-    import websockets
-except ImportError:
+if importlib.util.find_spec("websockets") is None:
     raise ImportError("pip install websockets")
 
 
@@ -286,7 +900,7 @@ def _normalize_number(number: str) -> str:
     return number
 
 
-@dataclass
+@dataclass(slots=True)
 class CallRecord:
     """Suivi d'un appel (compatible Twilio)."""
     sid: str
@@ -301,6 +915,8 @@ class CallRecord:
     duration_sec: int = 0
     ws_target: str = ""
     callback_url: str = ""
+    listen_targets: list = field(default_factory=list)
+    quality: Optional[dict] = None      # dernier relevé RTP/RTCP (_RtpStats)
     _call_ref: Any = field(default=None, repr=False)
 
     def __post_init__(self):
@@ -319,10 +935,1712 @@ class CallRecord:
             "endedAt": self.ended_at,
             "durationSec": self.duration_sec,
             "customParams": self.custom_params,
+            "listenTargets": self.listen_targets,
+            "quality": self.quality,
         }
         return d
 
 
+# ============================================================
+# TIMER WHEEL — Timeouts de tous les appels sur une seule tâche
+# ============================================================
+
+class _TimerHandle:
+    __slots__ = ("callback", "args", "rounds", "cancelled")
+
+    def __init__(self, callback, args: tuple, rounds: int):
+        self.callback = callback
+        self.args = args
+        self.rounds = rounds
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class _TimerWheel:
+    """
+    Roue de timers hachée : une seule coroutine avance d'un slot par tick et
+    ne déclenche que les timers de ce slot. Le coût par appel est constant
+    (insertion O(1), annulation O(1) paresseuse) au lieu d'un réveil par
+    appel et par seconde.
+
+    Types de timers : durée max, timeout sonnerie, inactivité média,
+    éviction des CallRecord terminés. Résolution = tick_sec.
+
+    Non thread-safe : schedule() doit être appelé depuis la boucle asyncio
+    (depuis un callback pjsip, passer par loop.call_soon_threadsafe).
+    """
+
+    def __init__(self, tick_sec: float = 0.25, slots: int = 512):
+        self.tick_sec = tick_sec
+        self._slots: list[list[_TimerHandle]] = [[] for _ in range(slots)]
+        self._cursor = 0
+        self.fired = 0
+
+    def schedule(self, delay: float, callback, *args) -> _TimerHandle:
+        ticks = max(1, math.ceil(delay / self.tick_sec))
+        n = len(self._slots)
+        handle = _TimerHandle(callback, args, (ticks - 1) // n)
+        self._slots[(self._cursor + ticks) % n].append(handle)
+        return handle
+
+    def _advance(self):
+        self._cursor = (self._cursor + 1) % len(self._slots)
+        slot = self._slots[self._cursor]
+        if not slot:
+            return
+        keep = []
+        due = []
+        for handle in slot:
+            if handle.cancelled:
+                continue
+            if handle.rounds > 0:
+                handle.rounds -= 1
+                keep.append(handle)
+            else:
+                due.append(handle)
+        self._slots[self._cursor] = keep
+        for handle in due:
+            self.fired += 1
+            try:
+                handle.callback(*handle.args)
+            except Exception as e:
+                logger.error(f"Timer {getattr(handle.callback, '__name__', handle.callback)}: {e}")
+
+    async def run(self, stop_event: asyncio.Event):
+        next_tick = time.monotonic() + self.tick_sec
+        while not stop_event.is_set():
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Rattrape les ticks manqués si la boucle a pris du retard
+            while next_tick <= time.monotonic():
+                self._advance()
+                next_tick += self.tick_sec
+
+    def pending(self) -> int:
+        return sum(1 for slot in self._slots for h in slot if not h.cancelled)
+
+
+# ============================================================
+# ADMISSION CONTROL — Shedding sur signaux runtime
+# ============================================================
+
+class _AdmissionController:
+    """
+    Échantillonne la charge du process et décide si un nouvel appel peut
+    être accepté. Les signaux sont lissés (EWMA) pour éviter le flapping :
+      - loop_lag_ms      : retard de réveil de la boucle asyncio
+      - poll_latency_ms  : retard d'un cycle pjsip_poll (hors attente 10ms)
+      - rx_backlog       : frames SIP non consommées sur l'appel le plus en retard
+      - cpu_percent      : CPU du process sur la dernière période
+    """
+
+    _ALPHA = 0.3
+
+    def __init__(self, bridge: "SipBridge", cfg: AdmissionConfig):
+        self.bridge = bridge
+        self.cfg = cfg
+        self.signals = {
+            "loop_lag_ms": 0.0,
+            "poll_latency_ms": 0.0,
+            "rx_backlog": 0,
+            "cpu_percent": 0.0,
+        }
+        self.shed_total = {CallDirection.INBOUND.value: 0, CallDirection.OUTBOUND.value: 0}
+        self.last_shed_at: Optional[str] = None
+        self.last_shed_reason: str = ""
+
+    def _smooth(self, key: str, value: float):
+        self.signals[key] = round(
+            self._ALPHA * value + (1 - self._ALPHA) * self.signals[key], 2
+        )
+
+    def record_poll(self, round_trip_ms: float, wait_ms: float):
+        """Called by the poll loop after each pjsip_poll round trip."""
+        self._smooth("poll_latency_ms", max(0.0, round_trip_ms - wait_ms))
+
+    def _rx_backlog(self) -> int:
+        worst = 0
+        for r in list(self.bridge.active_calls.values()):
+            port = getattr(r._call_ref, "audio_port", None)
+            if port is not None:
+                worst = max(worst, port.rx_backlog())
+        return worst
+
+    async def monitor(self, stop_event: asyncio.Event):
+        interval = self.cfg.sample_interval_sec
+        last_wall = time.monotonic()
+        last_cpu = time.process_time()
+        while not stop_event.is_set():
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            self._smooth("loop_lag_ms", max(0.0, (now - expected) * 1000))
+            cpu = time.process_time()
+            if now > last_wall:
+                self._smooth("cpu_percent", (cpu - last_cpu) / (now - last_wall) * 100)
+            last_wall, last_cpu = now, cpu
+            self.signals["rx_backlog"] = self._rx_backlog()
+
+    def overload_reasons(self) -> list[str]:
+        if not self.cfg.enabled:
+            return []
+        sig, cfg = self.signals, self.cfg
+        checks = (
+            ("loop_lag_ms", cfg.max_loop_lag_ms),
+            ("poll_latency_ms", cfg.max_poll_latency_ms),
+            ("rx_backlog", self.bridge.config.audio.scaled_frames(cfg.max_rx_backlog_frames)),
+            ("cpu_percent", cfg.max_cpu_percent),
+        )
+        return [
+            f"{key}={sig[key]} > {limit}"
+            for key, limit in checks
+            if limit and sig[key] > limit
+        ]
+
+    def admit(self, direction: CallDirection) -> Optional[str]:
+        """Return None if the call may proceed, else the shedding reason."""
+        reasons = self.overload_reasons()
+        if not reasons:
+            return None
+        reason = ", ".join(reasons)
+        self.shed_total[direction.value] += 1
+        self.last_shed_at = datetime.now(timezone.utc).isoformat()
+        self.last_shed_reason = reason
+        logger.warning(f"[ADMISSION] Appel {direction.value} refusé — surcharge ({reason})")
+        return reason
+
+    def status(self) -> dict:
+        reasons = self.overload_reasons()
+        return {
+            "enabled": self.cfg.enabled,
+            "shedding": bool(reasons),
+            "reasons": reasons,
+            "signals": dict(self.signals),
+            "thresholds": {
+                "loop_lag_ms": self.cfg.max_loop_lag_ms,
+                "poll_latency_ms": self.cfg.max_poll_latency_ms,
+                "rx_backlog": self.bridge.config.audio.scaled_frames(self.cfg.max_rx_backlog_frames),
+                "cpu_percent": self.cfg.max_cpu_percent,
+            },
+            "shed_total": dict(self.shed_total),
+            "last_shed_at": self.last_shed_at,
+            "last_shed_reason": self.last_shed_reason,
+        }
+
+
+# ============================================================
+# DIALER — File d'appels sortants avec pacing
+# ============================================================
+
+class _DialJob:
+    """Un appel d'une campagne : queued → dialing → in-progress → done | failed | cancelled."""
+
+    def __init__(self, batch_id: str, index: int, req: "_MakeCallRequest"):
+        self.batch_id = batch_id
+        self.index = index
+        self.req = req
+        self.state = "queued"
+        self.sid: Optional[str] = None
+        self.status: Optional[str] = None   # CallStatus final
+        self.error: str = ""
+
+    def to_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "to": self.req.to,
+            "sid": self.sid,
+            "state": self.state,
+            "status": self.status,
+            "error": self.error or None,
+        }
+
+
+class _DialBatch:
+    def __init__(self, batch_id: str, priority: int):
+        self.batch_id = batch_id
+        self.priority = priority
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        self.jobs: list[_DialJob] = []
+        self.finished_at: Optional[float] = None    # monotonic, relevé par _Dialer
+
+    @property
+    def finished(self) -> bool:
+        return all(job.state in ("done", "failed", "cancelled") for job in self.jobs)
+
+    def to_dict(self, with_calls: bool = True) -> dict:
+        counts = {"queued": 0, "dialing": 0, "in-progress": 0, "done": 0, "failed": 0, "cancelled": 0}
+        results: dict[str, int] = {}
+        for job in self.jobs:
+            counts[job.state] += 1
+            if job.state == "done" and job.status:
+                results[job.status] = results.get(job.status, 0) + 1
+        d = {
+            "batchId": self.batch_id,
+            "priority": self.priority,
+            "createdAt": self.created_at,
+            "total": len(self.jobs),
+            "counts": counts,
+            "results": results,
+            "finished": counts["queued"] + counts["dialing"] + counts["in-progress"] == 0,
+        }
+        if with_calls:
+            d["calls"] = [job.to_dict() for job in self.jobs]
+        return d
+
+
+class _Dialer:
+    """
+    File de priorité des appels sortants en campagne (rappels commande prête,
+    confirmations de réservation...). Le trunk throttle les rafales : le
+    pacing (CPS) et la fenêtre d'appels simultanés sont appliqués ici.
+
+    Les appels sont défilés automatiquement quand une place se libère
+    (notifié par on_call_ended depuis onCallState).
+    """
+
+    def __init__(self, bridge: "SipBridge", cfg: DialerConfig):
+        self.bridge = bridge
+        self.cfg = cfg
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._queued = 0        # jobs à l'état "queued" (la PriorityQueue garde les annulés)
+        self._seq = 0
+        self._batches: dict[str, _DialBatch] = {}
+        self._in_flight: dict[str, _DialJob] = {}   # sid → job
+        self._slot_freed = asyncio.Event()
+        self._last_dial = 0.0
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def window(self) -> int:
+        return self.cfg.max_outbound or self.bridge.config.max_concurrent_calls
+
+    def queued_count(self) -> int:
+        return self._queued
+
+    def _expire_batches(self):
+        """Oublie les campagnes terminées depuis plus de batch_ttl_sec."""
+        now = time.monotonic()
+        for batch_id, batch in list(self._batches.items()):
+            if batch.finished_at is None:
+                if batch.finished:
+                    batch.finished_at = now
+            elif now - batch.finished_at > self.cfg.batch_ttl_sec:
+                del self._batches[batch_id]
+
+    def submit(self, calls: list, priority: int, ring_timeout_sec: Optional[int]) -> _DialBatch:
+        if self.queued_count() + len(calls) > self.cfg.max_queued:
+            raise HTTPException(429, f"File du dialer pleine ({self.cfg.max_queued} appels max)")
+        self._expire_batches()
+        batch = _DialBatch(str(uuid.uuid4()), priority)
+        timeout = self.cfg.ring_timeout_sec if ring_timeout_sec is None else ring_timeout_sec
+        for i, req in enumerate(calls):
+            if "timeout_sec" not in req.model_fields_set:
+                req.timeout_sec = timeout
+            job = _DialJob(batch.batch_id, i, req)
+            batch.jobs.append(job)
+            self._seq += 1
+            self._queue.put_nowait((priority, self._seq, job))
+        self._queued += len(calls)
+        self._batches[batch.batch_id] = batch
+        logger.info(f"[DIALER] Campagne {batch.batch_id[:8]} : {len(calls)} appel(s), priorité {priority}")
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run())
+        return batch
+
+    def get(self, batch_id: str) -> Optional[_DialBatch]:
+        self._expire_batches()
+        return self._batches.get(batch_id)
+
+    def cancel(self, batch_id: str) -> int:
+        """Annule les appels encore en file (les appels lancés continuent)."""
+        batch = self._batches.get(batch_id)
+        if not batch:
+            return 0
+        cancelled = 0
+        for job in batch.jobs:
+            if job.state == "queued":
+                job.state = "cancelled"
+                cancelled += 1
+        self._queued -= cancelled
+        return cancelled
+
+    def on_call_ended(self, call_sid: str, final_status: CallStatus):
+        """Appelé dans la boucle asyncio quand un appel se termine."""
+        job = self._in_flight.pop(call_sid, None)
+        if job:
+            job.state = "done"
+            job.status = final_status.value
+            self._slot_freed.set()
+
+    async def _wait_for_slot(self):
+        while True:
+            window = self.window
+            if window <= 0 or len(self._in_flight) < window:
+                return
+            self._slot_freed.clear()
+            try:
+                await asyncio.wait_for(self._slot_freed.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self):
+        while not self._queue.empty():
+            priority, seq, job = await self._queue.get()
+            if job.state != "queued":
+                continue
+            if self.bridge.draining:
+                job.state = "cancelled"
+                job.error = "drain"
+                self._queued -= 1
+                continue
+
+            await self._wait_for_slot()
+            if self.cfg.cps > 0:
+                delay = self._last_dial + 1.0 / self.cfg.cps - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if job.state != "queued":
+                continue
+
+            job.state = "dialing"
+            self._queued -= 1
+            self._last_dial = time.monotonic()
+            try:
+                result = await self.bridge.originate(job.req)
+            except HTTPException as e:
+                if e.status_code == 429:
+                    # Capacité ou surcharge : on remet en file et on patiente,
+                    # au plus retry_after_sec si une place se libère avant
+                    job.state = "queued"
+                    self._queued += 1
+                    self._queue.put_nowait((priority, seq, job))
+                    self._slot_freed.clear()
+                    try:
+                        await asyncio.wait_for(self._slot_freed.wait(),
+                                               timeout=self.bridge.config.admission.retry_after_sec)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                job.state = "failed"
+                job.error = str(e.detail)
+                continue
+            except Exception as e:
+                job.state = "failed"
+                job.error = str(e)
+                continue
+
+            job.sid = result["sid"]
+            record = self.bridge.active_calls.get(job.sid)
+            if record and record.status in (
+                CallStatus.COMPLETED, CallStatus.FAILED, CallStatus.BUSY,
+                CallStatus.NO_ANSWER, CallStatus.CANCELLED,
+            ):
+                # Terminé pendant le callback "initiated"
+                job.state = "done"
+                job.status = record.status.value
+                continue
+            job.state = "in-progress"
+            self._in_flight[job.sid] = job
+        logger.info("[DIALER] File vide")
+
+    def status(self) -> dict:
+        self._expire_batches()
+        return {
+            "queued": self.queued_count(),
+            "in_flight": len(self._in_flight),
+            "window": self.window,
+            "cps": self.cfg.cps,
+            "batches": len(self._batches),
+        }
+
+
+# ============================================================
+# INCOMING DECISION CACHE — TTL + stale-while-revalidate
+# ============================================================
+
+class _DecisionCache:
+    """
+    Cache LRU borné des décisions de l'incoming callback, clé (from, to).
+
+    - entrée fraîche          → hit, pas d'appel réseau
+    - entrée périmée (stale)  → servie immédiatement, revalidée en tâche de fond
+    - absente / trop vieille  → miss, appel réseau sur le chemin d'établissement
+    Les rejets (numéro bloqué...) sont mis en cache avec leur propre TTL.
+    Les erreurs réseau ne sont jamais mises en cache.
+    """
+
+    def __init__(self, cfg: CallbackConfig):
+        self.cfg = cfg
+        # key → (decision, fresh_until, stale_until)
+        self._entries: "OrderedDict[tuple, tuple[dict, float, float]]" = OrderedDict()
+        self._refreshing: set = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.cfg.incoming_cache_ttl_sec > 0 and self.cfg.incoming_cache_size > 0
+
+    def lookup(self, key: tuple) -> tuple[Optional[dict], bool]:
+        """Return (decision, needs_refresh). decision is None on miss."""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is None or now >= entry[2]:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None, False
+        self._entries.move_to_end(key)
+        decision, fresh_until, _ = entry
+        if now < fresh_until:
+            self.hits += 1
+            return dict(decision), False
+        self.stale_hits += 1
+        return dict(decision), key not in self._refreshing
+
+    def store(self, key: tuple, decision: dict):
+        if decision.get("action") == "reject":
+            ttl = self.cfg.incoming_cache_reject_ttl_sec
+        else:
+            ttl = self.cfg.incoming_cache_ttl_sec
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        self._entries[key] = (dict(decision), now + ttl, now + ttl + self.cfg.incoming_cache_stale_sec)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.cfg.incoming_cache_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, caller: str = "", callee: str = "") -> int:
+        """Drop entries matching caller and/or callee (all if both empty)."""
+        keys = [
+            k for k in self._entries
+            if (not caller or k[0] == caller) and (not callee or k[1] == callee)
+        ]
+        for k in keys:
+            del self._entries[k]
+        return len(keys)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.cfg.incoming_cache_size,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+        }
+
+
+# ============================================================
+# REGISTRARS — Enregistrement parallèle + routage sortant
+# ============================================================
+
+class _Registrar:
+    __slots__ = (
+        "uri", "account", "registered", "latency_ms", "code", "reason",
+        "probe_at", "probes", "timeouts", "failures", "since",
+    )
+
+    def __init__(self, uri: str):
+        self.uri = uri
+        self.account: Optional[Any] = None      # _SipAccountHandler
+        self.registered = False
+        self.latency_ms: Optional[float] = None  # EWMA REGISTER → réponse
+        self.code = 0
+        self.reason = ""
+        self.probe_at: Optional[float] = None    # REGISTER en attente de réponse
+        self.probes = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.since = time.monotonic()            # dernier changement d'état
+
+
+class _RegistrarSet:
+    """
+    Un compte pjsip par registrar, tous enregistrés en parallèle : la perte
+    d'un registrar ne coupe pas les appels entrants, et les appels sortants
+    basculent aussitôt sur le plus rapide des registrars encore enregistrés.
+
+    Avec plusieurs registrars, monitor() renvoie un REGISTER toutes les
+    registrar_probe_sec : la réponse donne la latence, son absence au-delà
+    de registrar_probe_timeout_sec marque le registrar hors service sans
+    attendre le timeout de transaction pjsip (32s) ni reg_timeout.
+    """
+
+    _LATENCY_ALPHA = 0.3
+
+    def __init__(self, bridge: "SipBridge", cfg: SipConfig):
+        self.bridge = bridge
+        self.cfg = cfg
+        self.registrars = [
+            _Registrar(uri if uri.startswith(("sip:", "sips:")) else f"sip:{uri}")
+            for uri in (cfg.registrars or [cfg.domain])
+        ]
+        self._route: Optional[_Registrar] = None
+
+    @property
+    def multi(self) -> bool:
+        return len(self.registrars) > 1
+
+    @property
+    def registered(self) -> bool:
+        return any(r.registered for r in self.registrars)
+
+    @property
+    def accounts(self) -> list:
+        return [r.account for r in self.registrars if r.account is not None]
+
+    def route(self) -> Optional[_Registrar]:
+        """Registrar des appels sortants : le plus rapide des enregistrés (sinon le premier)."""
+        healthy = [r for r in self.registrars if r.registered and r.account is not None]
+        if healthy:
+            return min(healthy, key=lambda r: r.latency_ms if r.latency_ms is not None else float("inf"))
+        return next((r for r in self.registrars if r.account is not None), None)
+
+    def sent(self, reg: _Registrar):
+        """REGISTER envoyé (création du compte ou sonde)."""
+        if reg.probe_at is None:
+            reg.probe_at = time.monotonic()
+            reg.probes += 1
+
+    def update(self, reg: _Registrar, active: bool, code: int, reason: str):
+        """onRegState (thread pjsip)."""
+        now = time.monotonic()
+        if reg.probe_at is not None:
+            latency = (now - reg.probe_at) * 1000
+            reg.probe_at = None
+            if active:
+                reg.latency_ms = latency if reg.latency_ms is None else (
+                    reg.latency_ms + self._LATENCY_ALPHA * (latency - reg.latency_ms)
+                )
+        if not active and code // 100 != 2:
+            reg.failures += 1
+        if active != reg.registered:
+            reg.since = now
+        reg.registered = active
+        reg.code, reg.reason = code, reason
+        self._check_route()
+
+    def expire(self):
+        """Sondes sans réponse dans le délai → registrar considéré hors service."""
+        now = time.monotonic()
+        for reg in self.registrars:
+            if reg.probe_at is not None and now - reg.probe_at > self.cfg.registrar_probe_timeout_sec:
+                reg.probe_at = None     # la prochaine sonde repart de zéro
+                reg.timeouts += 1
+                if reg.registered:
+                    was_registered = self.bridge._sip_registered
+                    reg.registered = False
+                    reg.since = now
+                    reg.code, reg.reason = 408, "probe timeout"
+                    logger.error(
+                        f"Registrar {reg.uri} sans réponse depuis "
+                        f"{self.cfg.registrar_probe_timeout_sec:g}s → hors service"
+                    )
+                    # Dans la boucle asyncio : publication directe
+                    self.bridge.events.publish("registration", self.changed(
+                        reg, was_registered, True, f"sip:{self.cfg.username}@{self.cfg.domain}", reg.code, reg.reason, 0,
+                    ))
+        self._check_route()
+
+    def changed(self, reg: _Registrar, was_registered: bool, was_up: bool,
+                uri: str, code: int, reason: str, expires_sec: int) -> dict:
+        """
+        Après un changement d'état de reg : recalcule la registration globale,
+        alerte si elle est perdue, et renvoie l'event "registration" à publier.
+        """
+        bridge = self.bridge
+        # Cache registration state for thread-safe access from /health
+        bridge._sip_registered = self.registered
+        # Alerte si on perd la registration (on était enregistré, on ne l'est plus)
+        # — sauf dé-enregistrement volontaire pendant un drain
+        if was_registered and not bridge._sip_registered and not bridge.draining:
+            logger.error(f"[ALERTE] Registration SIP PERDUE — les appels entrants ne seront plus recus ! (code {code}: {reason})")
+        elif was_up and not reg.registered and not bridge.draining:
+            logger.warning(f"Registrar {reg.uri} perdu — toujours enregistré via un autre registrar")
+        return {
+            "registered": bridge._sip_registered,
+            "uri": uri,
+            "registrar": reg.uri,
+            "registrarRegistered": reg.registered,
+            "code": code,
+            "reason": reason,
+            "expiresSec": expires_sec,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def _check_route(self):
+        route = self.route()
+        if route is not self._route:
+            previous, self._route = self._route, route
+            if previous is not None and route is not None:
+                logger.warning(f"Routage sortant : {previous.uri} → {route.uri}")
+
+    async def monitor(self, stop_event: asyncio.Event):
+        if not self.multi or self.cfg.registrar_probe_sec <= 0:
+            return
+        bridge = self.bridge
+
+        def probe():
+            bridge._register_pj_thread("registrar")
+            for reg in self.registrars:
+                if reg.account is None or bridge.draining:
+                    continue
+                self.sent(reg)
+                try:
+                    reg.account.setRegistration(True)
+                except Exception as e:
+                    logger.warning(f"Sonde REGISTER {reg.uri} échouée: {e}")
+
+        async def stopped(timeout: float) -> bool:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+            return True
+
+        while not await stopped(self.cfg.registrar_probe_sec):
+            if bridge.draining:
+                continue
+            await bridge.loop.run_in_executor(bridge._executor, probe)
+            if await stopped(self.cfg.registrar_probe_timeout_sec):
+                return
+            self.expire()
+
+    def status(self) -> list[dict]:
+        now = time.monotonic()
+        route = self._route
+        return [
+            {
+                "uri": r.uri,
+                "registered": r.registered,
+                "outbound_route": r is route,
+                "latency_ms": round(r.latency_ms, 1) if r.latency_ms is not None else None,
+                "code": r.code,
+                "reason": r.reason,
+                "probes": r.probes,
+                "timeouts": r.timeouts,
+                "failures": r.failures,
+                "state_for_sec": round(now - r.since, 1),
+            }
+            for r in self.registrars
+        ]
+
+
+# ============================================================
+# CLUSTER — Annuaire d'appels partagé entre nodes (SQLite)
+# ============================================================
+
+class _ClusterDirectory:
+    """
+    Chaque node publie sa charge et les appels qu'il porte dans une base
+    partagée (fichier SQLite en WAL sur un disque local) :
+
+      nodes(node_id, url, active_calls, max_calls, draining, updated_at)
+      calls(sid, node_id, status, updated_at)
+
+    Un node absent depuis cluster_node_ttl_sec est ignoré (crash). Les
+    requêtes sur un appel inconnu localement sont relayées au node
+    propriétaire ; POST /api/calls va au node le moins chargé. Les accès à
+    la base se font hors boucle (executor par défaut).
+
+    Un seul hôte : le WAL repose sur de la mémoire partagée (fichier -shm)
+    et ne fonctionne pas sur un système de fichiers réseau (NFS, SMB...).
+    """
+
+    FORWARD_HEADER = "X-Bridge-Forwarded"
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS nodes (node_id TEXT PRIMARY KEY, url TEXT NOT NULL, "
+        "active_calls INTEGER NOT NULL, max_calls INTEGER NOT NULL, draining INTEGER NOT NULL, "
+        "updated_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS calls (sid TEXT PRIMARY KEY, node_id TEXT NOT NULL, "
+        "status TEXT NOT NULL, updated_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS calls_node ON calls (node_id)",
+    )
+
+    def __init__(self, bridge: "SipBridge", config: BridgeConfig):
+        self.bridge = bridge
+        self.config = config
+        host = socket.gethostname()
+        self.node_id = config.node_id or f"{host}:{config.api_port}"
+        self.node_url = (config.node_url or f"http://{host}:{config.api_port}").rstrip("/")
+        self._conn = None
+        self._lock = threading.Lock()
+        # Dernier état des nodes vivants (rafraîchi à chaque heartbeat)
+        self.nodes: list[dict] = []
+        self.forwarded = 0
+        self.placed_remote = 0
+        self.errors = 0
+
+    def _db(self):
+        if self._conn is None:
+            import sqlite3
+            conn = sqlite3.connect(self.config.cluster_db, timeout=5.0,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for stmt in self._SCHEMA:
+                conn.execute(stmt)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    # ── Écritures (ce node) ───────────────────────────────
+
+    def _publish(self, calls: list[tuple[str, str]], active: int, draining: bool) -> list[dict]:
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute(
+                    "INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.node_id, self.node_url, active, self.config.max_concurrent_calls, int(draining), now),
+                )
+                db.execute("DELETE FROM calls WHERE node_id = ?", (self.node_id,))
+                db.executemany(
+                    "INSERT OR REPLACE INTO calls VALUES (?, ?, ?, ?)",
+                    [(sid, self.node_id, status, now) for sid, status in calls],
+                )
+                # Ménage des nodes disparus sans se désinscrire
+                stale = now - self.config.cluster_node_ttl_sec * 6
+                db.execute("DELETE FROM calls WHERE node_id IN (SELECT node_id FROM nodes WHERE updated_at < ?)", (stale,))
+                db.execute("DELETE FROM nodes WHERE updated_at < ?", (stale,))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            rows = db.execute(
+                "SELECT node_id, url, active_calls, max_calls, draining, updated_at FROM nodes "
+                "WHERE updated_at >= ?", (now - self.config.cluster_node_ttl_sec,),
+            ).fetchall()
+        return [
+            {"node_id": r[0], "url": r[1], "active_calls": r[2], "max_calls": r[3],
+             "draining": bool(r[4]), "updated_at": r[5]}
+            for r in rows
+        ]
+
+    def _claim(self, sid: str, status: str):
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO calls VALUES (?, ?, ?, ?)", (sid, self.node_id, status, time.time())
+            )
+
+    def claim(self, sid: str, status: str):
+        """Appel créé sur ce node : visible des autres sans attendre le heartbeat."""
+        fut = asyncio.ensure_future(self._run(self._claim, sid, status))
+        fut.add_done_callback(
+            lambda f: not f.cancelled() and f.exception()
+            and logger.warning(f"[CLUSTER] claim {sid[:8]}: {f.exception()}")
+        )
+
+    def leave(self):
+        """Arrêt : retire ce node et ses appels de l'annuaire (synchrone)."""
+        try:
+            with self._lock:
+                db = self._db()
+                db.execute("DELETE FROM calls WHERE node_id = ?", (self.node_id,))
+                db.execute("DELETE FROM nodes WHERE node_id = ?", (self.node_id,))
+        except Exception as e:
+            logger.warning(f"[CLUSTER] Désinscription échouée: {e}")
+
+    async def heartbeat(self, stop_event: asyncio.Event):
+        bridge = self.bridge
+        logger.info(f"[CLUSTER] Node {self.node_id} ({self.node_url}) → {self.config.cluster_db}")
+        while not stop_event.is_set():
+            calls = [(sid, r.status.value) for sid, r in bridge.active_calls.items()]
+            try:
+                self.nodes = await self._run(self._publish, calls, bridge.active_call_count(), bridge.draining)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"[CLUSTER] Heartbeat échoué: {e}")
+            try:
+                await asyncio.wait_for(stop_event.wait(), self.config.cluster_heartbeat_sec)
+            except asyncio.TimeoutError:
+                pass
+
+    # ── Lectures ──────────────────────────────────────────
+
+    def _lookup(self, sid: str) -> Optional[tuple[str, str]]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT c.node_id, n.url FROM calls c JOIN nodes n ON n.node_id = c.node_id "
+                "WHERE c.sid = ? AND n.updated_at >= ?",
+                (sid, time.time() - self.config.cluster_node_ttl_sec),
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    async def owner(self, sid: str) -> Optional[tuple[str, str]]:
+        """(node_id, url) du node qui porte l'appel, None si inconnu."""
+        try:
+            return await self._run(self._lookup, sid)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"[CLUSTER] Recherche {sid[:8]} échouée: {e}")
+            return None
+
+    def pick(self) -> Optional[dict]:
+        """Node le moins chargé (hors drain / plein) ; à égalité, ce node."""
+        def load(n):
+            return n["active_calls"] / n["max_calls"] if n["max_calls"] > 0 else float(n["active_calls"])
+        nodes = [
+            n for n in self.nodes
+            if not n["draining"] and not n.get("refused")
+            and (n["max_calls"] <= 0 or n["active_calls"] < n["max_calls"])
+        ]
+        if not nodes:
+            return None
+        best = min(nodes, key=lambda n: (load(n), n["node_id"] != self.node_id))
+        # Optimiste jusqu'au prochain heartbeat : évite d'envoyer une rafale
+        # d'appels au même node
+        best["active_calls"] += 1
+        return best
+
+    # ── Relais HTTP ───────────────────────────────────────
+
+    async def forward(self, request: Request, url: str) -> Response:
+        body = await request.body()
+        headers = {self.FORWARD_HEADER: self.node_id}
+        if request.headers.get("content-type"):
+            headers["content-type"] = request.headers["content-type"]
+        try:
+            resp = await self.bridge._http().request(
+                request.method, url + request.url.path,
+                params=request.query_params, content=body, headers=headers,
+            )
+        except Exception as e:
+            self.errors += 1
+            raise HTTPException(502, f"Node {url} injoignable: {e}")
+        self.forwarded += 1
+        return Response(resp.content, status_code=resp.status_code,
+                        media_type=resp.headers.get("content-type"))
+
+    async def forward_call(self, request: Request, sid: str) -> Optional[Response]:
+        """Appel inconnu localement → relayé au node propriétaire (None sinon)."""
+        if request.headers.get(self.FORWARD_HEADER):
+            return None
+        owner = await self.owner(sid)
+        if owner is None or owner[0] == self.node_id:
+            return None
+        logger.debug(f"[CLUSTER] {request.method} {request.url.path} → {owner[0]}")
+        return await self.forward(request, owner[1])
+
+    async def place_call(self, request: Request) -> Optional[Response]:
+        """
+        POST /api/calls → node le moins chargé (None = traiter ici). Un node
+        plein ou en drain depuis le dernier heartbeat (429 / 503) est écarté
+        jusqu'au suivant, et on passe au node suivant.
+        """
+        if request.headers.get(self.FORWARD_HEADER):
+            return None
+        for _ in range(len(self.nodes)):
+            node = self.pick()
+            if node is None or node["node_id"] == self.node_id:
+                return None
+            try:
+                resp = await self.forward(request, node["url"])
+            except HTTPException as e:
+                logger.warning(f"[CLUSTER] Placement sur {node['node_id']} échoué ({e.detail}) → local")
+                return None
+            if resp.status_code not in (429, 503):
+                self.placed_remote += 1
+                return resp
+            node["refused"] = resp.status_code      # effacé par le prochain heartbeat
+            logger.info(f"[CLUSTER] {node['node_id']} refuse l'appel ({resp.status_code}) → node suivant")
+        return None
+
+    def status(self) -> dict:
+        now = time.time()
+        return {
+            "node_id": self.node_id,
+            "node_url": self.node_url,
+            "nodes": [
+                {**{k: v for k, v in n.items() if k != "updated_at"}, "age_sec": round(now - n["updated_at"], 1)}
+                for n in self.nodes
+            ],
+            "forwarded": self.forwarded,
+            "placed_remote": self.placed_remote,
+            "errors": self.errors,
+        }
+
+
+# ============================================================
+# TRACES D'APPEL — Enregistrement binaire pour rejeu hors ligne
+# ============================================================
+
+class _CallTrace:
+    """
+    Trace d'un appel (opt-in, trace_dir) : arrivées des frames SIP, events
+    WS entrants, marks / clear, échos de marks et changements d'état, pour
+    reproduire hors ligne un problème vu en prod (benchmarks/replay_trace.py).
+
+    Format : b"SBTR" + version (u8) + longueur (u32) + métadonnées JSON, puis
+    des enregistrements <kind u8><t u32><len u32><payload>, t en pas de
+    10µs depuis l'ouverture (~11h). Frames audio : µ-law si trace_audio,
+    sinon seulement la taille (u32, en échantillons). Écrit depuis le thread
+    pjsip et depuis la boucle : verrou + fichier bufferisé, pas de flush par
+    enregistrement. Une erreur d'écriture est loguée une fois et n'atteint
+    jamais l'appel.
+
+    open() ne fait aucune I/O (appelé depuis le thread pjsip) : le fichier
+    est créé par create() dans l'executor, les enregistrements attendent en
+    mémoire jusque-là. close() et discard() peuvent précéder create().
+    """
+
+    __slots__ = ("path", "audio", "_file", "_pending", "_closed", "_lock", "_t0", "_failed")
+
+    MAGIC = b"SBTR"
+    VERSION = 2         # v2 : longueurs en u32 (v1 : u16, max 64 Ko par enregistrement)
+    TICK_US = 10
+    _RECORD = struct.Struct("<BII")
+    _SIZE = struct.Struct("<I")
+    _PLAYED = struct.Struct("<I")
+
+    STATE = 1          # payload : CallStatus
+    MEDIA_START = 2    # port audio créé → l'horloge pjsip démarre
+    SIP_FRAME = 3      # onFrameReceived (avant DSP)
+    WS_MEDIA = 4
+    WS_MARK = 5        # payload : nom
+    WS_CLEAR = 6
+    WS_STOP = 7
+    WS_OTHER = 8       # payload : nom de l'event
+    MARK_ECHO = 9      # payload : playedMs (u32) + nom
+    WS_FORMAT = 10     # payload : format audio WS retenu à la connexion ("audio/pcm;16000")
+
+    def __init__(self, path: str, meta: dict, audio: bool):
+        self.path = path
+        self.audio = audio
+        self._lock = threading.Lock()
+        self._file = None
+        header = json.dumps(meta).encode()
+        # None après discard() ou après son écriture par create()
+        self._pending: Optional[io.BytesIO] = io.BytesIO()
+        self._pending.write(self.MAGIC + bytes([self.VERSION]) + struct.pack("<I", len(header)) + header)
+        self._closed = False
+        self._t0 = time.perf_counter_ns()
+        self._failed = False
+
+    @classmethod
+    def open(cls, config: BridgeConfig, call_sid: str, direction: CallDirection) -> Optional["_CallTrace"]:
+        if not config.trace_dir:
+            return None
+        meta = {
+            "callSid": call_sid,
+            "direction": direction.value,
+            "frameMs": config.audio.frame_ms,
+            "clockRate": config.audio.clock_rate,
+            "audio": config.trace_audio,
+            "tickUs": cls.TICK_US,
+            "startedAt": datetime.now(timezone.utc).isoformat(),
+        }
+        return cls(os.path.join(config.trace_dir, f"{call_sid}.sbtrace"), meta, config.trace_audio)
+
+    def create(self):
+        """Executor : crée le fichier et y vide les enregistrements en attente."""
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            f = open(self.path, "wb", buffering=64 * 1024)
+        except OSError as e:
+            logger.warning(f"Trace désactivée ({self.path}): {e}")
+            with self._lock:
+                self._pending = None
+                self._closed = True
+            return
+        with self._lock:
+            pending, self._pending = self._pending, None
+            if pending is not None:
+                f.write(pending.getbuffer())
+                if not self._closed:
+                    self._file = f
+                    return
+        f.close()
+        if pending is None:
+            # discard() entre-temps
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def record(self, kind: int, payload: bytes = b""):
+        t = (time.perf_counter_ns() - self._t0) // (self.TICK_US * 1000)
+        try:
+            with self._lock:
+                out = self._file if self._file is not None else self._pending
+                if out is not None and not self._closed:
+                    out.write(self._RECORD.pack(kind, t & 0xFFFFFFFF, len(payload)))
+                    if payload:
+                        out.write(payload)
+        except Exception as e:
+            self._error(e)
+
+    def frame(self, kind: int, ulaw: Optional[bytes] = None, pcm: Optional[bytes] = None):
+        """Frame audio : µ-law fourni tel quel, PCM encodé (trace_audio) ou réduit à sa taille."""
+        try:
+            if self.audio:
+                payload = ulaw if ulaw is not None else pcm16_to_ulaw(pcm)
+            else:
+                payload = self._SIZE.pack(len(ulaw) if ulaw is not None else len(pcm) // 2)
+        except Exception as e:
+            self._error(e)
+            return
+        self.record(kind, payload)
+
+    def _error(self, e: Exception):
+        if not self._failed:
+            self._failed = True
+            logger.warning(f"Trace {self.path}: enregistrement perdu ({e}), erreurs suivantes non loguées")
+
+    def mark_echo(self, mark: dict):
+        self.record(self.MARK_ECHO, self._PLAYED.pack(mark.get("playedMs", 0)) + mark["name"].encode()[:1024])
+
+    def close(self):
+        """Fin d'appel. Avant create() : create() écrit l'attente puis ferme le fichier."""
+        with self._lock:
+            self._closed = True
+            f, self._file = self._file, None
+        if f is not None:
+            f.close()
+
+    def discard(self):
+        """Appel jamais établi : ferme et supprime le fichier (ou create() ne le gardera pas)."""
+        with self._lock:
+            self._closed = True
+            self._pending = None
+            f, self._file = self._file, None
+        if f is not None:
+            f.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    @classmethod
+    def read(cls, path: str) -> tuple[dict, list[tuple[int, int, bytes]]]:
+        """(métadonnées, [(t_us, kind, payload)]) — un enregistrement tronqué (crash) est ignoré."""
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:4] != cls.MAGIC or data[4] != cls.VERSION:
+            raise ValueError(f"{path}: pas une trace SBTR v{cls.VERSION}")
+        (meta_len,) = struct.unpack_from("<I", data, 5)
+        pos = 9 + meta_len
+        meta = json.loads(data[9:pos])
+        tick = meta.get("tickUs", cls.TICK_US)
+        header = cls._RECORD
+        records = []
+        while pos + header.size <= len(data):
+            kind, t, size = header.unpack_from(data, pos)
+            pos += header.size
+            if pos + size > len(data):
+                break
+            records.append((t * tick, kind, data[pos:pos + size]))
+            pos += size
+        return meta, records
+
+
+# ============================================================
+# CLIPS AUDIO — Accueil / attente pré-rendus, joués sans le WS
+# ============================================================
+
+class _Clip:
+    __slots__ = ("name", "path", "stamp", "data", "duration_ms")
+
+    def __init__(self, name: str, path: str, stamp: tuple, data: memoryview, duration_ms: int):
+        self.name = name
+        self.path = path
+        self.stamp = stamp
+        self.data = data
+        self.duration_ms = duration_ms
+
+
+class _ClipCache:
+    """
+    Clips pré-rendus joués directement dans le port audio : l'accueil dès que
+    le média est actif (avant que le WS et le TTS ne répondent), et tout clip
+    via POST /api/calls/{sid}/play.
+
+    Recherche : <clips_dir>/<custom_params[clips_key]>/<nom>.wav, puis
+    <clips_dir>/<nom>.wav (commun). WAV PCM 16 bits mono au clock_rate du
+    bridge, ou .pcm brut au même format. Les fichiers sont mappés (mmap,
+    lecture seule) et lus sur place par les ports audio : un seul exemplaire
+    en mémoire quel que soit le nombre d'appels. Un fichier remplacé (mtime /
+    taille) est remappé à l'utilisation suivante.
+
+    get() fait des I/O (stat, open, mmap) : hors boucle et hors thread pjsip.
+    L'accueil est préchargé au démarrage (preload) et lu sans I/O (cached)
+    au décrochage ; refresh() revalide ensuite en tâche de fond.
+    """
+
+    EXTENSIONS = (".wav", ".pcm")
+
+    def __init__(self, config: BridgeConfig, executor: Optional[ThreadPoolExecutor] = None):
+        self.root = config.clips_dir
+        self.key = config.clips_key
+        self._executor = executor
+        self.audio = config.audio
+        self._clips: dict[str, _Clip] = {}     # chemin → clip mappé
+        self._rejected: dict[str, tuple] = {}  # chemin → stamp d'un fichier invalide (pas de log à chaque appel)
+        self._resolved: dict[tuple[str, str], Optional[_Clip]] = {}   # (nom, compte) → dernier résultat de get()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.misses = 0
+
+    @staticmethod
+    def _safe(name: str) -> bool:
+        """Nom de clip / de compte utilisable comme composant de chemin."""
+        return name.isascii() and name.replace("-", "").replace("_", "").isalnum()
+
+    def _account(self, custom_params: dict) -> str:
+        account = str(custom_params.get(self.key, "")) if self.key else ""
+        return account if account and self._safe(account) else ""
+
+    def get(self, name: str, custom_params: dict) -> Optional[_Clip]:
+        if not self.root or not self._safe(name):
+            return None
+        account = self._account(custom_params)
+        found = self._find(name, account)
+        if found is None:
+            self.misses += 1
+            clip = None
+        else:
+            clip = self._load(name, *found)
+        self._resolved[(name, account)] = clip
+        return clip
+
+    def _find(self, name: str, account: str) -> Optional[tuple[str, tuple]]:
+        """(chemin, stamp) du clip du compte, sinon du clip commun."""
+        dirs = [os.path.join(self.root, account), self.root] if account else [self.root]
+        for directory in dirs:
+            for ext in self.EXTENSIONS:
+                path = os.path.join(directory, name + ext)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                return path, (st.st_mtime_ns, st.st_size)
+        return None
+
+    def cached(self, name: str, custom_params: dict) -> Optional[_Clip]:
+        """Résultat du dernier get() pour ce compte (sinon le commun), sans I/O."""
+        account = self._account(custom_params)
+        key = (name, account)
+        clip = self._resolved[key] if key in self._resolved else self._resolved.get((name, ""))
+        if clip is not None:
+            self.hits += 1
+        return clip
+
+    def refresh(self, name: str, custom_params: dict):
+        """Depuis la boucle : revalide le clip (fichier remplacé, nouveau compte) dans l'executor."""
+        asyncio.get_running_loop().run_in_executor(self._executor, self.get, name, custom_params)
+
+    def preload(self, name: str):
+        """Démarrage : mappe le clip commun et celui de chaque compte (sous-dossiers)."""
+        if not self.root or not name:
+            return
+        self.get(name, {})
+        if not self.key:
+            return
+        try:
+            accounts = [e.name for e in os.scandir(self.root) if e.is_dir()]
+        except OSError as e:
+            logger.warning(f"Clips {self.root}: {e}")
+            return
+        for account in accounts:
+            self.get(name, {self.key: account})
+
+    def _load(self, name: str, path: str, stamp: tuple) -> Optional[_Clip]:
+        with self._lock:
+            clip = self._clips.get(path)
+            if clip is not None and clip.stamp == stamp:
+                self.hits += 1
+                return clip
+            if self._rejected.get(path) == stamp:
+                return None
+            try:
+                with open(path, "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                start, end = self._pcm_range(mm) if path.endswith(".wav") else (0, len(mm))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Clip {path} ignoré: {e}")
+                self._clips.pop(path, None)
+                self._rejected[path] = stamp
+                return None
+            end -= (end - start) % 2
+            # L'ancien mapping (fichier remplacé) est libéré avec son dernier clip
+            clip = _Clip(name, path, stamp, memoryview(mm)[start:end], self.audio.bytes_to_ms(end - start))
+            self._clips[path] = clip
+            self.loads += 1
+            logger.info(f"Clip '{name}' chargé: {path} ({clip.duration_ms}ms)")
+            return clip
+
+    def _pcm_range(self, mm) -> tuple[int, int]:
+        """Bornes du chunk data d'un WAV, après vérification du format."""
+        if mm[:4] != b"RIFF" or mm[8:12] != b"WAVE":
+            raise ValueError("pas un fichier WAV")
+        pos, fmt_ok = 12, False
+        while pos + 8 <= len(mm):
+            chunk, size = mm[pos:pos + 4], struct.unpack_from("<I", mm, pos + 4)[0]
+            body = pos + 8
+            if chunk == b"fmt ":
+                tag, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", mm, body)
+                if (tag, channels, rate, bits) != (1, 1, self.audio.clock_rate, 16):
+                    raise ValueError(
+                        f"format {rate}Hz/{bits} bits/{channels} canal(aux) (tag {tag}) — "
+                        f"attendu PCM {self.audio.clock_rate}Hz 16 bits mono"
+                    )
+                fmt_ok = True
+            elif chunk == b"data":
+                if not fmt_ok:
+                    raise ValueError("chunk data avant fmt")
+                return body, min(body + size, len(mm))
+            pos = body + size + (size & 1)
+        raise ValueError("chunk data absent")
+
+    def status(self) -> dict:
+        with self._lock:
+            clips = list(self._clips.values())
+        return {
+            "dir": self.root,
+            "key": self.key,
+            "loaded": [{"path": c.path, "durationMs": c.duration_ms} for c in clips],
+            "mapped_kb": round(sum(len(c.data) for c in clips) / 1024),
+            "hits": self.hits,
+            "loads": self.loads,
+            "misses": self.misses,
+        }
+
+
+# ============================================================
+# QUALITÉ RTP — Stats RTP/RTCP par appel, relevées par lots
+# ============================================================
+
+def _estimate_mos(loss_pct: float, jitter_ms: float, rtt_ms: Optional[float]) -> float:
+    """
+    MOS estimé (E-model ITU-T G.107 simplifié) pour du G.711 avec PLC :
+    délai effectif = RTT/2 + 2×gigue + 10ms de paquétisation, Ie-eff avec
+    Bpl = 25.1 (G.113). Sans RTT connu (pas encore de RTCP), délai réseau nul.
+    """
+    delay = (rtt_ms or 0.0) / 2 + 2 * jitter_ms + 10
+    i_d = 0.024 * delay + (0.11 * (delay - 177.3) if delay > 177.3 else 0.0)
+    i_e = 95 * loss_pct / (loss_pct + 25.1)
+    r = max(0.0, min(100.0, 93.2 - i_d - i_e))
+    mos = 1 + 0.035 * r + 7e-6 * r * (r - 60) * (100 - r)
+    return round(max(1.0, min(4.5, mos)), 2)
+
+
+class _RtpStats:
+    """
+    Stats RTP/RTCP de chaque appel (perte, gigue, RTT, jitter buffer, codec)
+    et MOS estimé, pour distinguer la perte côté opérateur des pertes côté
+    bridge (rxDroppedFrames).
+
+    Relevé toutes les interval secondes depuis pjsip_poll, sur le thread
+    pjsip et hors des callbacks audio : la tournée est découpée en lots de
+    BATCH appels, un lot par poll, pour ne pas garder le GIL plusieurs ms
+    d'affilée. Le dernier relevé est posé sur le CallRecord (record.quality,
+    remplacé en bloc) : /api/calls/{sid}, le callback completed et /metrics
+    le lisent sans appel pjsip. Un dernier relevé est fait à la destruction
+    du stream et à la fin de l'appel, puis cumulé dans les compteurs.
+    """
+
+    BATCH = 16
+    MOS_BUCKETS = (2.5, 3.1, 3.6, 4.0, 4.3)
+
+    __slots__ = (
+        "bridge", "interval", "_next_at", "_pending", "rounds", "collected",
+        "errors", "batch_max_us", "ended", "mos_counts", "mos_sum", "mos_count",
+        "totals",
+    )
+
+    def __init__(self, bridge: "SipBridge", interval: float):
+        self.bridge = bridge
+        self.interval = interval
+        self._next_at = 0.0
+        self._pending: list[CallRecord] = []
+        self.rounds = 0
+        self.collected = 0
+        self.errors = 0
+        self.batch_max_us = 0.0
+        # Cumuls des appels terminés (compteurs Prometheus)
+        self.ended = 0
+        self.mos_counts = [0] * (len(self.MOS_BUCKETS) + 1)
+        self.mos_sum = 0.0
+        self.mos_count = 0
+        self.totals = {"rx_packets": 0, "rx_lost": 0, "tx_packets": 0, "tx_lost": 0, "bridge_rx_dropped": 0}
+
+    def poll(self):
+        """Thread pjsip, après libHandleEvents : relève le lot suivant si une tournée est en cours."""
+        if self.interval <= 0:
+            return
+        if not self._pending:
+            now = time.monotonic()
+            if now < self._next_at:
+                return
+            self._next_at = now + self.interval
+            self._pending = [r for r in list(self.bridge.active_calls.values()) if r._call_ref is not None]
+            if not self._pending:
+                return
+            self.rounds += 1
+        t0 = time.perf_counter()
+        batch = self._pending[-self.BATCH:]
+        del self._pending[-self.BATCH:]
+        for record in batch:
+            call = record._call_ref
+            if call is not None:
+                self.collect(call, record)
+        self.batch_max_us = max(self.batch_max_us, (time.perf_counter() - t0) * 1e6)
+
+    def collect(self, call, record: CallRecord) -> bool:
+        """Relève les stats du stream audio de call (thread pjsip). False si pas de stream."""
+        idx = getattr(call, "media_idx", None)
+        if idx is None:
+            return False
+        try:
+            stat = call.getStreamStat(idx)
+            port = call.audio_port
+            record.quality = self.snapshot(stat, call.codec, port.rx_dropped if port is not None else 0)
+        except Exception as e:
+            self.errors += 1
+            logger.debug(f"[{record.sid[:8]}] getStreamStat: {e}")
+            return False
+        self.collected += 1
+        return True
+
+    def call_ended(self, record: CallRecord):
+        """Cumule le dernier relevé d'un appel terminé (une fois par appel)."""
+        q = record.quality
+        self.ended += 1
+        if not q:
+            return
+        t = self.totals
+        t["rx_packets"] += q["rx"]["packets"]
+        t["rx_lost"] += q["rx"]["lost"]
+        t["tx_packets"] += q["tx"]["packets"]
+        t["tx_lost"] += q["tx"]["lost"] or 0
+        t["bridge_rx_dropped"] += q["bridgeRxDroppedFrames"]
+        if q["mos"] is not None:
+            self.mos_counts[bisect.bisect_left(self.MOS_BUCKETS, q["mos"])] += 1
+            self.mos_sum += q["mos"]
+            self.mos_count += 1
+
+    @staticmethod
+    def snapshot(stat, codec: str, rx_dropped: int) -> dict:
+        """pj.StreamStat → dict JSON (ms, %)."""
+        rtcp = stat.rtcp
+        rtt_ms = round(rtcp.rttUsec.mean / 1000, 1) if rtcp.rttUsec.n else None
+
+        def stream(s, reported: bool) -> dict:
+            # tx : perte et gigue vues par le distant, connues seulement
+            # après son premier rapport RTCP (RR)
+            if not reported:
+                return {"packets": s.pkt, "lost": None, "lossPct": None, "jitterMs": None, "mos": None}
+            loss_pct = 100 * s.loss / (s.pkt + s.loss) if s.pkt + s.loss else 0.0
+            jitter_ms = s.jitterUsec.mean / 1000 if s.jitterUsec.n else 0.0
+            return {
+                "packets": s.pkt,
+                "lost": s.loss,
+                "lossPct": round(loss_pct, 2),
+                "jitterMs": round(jitter_ms, 1),
+                "mos": _estimate_mos(loss_pct, jitter_ms, rtt_ms),
+            }
+
+        rx = stream(rtcp.rxStat, True)
+        rx.update(discarded=rtcp.rxStat.discard, reordered=rtcp.rxStat.reorder, duplicated=rtcp.rxStat.dup)
+        tx = stream(rtcp.txStat, rtcp.txStat.updateCount > 0)
+        jbuf = stat.jbuf
+        moses = [m for m in (rx["mos"], tx["mos"]) if m is not None]
+        return {
+            "codec": codec,
+            "updatedAt": datetime.now(timezone.utc).isoformat(),
+            "mos": min(moses) if moses else None,
+            "rttMs": rtt_ms,
+            "rx": rx,
+            "tx": tx,
+            "jitterBuffer": {
+                "avgDelayMs": jbuf.avgDelayMsec,
+                "maxDelayMs": jbuf.maxDelayMsec,
+                "lost": jbuf.lost,
+                "discarded": jbuf.discard,
+                "empty": jbuf.empty,
+            },
+            "bridgeRxDroppedFrames": rx_dropped,
+        }
+
+    def status(self) -> dict:
+        return {
+            "interval_sec": self.interval,
+            "rounds": self.rounds,
+            "collected": self.collected,
+            "errors": self.errors,
+            "batch_max_us": round(self.batch_max_us),
+            "ended_calls": self.ended,
+            "avg_mos": round(self.mos_sum / self.mos_count, 2) if self.mos_count else None,
+        }
+
+    def metrics(self) -> list[str]:
+        """Lignes Prometheus : qualité des appels en cours + cumuls des appels terminés."""
+        lines = []
+
+        def metric(name: str, kind: str, help_: str, samples: list):
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        current = [(r.sid, r.quality) for r in list(self.bridge.active_calls.values())
+                   if r.quality and r._call_ref is not None]
+        metric("sipbridge_call_mos", "gauge", "MOS estimé de l'appel (pire des deux sens)",
+               [(f'{{sid="{sid}"}}', q["mos"]) for sid, q in current if q["mos"] is not None])
+        metric("sipbridge_call_loss_ratio", "gauge", "Perte RTP de l'appel par sens (rx = opérateur vers bridge)",
+               [(f'{{sid="{sid}",stream="{d}"}}', q[d]["lossPct"] / 100)
+                for sid, q in current for d in ("rx", "tx") if q[d]["lossPct"] is not None])
+        metric("sipbridge_call_jitter_ms", "gauge", "Gigue RTP moyenne de l'appel par sens",
+               [(f'{{sid="{sid}",stream="{d}"}}', q[d]["jitterMs"])
+                for sid, q in current for d in ("rx", "tx") if q[d]["jitterMs"] is not None])
+        metric("sipbridge_call_rtt_ms", "gauge", "RTT RTCP moyen de l'appel",
+               [(f'{{sid="{sid}"}}', q["rttMs"]) for sid, q in current if q["rttMs"] is not None])
+
+        t = self.totals
+        for key, help_ in (
+            ("rx_packets", "Paquets RTP reçus (appels terminés)"),
+            ("rx_lost", "Paquets RTP perdus en réception (appels terminés)"),
+            ("tx_packets", "Paquets RTP envoyés (appels terminés)"),
+            ("tx_lost", "Paquets RTP envoyés perdus selon le distant (appels terminés)"),
+        ):
+            metric(f"sipbridge_rtp_{key}_total", "counter", help_, [("", t[key])])
+        metric("sipbridge_bridge_rx_dropped_frames_total", "counter",
+               "Frames SIP perdues côté bridge, session WS en retard (appels terminés)", [("", t["bridge_rx_dropped"])])
+
+        buckets, cumulative = [], 0
+        for le, count in zip((*self.MOS_BUCKETS, "+Inf"), self.mos_counts):
+            cumulative += count
+            buckets.append((f'_bucket{{le="{le}"}}', cumulative))
+        metric("sipbridge_call_final_mos", "histogram", "MOS estimé en fin d'appel",
+               [*buckets, ("_sum", round(self.mos_sum, 2)), ("_count", self.mos_count)])
+
+        metric("sipbridge_rtp_stats_collections_total", "counter", "Relevés getStreamStat réussis", [("", self.collected)])
+        metric("sipbridge_rtp_stats_errors_total", "counter", "Relevés getStreamStat en erreur", [("", self.errors)])
+        return lines
+
+
+# ============================================================
+# EVENT BUS — Changements d'état poussés (GET /api/events)
+# ============================================================
+
+class _EventSubscriber:
+    __slots__ = ("queue", "types", "overflowed")
+
+    def __init__(self, maxsize: int, types: Optional[set]):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.types = types
+        self.overflowed = False
+
+
+class _EventBus:
+    """
+    Bus d'événements (transitions d'appel, registration SIP) pour le flux SSE.
+
+    Chaque événement reçoit un id croissant et est gardé dans un historique
+    borné pour la reprise (Last-Event-ID). Un abonné trop lent n'est jamais
+    attendu : sa file pleine, il est déconnecté et reprend depuis son dernier id.
+    Toutes les méthodes s'appellent depuis la boucle asyncio
+    (depuis un callback pjsip, passer par loop.call_soon_threadsafe).
+    """
+
+    def __init__(self, history: int, queue_size: int):
+        self._history: deque = deque(maxlen=max(1, history))
+        self._queue_size = queue_size
+        self._subscribers: set[_EventSubscriber] = set()
+        self.last_id = 0
+        self.published = 0
+        self.overflows = 0
+
+    def publish(self, type_: str, data: dict):
+        self.last_id += 1
+        self.published += 1
+        event = (self.last_id, type_, data)
+        self._history.append(event)
+        for sub in list(self._subscribers):
+            if sub.types and type_ not in sub.types:
+                continue
+            try:
+                sub.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Abonné en retard : on vide sa file et on le déconnecte
+                self.overflows += 1
+                sub.overflowed = True
+                self._subscribers.discard(sub)
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                sub.queue.put_nowait(None)
+
+    def subscribe(self, last_id: Optional[int], types: Optional[set]) -> tuple[_EventSubscriber, list, bool]:
+        """
+        Abonne et renvoie (abonné, événements à rejouer, reset).
+
+        reset=True si last_id n'est plus dans l'historique (ou vient d'une
+        instance précédente du bridge) : le client doit resynchroniser son état
+        via GET /api/calls. Abonnement et snapshot de l'historique sont faits
+        sans await entre les deux : ni trou ni doublon.
+        """
+        sub = _EventSubscriber(self._queue_size, types)
+        self._subscribers.add(sub)
+        replay, reset = [], False
+        if last_id is not None:
+            oldest = self._history[0][0] if self._history else self.last_id + 1
+            if last_id > self.last_id or last_id < oldest - 1:
+                reset = True
+            else:
+                replay = [
+                    ev for ev in self._history
+                    if ev[0] > last_id and (not types or ev[1] in types)
+                ]
+        return sub, replay, reset
+
+    def unsubscribe(self, sub: _EventSubscriber):
+        self._subscribers.discard(sub)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "last_id": self.last_id,
+            "history": len(self._history),
+            "published": self.published,
+            "overflows": self.overflows,
+        }
+
+    @staticmethod
+    def format_sse(event_id: Optional[int], type_: str, data: dict) -> str:
+        head = f"id: {event_id}\n" if event_id is not None else ""
+        return f"{head}event: {type_}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+# ============================================================
+# PROFILER — Échantillonnage à la demande (GET /debug/profile)
+# ============================================================
+
+class _StackSampler:
+    """
+    Profiler par échantillonnage de tous les threads via sys._current_frames().
+
+    Aucun coût hors capture : pas de hook ni de thread permanent, le thread
+    d'échantillonnage n'existe que pendant la durée demandée. Couvre la boucle
+    asyncio (MainThread), l'executor pjsip (pjsip-exec-*) et les threads natifs
+    pjsip quand ils exécutent un callback Python (native-<tid>).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = False
+        self.captures = 0
+
+    def capture(self, seconds: float, hz: int) -> Optional[dict]:
+        """Bloquant — à lancer hors boucle. None si une capture est déjà en cours."""
+        with self._lock:
+            if self.running:
+                return None
+            self.running = True
+        try:
+            return self._sample(seconds, 1.0 / hz)
+        finally:
+            self.running = False
+            self.captures += 1
+
+    @staticmethod
+    def _sample(seconds: float, interval: float) -> dict:
+        own = threading.get_ident()
+        counts: dict[tuple, int] = {}
+        samples = 0
+        started = time.monotonic()
+        next_at = started
+        end = started + seconds
+        while True:
+            now = time.monotonic()
+            if now >= end:
+                break
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.reverse()
+                key = (names.get(tid) or f"native-{tid}", tuple(stack))
+                counts[key] = counts.get(key, 0) + 1
+            samples += 1
+            next_at += interval
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_at = time.monotonic()  # échantillonnage en retard : on ne rattrape pas
+        return {
+            "counts": counts,
+            "samples": samples,
+            "interval_ms": interval * 1000,
+            "elapsed_ms": (time.monotonic() - started) * 1000,
+        }
+
+    @staticmethod
+    def to_collapsed(result: dict) -> str:
+        """Format "stack repliée" (flamegraph.pl, speedscope, inferno)."""
+        lines = [
+            f"{thread};{';'.join(stack)} {n}" if stack else f"{thread} {n}"
+            for (thread, stack), n in sorted(result["counts"].items())
+        ]
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def to_speedscope(result: dict) -> dict:
+        """Format speedscope (un profil "sampled" par thread, frames partagées)."""
+        frame_index: dict[str, int] = {}
+        frames: list[dict] = []
+        per_thread: dict[str, tuple[list, list]] = {}
+        for (thread, stack), n in sorted(result["counts"].items()):
+            ids = []
+            for name in stack:
+                if name not in frame_index:
+                    frame_index[name] = len(frames)
+                    frames.append({"name": name})
+                ids.append(frame_index[name])
+            stacks, weights = per_thread.setdefault(thread, ([], []))
+            stacks.append(ids)
+            weights.append(round(n * result["interval_ms"], 3))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"sip-bridge {result['samples']} samples",
+            "exporter": "sip-bridge",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": thread,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": round(result["elapsed_ms"], 3),
+                    "samples": stacks,
+                    "weights": weights,
+                }
+                for thread, (stacks, weights) in per_thread.items()
+            ],
+        }
+
+
 # ============================================================
 # SIP BRIDGE — Classe principale
 # ============================================================
@@ -335,27 +2653,334 @@ class SipBridge:
     Aucune logique applicative (restaurant, etc.) — juste du transport.
     """
 
-    def __init__(self, config: BridgeConfig):
-        self.config = config
-        self.loop: Optional[asyncio.AbstractEventLoop] = None
-        self._endpoint: Optional[Any] = None
-        self._account: Optional[Any] = None
-        self._sip_registered: bool = False  # cached state, updated from pjsip thread
-        self._executor = ThreadPoolExecutor(max_workers=4)
-        self.active_calls: dict[str, CallRecord] = {}
+    def __init__(self, config: BridgeConfig):
+        self.config = config
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._endpoint: Optional[Any] = None
+        self.registrars = _RegistrarSet(self, config.sip)
+        self._sip_registered: bool = False  # cached state, updated from pjsip thread
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pjsip-exec")
+        self.active_calls: dict[str, CallRecord] = {}
+        # Drain / arrêt
+        self._draining: bool = False
+        self._drain_started_at: Optional[float] = None
+        self._drain_deadline: Optional[float] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._server: Optional[Any] = None
+        self.admission = _AdmissionController(self, config.admission)
+        self.dialer = _Dialer(self, config.dialer)
+        self.incoming_cache = _DecisionCache(config.callbacks)
+        self._http_client: Optional["httpx.AsyncClient"] = None
+        self.timers = _TimerWheel()
+        self.profiler = _StackSampler()
+        self.events = _EventBus(config.event_history, config.event_queue_size)
+        self.ws_pool = _MediaTargetPool(config)
+        # Formats validés au démarrage (ValueError si inconnu, RuntimeError
+        # si un rééchantillonnage est nécessaire sans numpy ni audioop)
+        self.ws_format = _WsAudioFormat.parse(config.ws_audio_format)
+        self.ws_target_formats = {url: _WsAudioFormat.parse(fmt) for url, fmt in config.ws_target_formats.items()}
+        for fmt in {self.ws_format, *self.ws_target_formats.values()}:
+            _WsAudioCodec(fmt, config.audio.clock_rate)
+        self.cluster = _ClusterDirectory(self, config) if config.cluster_db else None
+        self.clips = _ClipCache(config, self._executor)
+        self.rtp_stats = _RtpStats(self, config.rtp_stats_interval_sec)
+        # Cible affichée tant que le pool n'a pas choisi : la première du pool
+        self.default_ws_target = self.ws_pool.targets[0].url
+        # Readiness par étape (timestamps monotonic, None = pas encore)
+        self._started_at = time.monotonic()
+        self._ready_at: dict[str, Optional[float]] = {stage: None for stage in self.READY_STAGES}
+
+        # Derive trunk country code for local number normalization
+        global _trunk_country_code
+        trunk_e164 = _normalize_number(config.sip.username)
+        _trunk_country_code = _derive_country_code(trunk_e164)
+        if _trunk_country_code:
+            logger.info(f"Trunk country code: {_trunk_country_code} (from {trunk_e164})")
+
+        self.app = self._create_app()
+
+    # API démarrée → endpoint pjsip → transport SIP → compte enregistré
+    READY_STAGES = ("api", "endpoint", "transport", "registered")
+
+    def _mark_ready(self, stage: str):
+        if self._ready_at[stage] is None:
+            self._ready_at[stage] = time.monotonic()
+            logger.info(f"[READY] {stage} (+{(self._ready_at[stage] - self._started_at) * 1000:.0f}ms)")
+
+    def readiness(self) -> dict:
+        """Readiness par étape — ready = prêt à prendre des appels."""
+        stages = {}
+        for stage, at in self._ready_at.items():
+            ok = at is not None
+            if stage == "registered":
+                ok = self._sip_registered
+            stages[stage] = {
+                "ok": ok,
+                "ms": round((at - self._started_at) * 1000) if at is not None else None,
+            }
+        return {
+            "ready": all(st["ok"] for st in stages.values()) and not self._draining,
+            "draining": self._draining,
+            "uptime_ms": round((time.monotonic() - self._started_at) * 1000),
+            "stages": stages,
+        }
+
+    def ws_format_for(self, target: str) -> _WsAudioFormat:
+        """Format audio WS d'une cible : le sien s'il est configuré, sinon le défaut."""
+        return self.ws_target_formats.get(target, self.ws_format)
+
+    def active_call_count(self) -> int:
+        """Appels en cours (sonnerie, décroché ou media actif)."""
+        return sum(
+            1 for r in self.active_calls.values()
+            if r.status in (CallStatus.ACTIVE, CallStatus.ANSWERED, CallStatus.RINGING)
+        )
+
+    def dsp_status(self) -> dict:
+        """Chaîne DSP par sens : étages actifs et pire coût mesuré sur les appels en cours."""
+        status = {}
+        for r in list(self.active_calls.values()):
+            port = getattr(r._call_ref, "audio_port", None)
+            if port is None:
+                continue
+            for direction, st in port.dsp_stats().items():
+                agg = status.setdefault(direction, {
+                    "stages": st["stages"], "calls": 0, "max_us": 0.0, "bypassed": 0,
+                })
+                agg["calls"] += 1
+                agg["max_us"] = max(agg["max_us"], st["max_us"])
+                agg["bypassed"] += int(st["bypassed"])
+        return status
+
+    def _register_pj_thread(self, prefix: str):
+        """Register the current thread with pjlib (no-op if already done)."""
+        tid = threading.get_ident()
+        if tid in self._registered_thread_ids or not self._endpoint:
+            return
+        try:
+            self._endpoint.libRegisterThread(f"{prefix}-{tid}")
+            self._registered_thread_ids.add(tid)
+        except Exception as e:
+            logger.warning(f"libRegisterThread {prefix}-{tid} failed: {e}")
+
+    # ── Drain / arrêt ──────────────────────────────────────
+
+    @property
+    def draining(self) -> bool:
+        return self._draining
+
+    def drain_status(self) -> dict:
+        if not self._draining:
+            return {"draining": False}
+        now = time.monotonic()
+        return {
+            "draining": True,
+            "elapsed_sec": round(now - self._drain_started_at, 1),
+            "remaining_sec": max(0, round(self._drain_deadline - now, 1)),
+            "active_calls": self.active_call_count(),
+        }
+
+    def start_drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Passe en mode drain : les nouveaux appels (entrants et sortants) sont
+        refusés, les appels en cours continuent. Le process s'arrête quand
+        il n'y a plus d'appel actif ou quand le délai est écoulé.
+
+        Doit être appelé depuis la boucle asyncio. Retourne False si un drain
+        est déjà en cours.
+        """
+        if self._draining:
+            return False
+        timeout = self.config.drain_timeout if timeout is None else timeout
+        self._draining = True
+        self._drain_started_at = time.monotonic()
+        self._drain_deadline = self._drain_started_at + max(0.0, timeout)
+        logger.info(
+            f"[DRAIN] Début du drain — {self.active_call_count()} appel(s) en cours, "
+            f"délai max {timeout}s"
+        )
+
+        if self.config.drain_unregister and self.registrars.accounts:
+            def _unregister():
+                self._register_pj_thread("drain")
+                for account in self.registrars.accounts:
+                    try:
+                        account.setRegistration(False)
+                        logger.info(f"[DRAIN] Dé-enregistrement SIP envoyé ({account.registrar.uri})")
+                    except Exception as e:
+                        logger.warning(f"[DRAIN] Dé-enregistrement SIP échoué ({account.registrar.uri}): {e}")
+            self.loop.run_in_executor(self._executor, _unregister)
+
+        self._drain_task = asyncio.ensure_future(self._drain_wait())
+        return True
+
+    async def _drain_wait(self):
+        while self.active_call_count() > 0 and time.monotonic() < self._drain_deadline:
+            await asyncio.sleep(0.5)
+        remaining = self.active_call_count()
+        if remaining:
+            logger.warning(f"[DRAIN] Délai écoulé — {remaining} appel(s) seront raccrochés")
+        else:
+            logger.info("[DRAIN] Plus aucun appel actif — arrêt")
+        self.request_stop()
+
+    def request_stop(self):
+        """Arrêt immédiat (les appels restants sont raccrochés dans run())."""
+        if self._stop_event:
+            self._stop_event.set()
+        if self._server:
+            self._server.should_exit = True
+
+    # ── Appels sortants ────────────────────────────────────
+
+    async def originate(self, req: "_MakeCallRequest") -> dict:
+        """
+        Lance un appel sortant (POST /api/calls et dialer).
+        Lève HTTPException si le bridge ne peut pas prendre l'appel.
+        """
+        if not HAS_PJSIP or not self.registrars.accounts:
+            raise HTTPException(503, "PJSIP non initialisé")
+        if self.draining:
+            raise HTTPException(503, "Bridge en cours d'arrêt (drain)")
+
+        active_count = self.active_call_count()
+        if self.config.max_concurrent_calls > 0 and active_count >= self.config.max_concurrent_calls:
+            raise HTTPException(429, f"Max appels simultanés atteint ({self.config.max_concurrent_calls})")
+        shed_reason = self.admission.admit(CallDirection.OUTBOUND)
+        if shed_reason:
+            raise HTTPException(
+                429, f"Bridge surchargé ({shed_reason})",
+                headers={"Retry-After": str(self.config.admission.retry_after_sec)},
+            )
+
+        to_uri = req.to
+        if not to_uri.startswith("sip:"):
+            to_uri = f"sip:{req.to}@{self.config.sip.domain}"
+
+        if req.media_format:
+            try:
+                _WsAudioCodec(_WsAudioFormat.parse(req.media_format), self.config.audio.clock_rate)
+            except (ValueError, RuntimeError) as e:
+                raise HTTPException(400, str(e))
+
+        # Merge : config defaults + per-call override
+        merged_params = {**self.config.custom_params, **(req.custom_params or {})}
+        listen_targets = list(
+            req.listen_targets if req.listen_targets is not None
+            else self.config.listen_targets
+        )
+
+        def do_call():
+            route = self.registrars.route()
+            call = _SipCallHandler(
+                self,
+                route.account,
+                direction=CallDirection.OUTBOUND,
+                custom_params=merged_params,
+                ws_target=req.ws_target,
+                callback_url=req.callback_url,
+                to_number=req.to,
+                listen_targets=listen_targets,
+                media_format=req.media_format,
+            )
+
+            record = CallRecord(
+                sid=call.call_sid,
+                direction=CallDirection.OUTBOUND,
+                from_number=req.from_number or self.config.sip.username,
+                to_number=req.to,
+                status=CallStatus.INITIATED,
+                custom_params=merged_params,
+                created_at=datetime.now(timezone.utc).isoformat(),
+                ws_target=req.ws_target or self.default_ws_target,
+                callback_url=req.callback_url,
+                listen_targets=listen_targets,
+                _call_ref=call,
+            )
+            self.active_calls[call.call_sid] = record
+
+            prm = pj.CallOpParam()
+            prm.opt.audioCount = 1
+            prm.opt.videoCount = 0
+            try:
+                call.makeCall(to_uri, prm)
+            except Exception:
+                self.active_calls.pop(call.call_sid, None)
+                if call.trace is not None:
+                    call.trace.discard()
+                raise
+
+            return record.to_dict()
+
+        try:
+            result = await self.loop.run_in_executor(self._executor, do_call)
+        except Exception as e:
+            logger.error(f"Erreur appel sortant: {e}")
+            raise HTTPException(500, str(e))
+
+        if req.timeout_sec > 0:
+            self.timers.schedule(req.timeout_sec, self._ring_timeout, result["sid"])
+        if self.cluster:
+            self.cluster.claim(result["sid"], result["status"])
+        record = self.active_calls.get(result["sid"])
+        if record:
+            await self.fire_callback(record, "initiated")
+        return result
+
+    def _ring_timeout(self, call_sid: str):
+        """Annule un appel sortant qui sonne encore après timeout_sec."""
+        record = self.active_calls.get(call_sid)
+        if not record or record.status not in (CallStatus.INITIATED, CallStatus.RINGING):
+            return
+        call_ref = record._call_ref
+        if not call_ref:
+            return
+        logger.info(f"[{call_sid[:8]}] Timeout sonnerie → annulation")
+        call_ref.ring_timed_out = True
+
+        def do_cancel():
+            self._register_pj_thread("ring-timeout")
+            try:
+                call_ref.hangup(pj.CallOpParam())
+            except Exception as e:
+                logger.warning(f"[{call_sid[:8]}] Annulation échouée: {e}")
+
+        self.loop.run_in_executor(self._executor, do_cancel)
+
+    def _evict_record(self, call_sid: str):
+        self.active_calls.pop(call_sid, None)
 
-        # Derive trunk country code for local number normalization
-        global _trunk_country_code
-        trunk_e164 = _normalize_number(config.sip.username)
-        _trunk_country_code = _derive_country_code(trunk_e164)
-        if _trunk_country_code:
-            logger.info(f"Trunk country code: {_trunk_country_code} (from {trunk_e164})")
+    def trace_io(self, fn):
+        """Depuis la boucle : I/O de trace (create / close) dans l'executor, jamais sur le thread pjsip."""
+        self.loop.run_in_executor(self._executor, fn)
 
-        self.app = self._create_app()
+    async def forward_or_404(self, request: Request, call_sid: str) -> Response:
+        """Appel inconnu ici : relayé au node propriétaire en mode cluster, sinon 404."""
+        if self.cluster:
+            forwarded = await self.cluster.forward_call(request, call_sid)
+            if forwarded is not None:
+                return forwarded
+        raise HTTPException(404, "Appel non trouvé")
 
     # ── Callbacks HTTP ─────────────────────────────────────
 
+    def _http(self) -> "httpx.AsyncClient":
+        """Client HTTP partagé (keep-alive) pour tous les callbacks."""
+        if self._http_client is None or self._http_client.is_closed:
+            import httpx
+            self._http_client = httpx.AsyncClient(
+                timeout=self.config.callbacks.callback_timeout
+            )
+        return self._http_client
+
     async def fire_callback(self, call: CallRecord, event: str):
+        self.events.publish("call", {
+            **call.to_dict(),
+            "event": event,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        })
+
         url = call.callback_url or self.config.callbacks.status_callback_url
         if not url:
             return
@@ -369,13 +2994,11 @@ class SipBridge:
         }
 
         try:
-            async with httpx.AsyncClient(
-                timeout=self.config.callbacks.callback_timeout
-            ) as client:
-                if self.config.callbacks.callback_method.upper() == "GET":
-                    await client.get(url, params=payload)
-                else:
-                    await client.post(url, json=payload)
+            client = self._http()
+            if self.config.callbacks.callback_method.upper() == "GET":
+                await client.get(url, params=payload)
+            else:
+                await client.post(url, json=payload)
             logger.debug(f"Callback {event} → {url}")
         except Exception as e:
             logger.warning(f"Callback {event} échoué ({url}): {e}")
@@ -385,18 +3008,52 @@ class SipBridge:
         if not url:
             return {"action": "accept"}
 
+        cache = self.incoming_cache
+        if not cache.enabled:
+            return await self._fetch_incoming_decision(url, caller, callee) or {"action": "accept"}
+
+        key = (caller, callee)
+        decision, needs_refresh = cache.lookup(key)
+        if decision is not None:
+            if needs_refresh:
+                # Marquée tout de suite : les INVITE suivants ne relancent pas
+                # de revalidation avant que la tâche ne démarre
+                cache._refreshing.add(key)
+                asyncio.ensure_future(self._revalidate_incoming(url, key))
+            return decision
+
+        decision = await self._fetch_incoming_decision(url, caller, callee)
+        if decision is None:
+            return {"action": "accept"}
+        cache.store(key, decision)
+        return dict(decision)
+
+    async def _revalidate_incoming(self, url: str, key: tuple):
+        cache = self.incoming_cache
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                resp = await client.post(url, json={
-                    "from": caller,
-                    "to": callee,
-                    "timestamp": datetime.now(timezone.utc).isoformat(),
-                })
-                resp.raise_for_status()
-                return resp.json()
+            decision = await self._fetch_incoming_decision(url, *key)
+            if decision is not None:
+                cache.store(key, decision)
+        finally:
+            cache._refreshing.discard(key)
+
+    async def _fetch_incoming_decision(self, url: str, caller: str, callee: str) -> Optional[dict]:
+        """POST vers l'incoming callback. None si échec (jamais mis en cache)."""
+        try:
+            resp = await self._http().post(url, json={
+                "from": caller,
+                "to": callee,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+            })
+            resp.raise_for_status()
+            decision = resp.json()
+            if not isinstance(decision, dict):
+                raise ValueError(f"réponse inattendue: {decision!r}")
+            return decision
         except Exception as e:
+            self.incoming_cache.errors += 1
             logger.warning(f"Incoming callback échoué ({url}): {e}")
-            return {"action": "accept"}
+            return None
 
     # ── PJSIP lifecycle ────────────────────────────────────
 
@@ -417,6 +3074,11 @@ class SipBridge:
         elif cfg.nat.turn_server:
             ep_cfg.uaConfig.stunServer.append(cfg.nat.turn_server)
 
+        # ptime proposé dans le SDP ; le pont de conférence tourne à la même
+        # période que le port audio (pas de re-découpage des frames)
+        ep_cfg.medConfig.ptime = cfg.audio.frame_ms
+        ep_cfg.medConfig.audioFramePtime = cfg.audio.frame_ms
+
         self._endpoint.libInit(ep_cfg)
 
         tp_cfg = pj.TransportConfig()
@@ -430,6 +3092,10 @@ class SipBridge:
             self._endpoint.transportCreate(pj.PJSIP_TRANSPORT_UDP, tp_cfg)
 
         self._endpoint.libStart()
+        # Transport créé avant libStart mais actif seulement après : les deux
+        # étapes dans l'ordre de READY_STAGES
+        self._mark_ready("endpoint")
+        self._mark_ready("transport")
         logger.info("PJSIP endpoint started")
 
         for codec, priority in cfg.audio.codec_priority:
@@ -445,10 +3111,22 @@ class SipBridge:
             except Exception:
                 pass
 
+        for registrar in self.registrars.registrars:
+            self._create_account(registrar)
+        logger.info(f"SIP account created: {cfg.sip.username}@{cfg.sip.domain}")
+        logger.info(f"SIP registering to {', '.join(r.uri for r in self.registrars.registrars)}...")
+
+    def _create_account(self, registrar: "_Registrar"):
+        """Un compte pjsip par registrar (même identité, même credentials)."""
+        cfg = self.config
         acc_cfg = pj.AccountConfig()
         acc_cfg.idUri = f"sip:{cfg.sip.username}@{cfg.sip.domain}"
-        acc_cfg.regConfig.registrarUri = f"sip:{cfg.sip.domain}"
+        acc_cfg.regConfig.registrarUri = registrar.uri
         acc_cfg.regConfig.timeoutSec = cfg.sip.reg_timeout
+        acc_cfg.regConfig.retryIntervalSec = cfg.sip.reg_retry_sec
+        if self.registrars.multi:
+            # Les requêtes hors dialogue (INVITE sortants) passent par ce registrar
+            acc_cfg.sipConfig.proxies.append(f"{registrar.uri};lr")
 
         cred = pj.AuthCredInfo()
         cred.scheme = "digest"
@@ -469,10 +3147,10 @@ class SipBridge:
             acc_cfg.natConfig.turnPassword = cfg.nat.turn_password
             acc_cfg.natConfig.turnConnType = pj.PJ_TURN_TP_UDP
 
-        self._account = _SipAccountHandler(self)
-        self._account.create(acc_cfg)
-        logger.info(f"SIP account created: {cfg.sip.username}@{cfg.sip.domain}")
-        logger.info(f"SIP registering to {cfg.sip.domain}...")
+        account = _SipAccountHandler(self, registrar)
+        self.registrars.sent(registrar)
+        account.create(acc_cfg)
+        registrar.account = account
 
     def pjsip_shutdown(self):
         if self._endpoint:
@@ -482,6 +3160,8 @@ class SipBridge:
 
     _registered_thread_ids: set = set()
 
+    _POLL_WAIT_MS = 10
+
     def pjsip_poll(self):
         if self._endpoint:
             tid = threading.get_ident()
@@ -492,7 +3172,8 @@ class SipBridge:
                     logger.debug(f"pjsip_poll: thread {tid} registered")
                 except Exception as e:
                     logger.warning(f"pjsip_poll: libRegisterThread {tid} failed: {e}")
-            self._endpoint.libHandleEvents(10)
+            self._endpoint.libHandleEvents(self._POLL_WAIT_MS)
+            self.rtp_stats.poll()
 
     # ── FastAPI ────────────────────────────────────────────
 
@@ -510,94 +3191,205 @@ class SipBridge:
         @app.get("/health")
         async def health():
             return {
-                "status": "ok",
+                "status": "draining" if bridge.draining else "ok",
+                "drain": bridge.drain_status(),
                 "sip_registered": bridge._sip_registered,
                 "sip_account": f"{bridge.config.sip.username}@{bridge.config.sip.domain}",
-                "ws_target": bridge.config.ws_target,
-                "active_calls": len([
-                    r for r in bridge.active_calls.values()
-                    if r.status in (CallStatus.ACTIVE, CallStatus.ANSWERED, CallStatus.RINGING)
-                ]),
+                "sip_registrars": bridge.registrars.status(),
+                "ws_target": bridge.default_ws_target,
+                "ws_targets": bridge.ws_pool.status(),
+                "ws_audio_format": {
+                    "default": str(bridge.ws_format),
+                    **{url: str(fmt) for url, fmt in bridge.ws_target_formats.items()},
+                },
+                "listen_targets": bridge.config.listen_targets,
+                "active_calls": bridge.active_call_count(),
                 "max_concurrent_calls": bridge.config.max_concurrent_calls,
+                "admission": bridge.admission.status(),
+                "dialer": bridge.dialer.status(),
+                "incoming_cache": bridge.incoming_cache.stats(),
+                "timers": {"pending": bridge.timers.pending(), "fired": bridge.timers.fired},
+                "runtime": runtime_status(),
+                "events": bridge.events.stats(),
+                "cluster": bridge.cluster.status() if bridge.cluster else None,
+                "clips": bridge.clips.status() if bridge.config.clips_dir else None,
+                "rtp_stats": bridge.rtp_stats.status(),
                 "audio": {
                     "codec": bridge.config.audio.codec_priority[0][0],
                     "clock_rate": bridge.config.audio.clock_rate,
                     "frame_ms": bridge.config.audio.frame_ms,
                     "ec_enabled": bridge.config.audio.ec_enabled,
                     "vad_enabled": bridge.config.audio.vad_enabled,
+                    "dsp": bridge.dsp_status(),
                 },
             }
 
+        @app.get("/ready")
+        async def ready():
+            """Readiness par étape : 200 si prêt à prendre des appels, 503 sinon."""
+            state = bridge.readiness()
+            return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
         @app.get("/api/calls")
         async def list_calls():
             return [r.to_dict() for r in bridge.active_calls.values()]
 
         @app.post("/api/calls")
-        async def make_call(req: _MakeCallRequest):
-            if not HAS_PJSIP or not bridge._account:
-                raise HTTPException(503, "PJSIP non initialisé")
-
-            active_count = sum(
-                1 for r in bridge.active_calls.values()
-                if r.status in (CallStatus.ACTIVE, CallStatus.ANSWERED, CallStatus.RINGING)
+        async def make_call(req: _MakeCallRequest, request: Request):
+            if bridge.cluster:
+                placed = await bridge.cluster.place_call(request)
+                if placed is not None:
+                    return placed
+            result = await bridge.originate(req)
+            return JSONResponse(result, status_code=201)
+
+        @app.post("/api/calls/batch")
+        async def submit_batch(req: _BatchCallRequest):
+            """Campagne d'appels sortants — mis en file, lancés au rythme du dialer."""
+            if bridge.draining:
+                raise HTTPException(503, "Bridge en cours d'arrêt (drain)")
+            if not req.calls:
+                raise HTTPException(400, "Aucun appel dans la campagne")
+            batch = bridge.dialer.submit(req.calls, req.priority, req.ring_timeout_sec)
+            return JSONResponse(batch.to_dict(with_calls=False), status_code=202)
+
+        @app.get("/api/calls/batch/{batch_id}")
+        async def get_batch(batch_id: str):
+            batch = bridge.dialer.get(batch_id)
+            if not batch:
+                raise HTTPException(404, "Campagne non trouvée")
+            return batch.to_dict()
+
+        @app.delete("/api/calls/batch/{batch_id}")
+        async def cancel_batch(batch_id: str):
+            if not bridge.dialer.get(batch_id):
+                raise HTTPException(404, "Campagne non trouvée")
+            cancelled = bridge.dialer.cancel(batch_id)
+            return {"batchId": batch_id, "cancelled": cancelled}
+
+        @app.delete("/api/incoming-cache")
+        async def flush_incoming_cache(caller: str = "", callee: str = ""):
+            """Invalide les décisions en cache (ex: numéro tout juste bloqué)."""
+            removed = bridge.incoming_cache.invalidate(caller, callee)
+            return {"removed": removed}
+
+        @app.post("/api/drain")
+        async def drain(req: _DrainRequest = None):
+            """Démarre le drain (idempotent) — voir SipBridge.start_drain."""
+            timeout = req.timeout_sec if req else None
+            started = bridge.start_drain(timeout)
+            return JSONResponse(
+                {"started": started, **bridge.drain_status()},
+                status_code=202,
             )
-            if bridge.config.max_concurrent_calls > 0 and active_count >= bridge.config.max_concurrent_calls:
-                raise HTTPException(429, f"Max appels simultanés atteint ({bridge.config.max_concurrent_calls})")
-
-            to_uri = req.to
-            if not to_uri.startswith("sip:"):
-                to_uri = f"sip:{req.to}@{bridge.config.sip.domain}"
-
-            # Merge : config defaults + per-call override
-            merged_params = {**bridge.config.custom_params, **(req.custom_params or {})}
-
-            def do_call():
-                call = _SipCallHandler(
-                    bridge,
-                    bridge._account,
-                    direction=CallDirection.OUTBOUND,
-                    custom_params=merged_params,
-                    ws_target=req.ws_target,
-                    callback_url=req.callback_url,
-                    to_number=req.to,
-                )
 
-                record = CallRecord(
-                    sid=call.call_sid,
-                    direction=CallDirection.OUTBOUND,
-                    from_number=req.from_number or bridge.config.sip.username,
-                    to_number=req.to,
-                    status=CallStatus.INITIATED,
-                    custom_params=merged_params,
-                    created_at=datetime.now(timezone.utc).isoformat(),
-                    ws_target=req.ws_target or bridge.config.ws_target,
-                    callback_url=req.callback_url,
-                    _call_ref=call,
-                )
-                bridge.active_calls[call.call_sid] = record
-
-                prm = pj.CallOpParam()
-                prm.opt.audioCount = 1
-                prm.opt.videoCount = 0
-                call.makeCall(to_uri, prm)
+        @app.get("/api/events")
+        async def event_stream(
+            request: Request,
+            types: str = "",
+            last_event_id: Optional[str] = Header(None),
+            lastEventId: Optional[str] = None,
+        ):
+            """
+            Flux SSE des transitions d'appel ("call") et de la registration
+            SIP ("registration"). Reprise via le header Last-Event-ID (ou
+            ?lastEventId= pour les clients sans header).
+            """
+            resume = last_event_id if last_event_id is not None else lastEventId
+            try:
+                last_id = int(resume) if resume not in (None, "") else None
+            except ValueError:
+                raise HTTPException(400, "Last-Event-ID invalide")
+            wanted = {t for t in types.split(",") if t} or None
+            sub, replay, reset = bridge.events.subscribe(last_id, wanted)
 
-                return record.to_dict()
+            async def stream():
+                try:
+                    # Délai de reconnexion conseillé au client (EventSource)
+                    yield "retry: 2000\n\n"
+                    if reset:
+                        yield _EventBus.format_sse(bridge.events.last_id, "reset", {
+                            "reason": "history_expired",
+                            "lastEventId": last_id,
+                        })
+                    for ev in replay:
+                        yield _EventBus.format_sse(*ev)
+                    while True:
+                        try:
+                            ev = await asyncio.wait_for(sub.queue.get(), timeout=15)
+                        except asyncio.TimeoutError:
+                            if await request.is_disconnected():
+                                break
+                            yield ": keepalive\n\n"
+                            continue
+                        if ev is None:
+                            # File pleine : le client reprendra via Last-Event-ID
+                            yield _EventBus.format_sse(None, "overflow", {"queueSize": bridge.config.event_queue_size})
+                            break
+                        yield _EventBus.format_sse(*ev)
+                finally:
+                    bridge.events.unsubscribe(sub)
+
+            return StreamingResponse(
+                stream(),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
 
-            try:
-                result = await bridge.loop.run_in_executor(bridge._executor, do_call)
-                record = bridge.active_calls.get(result["sid"])
-                if record:
-                    await bridge.fire_callback(record, "initiated")
-                return JSONResponse(result, status_code=201)
-            except Exception as e:
-                logger.error(f"Erreur appel sortant: {e}")
-                raise HTTPException(500, str(e))
+        @app.get("/debug/profile")
+        async def debug_profile(
+            seconds: float = 10.0,
+            hz: int = 100,
+            format: str = "collapsed",
+            token: str = "",
+            x_debug_token: str = Header(""),
+        ):
+            """Profil échantillonné de tous les threads pendant `seconds` secondes."""
+            expected = bridge.config.debug_token
+            if not expected:
+                raise HTTPException(404, "Profiler désactivé (--debug-token)")
+            if not hmac.compare_digest((x_debug_token or token).encode(), expected.encode()):
+                raise HTTPException(403, "Token invalide")
+            if not 0 < seconds <= bridge.config.profile_max_seconds:
+                raise HTTPException(400, f"seconds doit être entre 0 et {bridge.config.profile_max_seconds}")
+            if not 1 <= hz <= 1000:
+                raise HTTPException(400, "hz doit être entre 1 et 1000")
+            if format not in ("collapsed", "speedscope"):
+                raise HTTPException(400, "format : collapsed | speedscope")
+
+            logger.info(f"[PROFILE] Capture {seconds:g}s à {hz}Hz ({format})")
+            result = await bridge.loop.run_in_executor(None, bridge.profiler.capture, seconds, hz)
+            if result is None:
+                raise HTTPException(409, "Une capture est déjà en cours")
+            logger.info(f"[PROFILE] {result['samples']} échantillons en {result['elapsed_ms']:.0f}ms")
+            if format == "speedscope":
+                return JSONResponse(_StackSampler.to_speedscope(result))
+            return PlainTextResponse(_StackSampler.to_collapsed(result))
+
+        @app.get("/api/calls/{call_sid}")
+        async def get_call(call_sid: str, request: Request):
+            """Appel en cours ou terminé depuis moins de record_ttl_sec, avec sa qualité RTP."""
+            record = bridge.active_calls.get(call_sid)
+            if not record:
+                return await bridge.forward_or_404(request, call_sid)
+            return record.to_dict()
+
+        @app.get("/metrics")
+        async def metrics():
+            """Exposition Prometheus : qualité RTP par appel et cumuls."""
+            lines = [
+                "# HELP sipbridge_active_calls Appels en cours",
+                "# TYPE sipbridge_active_calls gauge",
+                f"sipbridge_active_calls {bridge.active_call_count()}",
+                *bridge.rtp_stats.metrics(),
+            ]
+            return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
 
         @app.delete("/api/calls/{call_sid}")
-        async def hangup_call(call_sid: str):
+        async def hangup_call(call_sid: str, request: Request):
             record = bridge.active_calls.get(call_sid)
             if not record:
-                raise HTTPException(404, "Appel non trouvé")
+                return await bridge.forward_or_404(request, call_sid)
 
             call_ref = record._call_ref
             if call_ref and record.status not in (CallStatus.COMPLETED, CallStatus.FAILED):
@@ -611,16 +3403,59 @@ class SipBridge:
 
                 await bridge.loop.run_in_executor(bridge._executor, do_hangup)
                 record.status = CallStatus.CANCELLED
+                asyncio.ensure_future(bridge.fire_callback(record, "cancelled"))
                 return {"status": "cancelled", "sid": call_sid}
 
             return {"status": record.status.value, "sid": call_sid}
 
+        @app.get("/api/calls/{call_sid}/media")
+        async def call_media(call_sid: str, request: Request):
+            """Position de lecture de l'audio IA (troncature des transcripts au barge-in)."""
+            record = bridge.active_calls.get(call_sid)
+            if not record:
+                return await bridge.forward_or_404(request, call_sid)
+            port = getattr(record._call_ref, "audio_port", None)
+            if port is None:
+                raise HTTPException(400, f"Média non actif (status={record.status.value})")
+            return {
+                "sid": call_sid,
+                "status": record.status.value,
+                "ptimeMs": getattr(record._call_ref, "ptime_ms", None),
+                "frameMs": bridge.config.audio.frame_ms,
+                **port.playout(),
+            }
+
+        @app.post("/api/calls/{call_sid}/play")
+        async def play_clip(call_sid: str, req: _PlayClipRequest, request: Request):
+            """Joue un clip du cache (attente, annonce) dans l'appel, sans passer par le WS."""
+            record = bridge.active_calls.get(call_sid)
+            if not record:
+                return await bridge.forward_or_404(request, call_sid)
+            port = getattr(record._call_ref, "audio_port", None)
+            if port is None:
+                raise HTTPException(400, f"Média non actif (status={record.status.value})")
+            clip = await asyncio.get_running_loop().run_in_executor(None, bridge.clips.get, req.clip, record.custom_params)
+            if clip is None:
+                raise HTTPException(404, f"Clip introuvable: {req.clip}")
+            if req.replace:
+                port.clear_audio()
+            buffered = port.play_clip(clip.data)
+            if req.mark:
+                port.queue_mark(req.mark)
+            logger.info(f"[{call_sid[:8]}] Clip '{clip.name}' ({clip.duration_ms}ms) via API")
+            return {
+                "sid": call_sid,
+                "clip": clip.name,
+                "durationMs": clip.duration_ms,
+                "bufferedMs": bridge.config.audio.bytes_to_ms(buffered),
+            }
+
         @app.post("/api/calls/{call_sid}/transfer")
-        async def transfer_call(call_sid: str, req: _TransferCallRequest):
+        async def transfer_call(call_sid: str, req: _TransferCallRequest, request: Request):
             """Transfert aveugle (SIP REFER) vers la destination."""
             record = bridge.active_calls.get(call_sid)
             if not record:
-                raise HTTPException(404, "Appel non trouvé")
+                return await bridge.forward_or_404(request, call_sid)
 
             if record.status not in (CallStatus.ACTIVE, CallStatus.ANSWERED):
                 raise HTTPException(400, f"Appel non actif (status={record.status.value})")
@@ -645,6 +3480,7 @@ class SipBridge:
             try:
                 await bridge.loop.run_in_executor(bridge._executor, do_transfer)
                 record.status = CallStatus.TRANSFERRED
+                asyncio.ensure_future(bridge.fire_callback(record, "transferred"))
                 return {"status": "transferred", "sid": call_sid, "destination": dest}
             except Exception as e:
                 raise HTTPException(500, f"Transfer echoue: {e}")
@@ -653,22 +3489,16 @@ class SipBridge:
 
     # ── Run ────────────────────────────────────────────────
 
+    @staticmethod
+    def _prewarm_imports():
+        """Charge les modules différés hors du chemin de démarrage (thread)."""
+        import httpx  # noqa: F401
+        import websockets.exceptions
+        websockets.connect  # résout l'import paresseux du client
+
     async def run(self):
         self.loop = asyncio.get_event_loop()
-
-        # Init PJSIP
-        await self.loop.run_in_executor(self._executor, self.pjsip_init)
-
-        # Register the asyncio/main thread with pjsip so that Python's GC
-        # can safely destroy pjsip objects (AudioMediaPort etc.) from this
-        # thread without triggering pj_thread_this() assertion crash.
-        try:
-            tid = threading.get_ident()
-            self._endpoint.libRegisterThread(f"asyncio-{tid}")
-            self._registered_thread_ids.add(tid)
-            logger.info(f"Asyncio main thread {tid} registered with pjsip (GC-safe)")
-        except Exception as e:
-            logger.warning(f"Failed to register asyncio thread with pjsip: {e}")
+        apply_runtime_profile(self.config.runtime)
 
         # Banner
         cfg = self.config
@@ -676,12 +3506,28 @@ class SipBridge:
         logger.info("  SIP Bridge (Twilio-compatible)")
         logger.info("=" * 65)
         logger.info(f"  SIP       : {cfg.sip.username}@{cfg.sip.domain}")
+        if self.registrars.multi:
+            logger.info(f"  Registrars: {', '.join(r.uri for r in self.registrars.registrars)}")
         logger.info(f"  Transport : {cfg.sip.transport.upper()}")
-        logger.info(f"  WS target : {cfg.ws_target}")
+        if len(self.ws_pool) > 1:
+            logger.info(f"  WS targets: {', '.join(t.url for t in self.ws_pool.targets)} ({cfg.ws_balance})")
+        else:
+            logger.info(f"  WS target : {self.default_ws_target}")
+        if self.ws_target_formats or self.ws_format.encoding != "audio/x-mulaw":
+            per_target = "".join(f", {url}={fmt}" for url, fmt in self.ws_target_formats.items())
+            logger.info(f"  WS audio  : {self.ws_format}{per_target}")
         logger.info(f"  API REST  : http://0.0.0.0:{cfg.api_port}")
         logger.info(f"  Codec     : {cfg.audio.codec_priority[0][0]}")
         logger.info(f"  EC        : {'ON' if cfg.audio.ec_enabled else 'OFF'} ({cfg.audio.ec_tail_ms}ms)")
         logger.info(f"  Max calls : {cfg.max_concurrent_calls or 'unlimited'}")
+        logger.info(f"  Runtime   : loop={type(self.loop).__module__} gc={gc.get_threshold()} switch={sys.getswitchinterval() * 1000:g}ms")
+        logger.info(f"  Drain     : {f'{cfg.drain_timeout}s (SIGTERM)' if cfg.drain_timeout > 0 else 'OFF'}")
+        if self.cluster:
+            logger.info(f"  Cluster   : {self.cluster.node_id} → {cfg.cluster_db}")
+        if cfg.trace_dir:
+            logger.info(f"  Traces    : {cfg.trace_dir}{' (audio)' if cfg.trace_audio else ''}")
+        if cfg.clips_dir:
+            logger.info(f"  Clips     : {cfg.clips_dir} (accueil: {cfg.greeting_clip or 'OFF'}, {cfg.greeting_handoff})")
         if cfg.custom_params:
             logger.info(f"  Params    : {cfg.custom_params}")
         if cfg.nat.turn_server:
@@ -698,30 +3544,91 @@ class SipBridge:
             self.app, host="0.0.0.0", port=cfg.api_port,
             log_level="info", access_log=False,
         )
-        server = uvicorn.Server(uvi_config)
+
+        class _BridgeServer(uvicorn.Server):
+            # Les signaux sont gérés par le bridge (drain sur SIGTERM) :
+            # uvicorn ne doit pas installer ses propres handlers, sinon il
+            # couperait l'API pendant le drain.
+            @contextmanager
+            def capture_signals(self):
+                yield
+
+        server = _BridgeServer(uvi_config)
 
         stop_event = asyncio.Event()
+        self._stop_event = stop_event
+        self._server = server
 
         def signal_handler():
-            stop_event.set()
-            server.should_exit = True
+            self.request_stop()
+
+        def sigterm_handler():
+            # SIGTERM : drain (sauf si désactivé) — un second SIGTERM force l'arrêt
+            if self.config.drain_timeout > 0 and not self._draining:
+                self.start_drain()
+            else:
+                self.request_stop()
 
-        for sig in (signal.SIGINT, signal.SIGTERM):
+        for sig, handler in ((signal.SIGINT, signal_handler), (signal.SIGTERM, sigterm_handler)):
             try:
-                self.loop.add_signal_handler(sig, signal_handler)
+                self.loop.add_signal_handler(sig, handler)
             except NotImplementedError:
                 pass
 
         async def pjsip_poll_loop():
             while not stop_event.is_set():
+                t0 = time.monotonic()
                 await self.loop.run_in_executor(self._executor, self.pjsip_poll)
+                self.admission.record_poll((time.monotonic() - t0) * 1000, self._POLL_WAIT_MS)
                 await asyncio.sleep(0.005)
 
         async def api_server():
             await server.serve()
 
+        async def watch_api_started():
+            while not server.started and not stop_event.is_set():
+                await asyncio.sleep(0.01)
+            if server.started:
+                self._mark_ready("api")
+
+        # L'API démarre pendant l'init PJSIP : /health et /ready répondent
+        # dès que possible, /ready passe à 200 une fois le compte enregistré.
+        api_task = asyncio.ensure_future(api_server())
+        asyncio.ensure_future(watch_api_started())
+        if cfg.clips_dir and cfg.greeting_clip:
+            # Avant les premiers appels : l'accueil est lu sans I/O au décrochage
+            await self.loop.run_in_executor(None, self.clips.preload, cfg.greeting_clip)
         try:
-            await asyncio.gather(pjsip_poll_loop(), api_server())
+            await self.loop.run_in_executor(self._executor, self.pjsip_init)
+        except Exception as e:
+            logger.error(f"Init PJSIP échouée: {e}")
+            self.request_stop()
+            await api_task
+            raise
+
+        # Register the asyncio/main thread with pjsip so that Python's GC
+        # can safely destroy pjsip objects (AudioMediaPort etc.) from this
+        # thread without triggering pj_thread_this() assertion crash.
+        try:
+            tid = threading.get_ident()
+            self._endpoint.libRegisterThread(f"asyncio-{tid}")
+            self._registered_thread_ids.add(tid)
+            logger.info(f"Asyncio main thread {tid} registered with pjsip (GC-safe)")
+        except Exception as e:
+            logger.warning(f"Failed to register asyncio thread with pjsip: {e}")
+
+        # Gel du GC une fois les imports différés chargés : le tas de démarrage
+        # (modules, FastAPI, pjsua2) ne sera plus parcouru par les collectes.
+        prewarm = self.loop.run_in_executor(None, self._prewarm_imports)
+        prewarm.add_done_callback(lambda _: freeze_gc(self.config.runtime))
+
+        try:
+            await asyncio.gather(
+                pjsip_poll_loop(), api_task,
+                self.admission.monitor(stop_event), self.timers.run(stop_event),
+                self.registrars.monitor(stop_event),
+                *([self.cluster.heartbeat(stop_event)] if self.cluster else []),
+            )
         except asyncio.CancelledError:
             pass
         finally:
@@ -772,7 +3679,10 @@ class SipBridge:
             except (asyncio.TimeoutError, Exception):
                 pass
 
+            if self.cluster:
+                self.cluster.leave()
             logger.info("Bye.")
+            logging.shutdown()  # vide un éventuel QueueHandler avant os._exit
             os._exit(0)
 
 
@@ -787,18 +3697,298 @@ class _MakeCallRequest(BaseModel):
     custom_params: Optional[dict] = Field(None, alias="customParams", description="Paramètres custom (merge avec defaults)")
     ws_target: str = Field("", alias="wsTarget", description="WebSocket cible (override)")
     callback_url: str = Field("", alias="callbackUrl", description="URL de callback status")
+    listen_targets: Optional[list[str]] = Field(None, alias="listenTargets", description="Cibles WebSocket en écoute seule (override)")
+    media_format: str = Field("", alias="mediaFormat", description="Format audio du WS (override), ex: audio/l16;24000")
     timeout_sec: int = Field(30, description="Timeout sonnerie en secondes")
     model_config = {"populate_by_name": True}
 
 
+class _BatchCallRequest(BaseModel):
+    """Requête POST /api/calls/batch — campagne d'appels sortants."""
+    calls: list[_MakeCallRequest] = Field(..., description="Appels à lancer (même format que POST /api/calls)")
+    priority: int = Field(0, description="Priorité de la campagne (plus petit = plus prioritaire)")
+    ring_timeout_sec: Optional[int] = Field(None, alias="ringTimeoutSec", description="Timeout sonnerie (défaut: config dialer)")
+    model_config = {"populate_by_name": True}
+
+
+class _DrainRequest(BaseModel):
+    """Requête POST /api/drain — arrêt progressif."""
+    timeout_sec: Optional[float] = Field(None, alias="timeoutSec", description="Délai max d'attente des appels (défaut: drain_timeout)")
+    model_config = {"populate_by_name": True}
+
+
+class _PlayClipRequest(BaseModel):
+    """Requête POST /api/calls/{call_sid}/play — clip du cache audio."""
+    clip: str = Field(..., description="Nom du clip (fichier <clip>.wav sans extension)")
+    replace: bool = Field(False, description="Vider l'audio en attente (et ses marks) avant de jouer")
+    mark: str = Field("", description="Mark renvoyée au WS quand le clip a été joué")
+
+
 class _TransferCallRequest(BaseModel):
     """Requête POST /api/calls/{call_sid}/transfer — transfert aveugle."""
     destination: str = Field(..., description="SIP URI ou tel: URI de destination")
 
 
+class _UnixMediaStream:
+    """
+    Flux média sur socket Unix, pour un serveur co-localisé (ws_target
+    "unix:///chemin/socket"). Mêmes events JSON que le WebSocket, chacun
+    précédé de sa longueur (uint32 big-endian) : pas de TCP loopback, pas de
+    framing ni de masquage WebSocket sur le chemin de chaque frame.
+
+    Expose le sous-ensemble de l'API websockets utilisé par _WsSession :
+    send(str), itération asynchrone des messages reçus, close().
+    """
+
+    _HEADER = struct.Struct(">I")
+    MAX_MESSAGE = 1 << 20
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+
+    async def send(self, msg: str):
+        data = msg.encode()
+        self._writer.write(self._HEADER.pack(len(data)) + data)
+        await self._writer.drain()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        try:
+            (size,) = self._HEADER.unpack(await self._reader.readexactly(self._HEADER.size))
+            if size > self.MAX_MESSAGE:
+                raise ValueError(f"message unix:// trop grand ({size} octets)")
+            return (await self._reader.readexactly(size)).decode()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            # Fermeture par le serveur — même effet qu'un WebSocket fermé
+            raise StopAsyncIteration
+
+    async def close(self):
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except Exception:
+            pass
+
+
+@asynccontextmanager
+async def _open_media_stream(target: str, timeout: Optional[float] = None):
+    """Connexion au serveur média : ws:// / wss:// (websockets) ou unix://chemin."""
+    if target.startswith("unix://"):
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(target[len("unix://"):]), timeout
+        )
+        stream = _UnixMediaStream(reader, writer)
+        try:
+            yield stream
+        finally:
+            await stream.close()
+    else:
+        import websockets
+        async with websockets.connect(target, open_timeout=timeout or 10) as ws:
+            yield ws
+
+
+class _MediaTarget:
+    __slots__ = (
+        "url", "weight", "active", "sessions", "attempts", "failures",
+        "consecutive_failures", "drops", "latency_ms", "ejected_until", "current",
+    )
+
+    def __init__(self, url: str, weight: int):
+        self.url = url
+        self.weight = weight
+        self.active = 0                 # sessions connectées en ce moment
+        self.sessions = 0               # connexions réussies (total)
+        self.attempts = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.drops = 0                  # connexions perdues sans "stop"
+        self.latency_ms: Optional[float] = None   # EWMA du temps de connexion
+        self.ejected_until = 0.0
+        self.current = 0                # smooth weighted round-robin
+
+    def ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+
+class _MediaTargetPool:
+    """
+    Répartition des sessions entre plusieurs serveurs média.
+
+    Sélection least-active (sessions actives / poids, puis latence) ou
+    weighted (round-robin pondéré lissé). Santé passive : une cible qui
+    échoue ws_eject_failures connexions d'affilée est éjectée ws_eject_sec
+    secondes, puis réessayée (un nouvel échec la ré-éjecte). candidates()
+    renvoie l'ordre d'essai : la session se replie sur la suivante si la
+    connexion échoue, les cibles éjectées ne servant qu'en dernier recours.
+    """
+
+    _LATENCY_ALPHA = 0.2
+
+    def __init__(self, config: BridgeConfig):
+        self.config = config
+        self.targets: list[_MediaTarget] = []
+        for entry in (config.ws_targets or [config.ws_target]):
+            url, weight = self.parse(entry)
+            self.targets.append(_MediaTarget(url, weight))
+
+    @staticmethod
+    def parse(entry: str) -> tuple[str, int]:
+        """ "url" ou "url*poids" → (url, poids)."""
+        url, sep, weight = entry.rpartition("*")
+        if sep and weight.isdigit() and int(weight) > 0:
+            return url, int(weight)
+        return entry, 1
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    def candidates(self, prefer: str = "") -> list[_MediaTarget]:
+        now = time.monotonic()
+        healthy = [t for t in self.targets if not t.ejected(now)]
+        ejected = sorted((t for t in self.targets if t.ejected(now)), key=lambda t: t.ejected_until)
+        ordered = sorted(healthy, key=lambda t: (t.active / t.weight, t.latency_ms or 0.0))
+        if self.config.ws_balance == "weighted" and healthy:
+            total = 0
+            for t in healthy:
+                t.current += t.weight
+                total += t.weight
+            best = max(healthy, key=lambda t: t.current)
+            best.current -= total
+            ordered.remove(best)
+            ordered.insert(0, best)
+        if prefer:
+            # Reprise : on revient d'abord sur la même cible si elle est saine
+            for t in ordered:
+                if t.url == prefer:
+                    ordered.remove(t)
+                    ordered.insert(0, t)
+                    break
+        return ordered + ejected
+
+    def record_success(self, target: _MediaTarget, latency_ms: float):
+        target.attempts += 1
+        target.sessions += 1
+        target.consecutive_failures = 0
+        target.ejected_until = 0.0
+        if target.latency_ms is None:
+            target.latency_ms = latency_ms
+        else:
+            target.latency_ms += self._LATENCY_ALPHA * (latency_ms - target.latency_ms)
+
+    def record_failure(self, target: _MediaTarget, error: Exception):
+        target.attempts += 1
+        target.failures += 1
+        target.consecutive_failures += 1
+        if target.consecutive_failures >= self.config.ws_eject_failures:
+            target.ejected_until = time.monotonic() + self.config.ws_eject_sec
+            logger.error(
+                f"Cible média {target.url} éjectée {self.config.ws_eject_sec:g}s "
+                f"({target.consecutive_failures} échecs consécutifs: {error})"
+            )
+        else:
+            logger.warning(f"Connexion à la cible média {target.url} échouée: {error}")
+
+    def status(self) -> list[dict]:
+        now = time.monotonic()
+        return [
+            {
+                "url": t.url,
+                "weight": t.weight,
+                "active_sessions": t.active,
+                "sessions": t.sessions,
+                "connect_attempts": t.attempts,
+                "connect_failures": t.failures,
+                "error_rate": round(t.failures / t.attempts, 3) if t.attempts else 0.0,
+                "drops": t.drops,
+                "latency_ms": round(t.latency_ms, 1) if t.latency_ms is not None else None,
+                "ejected": t.ejected(now),
+                "ejected_for_sec": round(max(0.0, t.ejected_until - now), 1),
+            }
+            for t in self.targets
+        ]
+
+
+class _WsListener:
+    """
+    Consommateur secondaire en écoute seule (transcription live, QA).
+
+    Reçoit les messages déjà encodés par la session principale via une file
+    bornée. Si le consommateur est lent, les messages les plus anciens sont
+    abandonnés : le flux principal vers l'IA n'attend jamais. L'event start
+    est gardé à part, envoyé dès la connexion : il n'est jamais abandonné.
+    """
+
+    __slots__ = ("target", "_tag", "_queue", "_task", "_closed", "_start_msg", "sent", "dropped")
+
+    def __init__(self, target: str, tag: str, maxsize: int):
+        self.target = target
+        self._tag = tag
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, maxsize))
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._start_msg = ""
+        self.sent = 0
+        self.dropped = 0
+
+    def start(self, start_msg: str):
+        self._start_msg = start_msg
+        self._task = asyncio.ensure_future(self._run())
+
+    def offer(self, msg: Optional[str]):
+        """Non-blocking enqueue — drops the oldest message when full."""
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            try:
+                self._queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+            self._queue.put_nowait(msg)
+
+    def close(self):
+        """Flush what is queued then disconnect (sentinel None)."""
+        self.offer(None)
+        self._closed = True
+
+    async def _run(self):
+        try:
+            async with _open_media_stream(self.target) as ws:
+                logger.info(f"[{self._tag}] listener connecté → {self.target}")
+                await ws.send(self._start_msg)
+                self.sent += 1
+                while True:
+                    msg = await self._queue.get()
+                    if msg is None:
+                        break
+                    await ws.send(msg)
+                    self.sent += 1
+        except Exception as e:
+            logger.warning(f"[{self._tag}] listener {self.target}: {e}")
+        finally:
+            self._closed = True
+            if self.dropped:
+                logger.info(f"[{self._tag}] listener {self.target}: {self.dropped} message(s) abandonné(s)")
+
+
 class _WsSession:
     """Bridge audio entre un appel SIP et le WebSocket (protocole Twilio Media Streams)."""
 
+    __slots__ = (
+        "bridge", "call_sid", "caller_phone", "callee_phone", "direction",
+        "custom_params", "ws_target", "_pool", "_target", "audio_cfg",
+        "audio_port", "_alive", "_tag", "_listeners", "_duration_timer",
+        "_media_timer", "_ts_ms", "_connected", "_resumable", "_outage_at",
+        "_outage_task", "_replay", "_replay_marks", "_replay_dropped", "resumes",
+        "trace", "greeting", "_greeting_cut", "_format_override", "_codec",
+    )
+
     def __init__(
         self,
         bridge: SipBridge,
@@ -809,6 +3999,8 @@ class _WsSession:
         custom_params: dict,
         ws_target: str,
         audio_cfg: AudioConfig,
+        listen_targets: Optional[list] = None,
+        media_format: str = "",
     ):
         self.bridge = bridge
         self.call_sid = call_sid
@@ -816,48 +4008,105 @@ class _WsSession:
         self.callee_phone = callee_phone
         self.direction = direction
         self.custom_params = custom_params
-        self.ws_target = ws_target
+        # Pas de cible ("") → choisie dans le pool ; wsTarget explicite → fixe
+        self.ws_target = ws_target or bridge.default_ws_target
+        self._pool = None if ws_target else bridge.ws_pool
+        self._target: Optional[_MediaTarget] = None
         self.audio_cfg = audio_cfg
         self.audio_port: Optional[Any] = None
         self._alive = True
         self._tag = call_sid[:8]
+        self._listeners = [
+            _WsListener(t, self._tag, audio_cfg.scaled_frames(bridge.config.listen_queue_frames))
+            for t in (listen_targets or [])
+        ]
+        self._duration_timer: Optional[_TimerHandle] = None
+        self._media_timer: Optional[_TimerHandle] = None
+        self._ts_ms = 0
+        # État de la connexion courante (distinct de _alive = session)
+        self._connected = False
+        self._resumable = False
+        # Reprise après coupure
+        self._outage_at: Optional[float] = None
+        self._outage_task: Optional[asyncio.Task] = None
+        self._replay: deque = deque(maxlen=max(1, audio_cfg.scaled_frames(bridge.config.ws_resume_buffer_frames)))
+        self._replay_marks: list[dict] = []
+        self._replay_dropped = 0
+        self.resumes = 0
+        self.trace: Optional[_CallTrace] = None
+        # Accueil joué avant la connexion (annoncé dans "start")
+        self.greeting: Optional[dict] = None
+        self._greeting_cut = False
+        # Format audio du WS : celui de l'appel, sinon celui de la cible
+        # (re-choisi à la première connexion si le pool en prend une autre)
+        self._format_override = _WsAudioFormat.parse(media_format) if media_format else None
+        self._codec = _WsAudioCodec(self._ws_format(), audio_cfg.clock_rate)
+
+    def _ws_format(self) -> _WsAudioFormat:
+        return self._format_override or self.bridge.ws_format_for(self.ws_target)
+
+    def _start_event(self, listen_only: bool = False) -> dict:
+        start = {
+            "streamSid": self.call_sid,
+            "accountSid": "PJSIP-LOCAL",
+            "callSid": self.call_sid,
+            "customParameters": {
+                "callerPhone": self.caller_phone,
+                "direction": self.direction.value,
+                "to": self.callee_phone,
+                **self.custom_params,
+            },
+        }
+        start["mediaFormat"] = self._codec.format.media_format()
+        if self.greeting:
+            start["greeting"] = self.greeting
+        if listen_only:
+            start["listenOnly"] = True
+        return {"event": "start", "start": start}
+
+    def set_greeting(self, clip: "_Clip", cut: bool):
+        """Accueil déjà en lecture : annoncé au serveur média, coupé par son premier audio si cut."""
+        self.greeting = {"clip": clip.name, "durationMs": clip.duration_ms, "handoff": "cut" if cut else "queue"}
+        self._greeting_cut = cut
+
+    def _media_message(self, pcm: bytes) -> str:
+        payload = self._codec.encode(pcm)
+        msg = json.dumps({
+            "event": "media",
+            "media": {"payload": base64.b64encode(payload).decode("ascii"), "timestamp": self._ts_ms},
+        })
+        self._ts_ms += self.audio_cfg.frame_ms
+        return msg
+
+    async def _send(self, ws, msg: str):
+        """Send an already-encoded message to the primary WS, then fan out."""
+        await ws.send(msg)
+        for listener in self._listeners:
+            listener.offer(msg)
 
     async def run(self, audio_port):
+        import websockets.exceptions
         self.audio_port = audio_port
         logger.info(f"[{self._tag}] WS session → {self.ws_target}")
+        self._arm_timers()
 
         try:
-            async with websockets.connect(self.ws_target) as ws:
-                # Event "start" — identique Twilio Media Streams
-                await ws.send(json.dumps({
-                    "event": "start",
-                    "start": {
-                        "streamSid": self.call_sid,
-                        "accountSid": "PJSIP-LOCAL",
-                        "callSid": self.call_sid,
-                        "customParameters": {
-                            "callerPhone": self.caller_phone,
-                            "direction": self.direction.value,
-                            "to": self.callee_phone,
-                            **self.custom_params,
-                        },
-                    },
-                }))
-
-                await asyncio.gather(
-                    self._sip_to_ws(ws),
-                    self._ws_to_sip(ws),
-                    self._watchdog(),
-                )
+            await self._stream()
 
         except websockets.exceptions.ConnectionClosedError as e:
             logger.info(f"[{self._tag}] WS fermé: {e}")
-        except ConnectionRefusedError:
+        except (ConnectionRefusedError, FileNotFoundError):
             logger.error(f"[{self._tag}] Connexion refusée: {self.ws_target}")
         except Exception as e:
             logger.error(f"[{self._tag}] Erreur session: {e}")
         finally:
             self._alive = False
+            self._cancel_timers()
+            await self._stop_outage_buffer()
+            stop_msg = json.dumps({"event": "stop"})
+            for listener in self._listeners:
+                listener.offer(stop_msg)
+                listener.close()
             # Raccrocher l'appel SIP quand la session WS se termine
             record = self.bridge.active_calls.get(self.call_sid)
             call_still_active = (
@@ -897,53 +4146,254 @@ class _WsSession:
                 logger.info(f"[{self._tag}] WS session ended — no active SIP call to hangup")
             logger.info(f"[{self._tag}] Session terminée")
 
-    async def _watchdog(self):
-        max_dur = self.bridge.config.max_call_duration
-        elapsed = 0
-        while self._alive:
-            await asyncio.sleep(1)
-            elapsed += 1
-            if max_dur > 0 and elapsed >= max_dur:
-                logger.info(f"[{self._tag}] Durée max ({max_dur}s) atteinte → fin")
-                self._alive = False
+    # ── Connexion + reprise ───────────────────────────────
+
+    async def _stream(self):
+        """
+        Connexion au serveur média puis, si elle tombe sans "stop", reprise
+        avec backoff tant que la fenêtre de grâce n'est pas écoulée. L'échec
+        de la toute première connexion termine la session (comportement inchangé).
+        """
+        import websockets.exceptions
+        backoff = 0.2
+        while True:
+            try:
+                async with self._connect() as ws:
+                    await self._on_connected(ws)
+                    backoff = 0.2
+                    await asyncio.gather(
+                        self._sip_to_ws(ws),
+                        self._ws_to_sip(ws),
+                    )
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                if self._outage_at is None:
+                    raise
+                logger.warning(f"[{self._tag}] Reprise WS échouée: {e}")
+            else:
+                if self._alive and self._resumable and self._target:
+                    self._target.drops += 1
+                if not (self._alive and self._resumable and self.bridge.config.ws_resume_grace_sec > 0):
+                    return
+                self._start_outage()
+
+            if not self._alive:
+                return
+            remaining = self._outage_at + self.bridge.config.ws_resume_grace_sec - time.monotonic()
+            if remaining <= 0:
+                logger.error(
+                    f"[{self._tag}] WS non rétabli après {self.bridge.config.ws_resume_grace_sec:g}s → fin de l'appel"
+                )
+                return
+            await asyncio.sleep(min(backoff, remaining))
+            backoff = min(backoff * 2, 2.0)
+            if not self._alive:
+                return
+
+    @asynccontextmanager
+    async def _connect(self):
+        """Connexion média : cible fixe de l'appel, ou pool avec repli sur la suivante."""
+        import websockets.exceptions
+        timeout = self.bridge.config.ws_connect_timeout_sec
+        if self._pool is None:
+            async with _open_media_stream(self.ws_target, timeout) as ws:
+                yield ws
+            return
+
+        async with AsyncExitStack() as stack:
+            ws = None
+            last_error: Optional[Exception] = None
+            prefer = self._target.url if self._target else ""
+            for target in self._pool.candidates(prefer):
+                # Compté actif dès le choix : les sessions qui démarrent en
+                # même temps voient la charge de celles en cours de connexion
+                target.active += 1
+                t0 = time.monotonic()
+                try:
+                    ws = await stack.enter_async_context(_open_media_stream(target.url, timeout))
+                except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                    target.active -= 1
+                    self._pool.record_failure(target, e)
+                    last_error = e
+                    continue
+                self._pool.record_success(target, (time.monotonic() - t0) * 1000)
+                self._target = target
                 break
+            if ws is None:
+                raise last_error or ConnectionRefusedError("aucune cible média")
+
+            if self.ws_target != target.url:
+                logger.info(f"[{self._tag}] cible média → {target.url}")
+            self.ws_target = target.url
+            record = self.bridge.active_calls.get(self.call_sid)
+            if record:
+                record.ws_target = target.url
+            try:
+                yield ws
+            finally:
+                target.active -= 1
+
+    async def _on_connected(self, ws):
+        self._connected = True
+        self._resumable = False
+        if self._outage_at is None:
+            # Cible définitive : son format vaut pour toute la session (une
+            # reprise sur une autre cible garde le format annoncé)
+            fmt = self._ws_format()
+            if fmt != self._codec.format:
+                self._codec = _WsAudioCodec(fmt, self.audio_cfg.clock_rate)
+            if self.trace is not None:
+                self.trace.record(_CallTrace.WS_FORMAT, str(fmt).encode())
+            # Event "start" — identique Twilio Media Streams
+            await ws.send(json.dumps(self._start_event()))
+            # Listeners démarrés une fois le format connu : leur start annonce
+            # l'encodage de l'audio qu'ils vont recevoir
+            if self._listeners:
+                start_msg = json.dumps(self._start_event(listen_only=True))
+                for listener in self._listeners:
+                    listener.start(start_msg)
+                logger.info(f"[{self._tag}] {len(self._listeners)} listener(s) en écoute seule")
+            return
+
+        # Reprise : start marqué "resumed", puis l'audio bufferisé pendant la coupure
+        await self._stop_outage_buffer()
+        gap_ms = round((time.monotonic() - self._outage_at) * 1000)
+        self.resumes += 1
+        start = self._start_event()
+        start["start"].update({
+            "resumed": True,
+            "resumeCount": self.resumes,
+            "gapMs": gap_ms,
+            "replayedFrames": len(self._replay),
+            "droppedFrames": self._replay_dropped,
+            "pendingMarks": self.audio_port.pending_marks() if self.audio_port else [],
+        })
+        await ws.send(json.dumps(start))
+        while self._replay:
+            await ws.send(self._replay.popleft())
+        for mark in self._replay_marks:
+            await ws.send(json.dumps({"event": "mark", "mark": mark}))
+        logger.info(
+            f"[{self._tag}] WS repris après {gap_ms}ms (reprise #{self.resumes}, "
+            f"{start['start']['replayedFrames']} frames rejouées, {self._replay_dropped} perdues)"
+        )
+        self._replay_marks.clear()
+        self._replay_dropped = 0
+        self._outage_at = None
+
+    def _start_outage(self):
+        self._outage_at = time.monotonic()
+        logger.warning(
+            f"[{self._tag}] WS perdu sans \"stop\" — appel SIP maintenu, reprise pendant "
+            f"{self.bridge.config.ws_resume_grace_sec:g}s"
+        )
+        self._outage_task = asyncio.ensure_future(self._buffer_outage())
+
+    async def _stop_outage_buffer(self):
+        task, self._outage_task = self._outage_task, None
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _buffer_outage(self):
+        """Pendant la coupure : l'audio du client va dans le buffer de reprise (borné)."""
+        poll_interval = self.audio_cfg.frame_ms / 1000.0
+        while self._alive and self.audio_port is not None:
+            pcm = self.audio_port.get_frames()
+            if pcm:
+                msg = self._media_message(pcm)
+                if len(self._replay) == self._replay.maxlen:
+                    self._replay_dropped += 1
+                self._replay.append(msg)
+                for listener in self._listeners:
+                    listener.offer(msg)
+            else:
+                await asyncio.sleep(poll_interval)
+            self._replay_marks.extend(self.audio_port.get_ready_marks())
+
+    def _arm_timers(self):
+        cfg = self.bridge.config
+        timers = self.bridge.timers
+        if cfg.max_call_duration > 0:
+            self._duration_timer = timers.schedule(cfg.max_call_duration, self._on_max_duration)
+        if cfg.media_timeout_sec > 0:
+            self._media_timer = timers.schedule(cfg.media_timeout_sec, self._check_media_activity)
+
+    def _cancel_timers(self):
+        for handle in (self._duration_timer, self._media_timer):
+            if handle:
+                handle.cancel()
+        self._duration_timer = self._media_timer = None
+
+    def _on_max_duration(self):
+        if self._alive:
+            logger.info(f"[{self._tag}] Durée max ({self.bridge.config.max_call_duration}s) atteinte → fin")
+            self._alive = False
+
+    def _check_media_activity(self):
+        """Media inactivity timer — re-armed for the remaining time while audio flows."""
+        if not self._alive or self.audio_port is None:
+            return
+        timeout = self.bridge.config.media_timeout_sec
+        idle = time.monotonic() - self.audio_port.last_rx_at
+        if idle >= timeout:
+            logger.warning(f"[{self._tag}] Aucun audio SIP depuis {idle:.0f}s → fin")
+            self._alive = False
+            return
+        self._media_timer = self.bridge.timers.schedule(timeout - idle, self._check_media_activity)
 
     async def _sip_to_ws(self, ws):
-        ts_ms = 0
-        poll_interval = self.audio_cfg.frame_ms / 1000.0  # 20ms
+        poll_interval = self.audio_cfg.frame_ms / 1000.0  # une frame (ptime)
 
         try:
-            while self._alive:
+            while self._alive and self._connected:
                 pcm = self.audio_port.get_frames()
                 if pcm and len(pcm) > 0:
-                    ulaw = pcm16_to_ulaw(pcm)
-                    payload = base64.b64encode(ulaw).decode("ascii")
-                    await ws.send(json.dumps({
-                        "event": "media",
-                        "media": {"payload": payload, "timestamp": ts_ms},
-                    }))
-                    ts_ms += self.audio_cfg.frame_ms
+                    await self._send(ws, self._media_message(pcm))
+                    if media_logger.isEnabledFor(logging.DEBUG):
+                        media_logger.debug(
+                            "[%s] sip→ws: media %d bytes ts=%d backlog=%d",
+                            self._tag, len(pcm) // 2, self._ts_ms, self.audio_port.rx_backlog(),
+                            extra={"call_sid": self.call_sid},
+                        )
                 else:
                     await asyncio.sleep(poll_interval)
 
-                # Check for marks whose audio has been fully played through SIP
-                ready_marks = self.audio_port.get_ready_marks()
-                for mark_name in ready_marks:
-                    logger.debug(f"[{self._tag}] sip→ws: mark '{mark_name}' echo (audio consumed)")
-                    await ws.send(json.dumps({
-                        "event": "mark",
-                        "mark": {"name": mark_name},
-                    }))
+                # Marks whose audio has been fully played through SIP
+                # (no lock taken until the pjsip thread flags one as due)
+                for mark in self.audio_port.get_ready_marks():
+                    logger.debug(
+                        "[%s] sip→ws: mark '%s' echo (played=%dms, buffered=%dms)",
+                        self._tag, mark["name"], mark["playedMs"], mark["bufferedMs"],
+                        extra={"call_sid": self.call_sid},
+                    )
+                    await self._send(ws, json.dumps({"event": "mark", "mark": mark}))
+                    if self.trace is not None:
+                        self.trace.mark_echo(mark)
         except Exception as e:
-            if self._alive:
+            if self._alive and self._connected:
                 logger.error(f"[{self._tag}] sip→ws: {e}")
+                # Envoi impossible : connexion perdue, reprise possible.
+                # Fermer débloque aussi _ws_to_sip.
+                self._connected = False
+                self._resumable = True
+                try:
+                    await ws.close()
+                except Exception:
+                    pass
         finally:
-            try:
-                await ws.send(json.dumps({"event": "stop"}))
-            except Exception:
-                pass
+            if self._connected:
+                # Fin de session côté bridge (raccroché, durée max...)
+                try:
+                    await ws.send(json.dumps({"event": "stop"}))
+                except Exception:
+                    pass
 
     async def _ws_to_sip(self, ws):
+        import websockets.exceptions
+        trace = self.trace
         try:
             async for raw in ws:
                 data = json.loads(raw)
@@ -952,42 +4402,88 @@ class _WsSession:
                 if event == "media":
                     payload = data.get("media", {}).get("payload", "")
                     if payload and self.audio_port:
-                        ulaw = base64.b64decode(payload)
-                        pcm = ulaw_to_pcm16(ulaw)
+                        audio = base64.b64decode(payload)
+                        pcm = self._codec.decode(audio)
+                        if trace is not None:
+                            # Trace en µ-law au clock rate du port, quel que soit le format WS
+                            if self._codec.native:
+                                trace.frame(_CallTrace.WS_MEDIA, ulaw=audio)
+                            else:
+                                trace.frame(_CallTrace.WS_MEDIA, pcm=pcm)
+                        if self._greeting_cut:
+                            # Premier audio du serveur : fin de l'accueil
+                            self._greeting_cut = False
+                            self.audio_port.clear_audio()
                         self.audio_port.feed_audio(pcm)
+                        if media_logger.isEnabledFor(logging.DEBUG):
+                            media_logger.debug(
+                                "[%s] ws→sip: media %d bytes", self._tag, len(audio),
+                                extra={"call_sid": self.call_sid},
+                            )
 
                 elif event == "clear":
-                    logger.debug(f"[{self._tag}] ws→sip: clear (barge-in)")
+                    logger.debug(
+                        "[%s] ws→sip: clear (barge-in)", self._tag,
+                        extra={"call_sid": self.call_sid},
+                    )
+                    if trace is not None:
+                        trace.record(_CallTrace.WS_CLEAR)
                     if self.audio_port:
                         self.audio_port.clear_audio()
 
                 elif event == "stop":
                     logger.info(f"[{self._tag}] ws→sip: STOP event received — will hangup SIP")
+                    if trace is not None:
+                        trace.record(_CallTrace.WS_STOP)
                     self._alive = False
                     break
 
                 elif event == "mark":
                     mark_name = data.get("mark", {}).get("name", "")
+                    if trace is not None:
+                        trace.record(_CallTrace.WS_MARK, mark_name.encode()[:1024])
                     if self.audio_port:
                         self.audio_port.queue_mark(mark_name)
                     else:
                         # No audio port — echo immediately as fallback
-                        logger.debug(f"[{self._tag}] ws→sip: mark '{mark_name}' — no audio_port, echo immediately")
-                        await ws.send(json.dumps({
+                        logger.debug(
+                            "[%s] ws→sip: mark '%s' — no audio_port, echo immediately",
+                            self._tag, mark_name, extra={"call_sid": self.call_sid},
+                        )
+                        await self._send(ws, json.dumps({
                             "event": "mark",
                             "mark": {"name": mark_name},
                         }))
 
                 else:
-                    logger.info(f"[{self._tag}] ws→sip: unknown event '{event}'")
+                    logger.info(
+                        "[%s] ws→sip: unknown event '%s'", self._tag, event,
+                        extra={"call_sid": self.call_sid},
+                    )
+                    if trace is not None:
+                        trace.record(_CallTrace.WS_OTHER, str(event).encode()[:256])
 
-        except websockets.exceptions.ConnectionClosed:
-            logger.info(f"[{self._tag}] ws→sip: WebSocket closed by server")
+            else:
+                # Fermé par le serveur sans "stop" : reprise, sauf fermeture normale (1000)
+                if self._connected:
+                    self._resumable = getattr(ws, "close_code", None) != 1000
+                    logger.info(
+                        "[%s] ws→sip: connexion fermée sans stop (code %s)", self._tag,
+                        getattr(ws, "close_code", None), extra={"call_sid": self.call_sid},
+                    )
+        except websockets.exceptions.ConnectionClosed as e:
+            logger.info(f"[{self._tag}] ws→sip: WebSocket closed by server ({e})")
+            if self._connected:
+                self._resumable = getattr(e.rcvd, "code", None) != 1000
         except Exception as e:
             if self._alive:
                 logger.error(f"[{self._tag}] ws→sip: {e}")
+            if self._connected:
+                self._resumable = True
         finally:
-            self._alive = False
+            if self._alive:
+                # Connexion perdue (sinon fin de session : _sip_to_ws envoie le stop)
+                self._connected = False
 
     def stop(self):
         self._alive = False
@@ -1008,13 +4504,36 @@ if HAS_PJSIP:
             super().__init__()
             self.call_sid = call_sid
             self.audio_cfg = audio_cfg
-            self._rx_queue: queue.Queue[bytes] = queue.Queue()
-            self._tx_buffer = b""
+            # Bornée : si la session WS ne suit plus, les frames les plus
+            # anciennes sont perdues (append/popleft sont thread-safe)
+            self._rx_queue: deque[bytes] = deque(maxlen=max(1, audio_cfg.scaled_frames(audio_cfg.rx_queue_frames)))
+            self.rx_dropped = 0
+            # Modifié sur place (extend / del en tête) au lieu d'une copie
+            # du buffer entier à chaque frame
+            self._tx_buffer = bytearray()
+            # Clips joués avant _tx_buffer : [vue sur le mmap, position], lus
+            # sur place — pas de copie du clip par appel
+            self._tx_segments: deque[list] = deque()
+            self._tx_segment_bytes = 0
+            self._silence = bytes(audio_cfg.bytes_per_frame)
             self._tx_lock = threading.Lock()
             # Deferred mark echo — track how much audio has been fed vs consumed
             self._tx_total_fed: int = 0       # bytes appended via feed_audio()
             self._tx_total_consumed: int = 0  # bytes sent to SIP via onFrameRequested()
-            self._pending_marks: list[tuple[str, int]] = []  # (mark_name, trigger_at_byte)
+            # Ticks consécutifs avec moins d'une frame en attente
+            self._tx_short_ticks = 0
+            # (mark_name, trigger_at_byte) — trigger croissant, libérées dans l'ordre
+            self._pending_marks: deque[tuple[str, int]] = deque()
+            # Levé par le thread pjsip quand la mark de tête est jouée : le
+            # côté WS ne prend le verrou que lorsqu'une mark est due
+            self.marks_due = threading.Event()
+            # Last audio frame from SIP — read by the media inactivity timer
+            self.last_rx_at: float = time.monotonic()
+            # DSP par sens — None si aucun étage actif (chemin inchangé)
+            self._rx_dsp = _DspChain.for_direction("rx", audio_cfg)
+            self._tx_dsp = _DspChain.for_direction("tx", audio_cfg)
+            # Trace de l'appel (trace_dir) — frames reçues, avant DSP
+            self.trace: Optional[_CallTrace] = None
 
         # NO __del__ — calling pjsip methods from a destructor is unsafe:
         # 1. If triggered during a pjsip audio callback → reentrant mutex → SIGSEGV
@@ -1027,18 +4546,49 @@ if HAS_PJSIP:
             """Called by PJSIP when audio arrives from remote party."""
             if frame.type == pj.PJMEDIA_FRAME_TYPE_AUDIO and frame.size > 0:
                 pcm = bytes(frame.buf[:frame.size])
-                self._rx_queue.put(pcm)
+                if self.trace is not None:
+                    self.trace.frame(_CallTrace.SIP_FRAME, pcm=pcm)
+                if self._rx_dsp is not None:
+                    pcm = self._rx_dsp.process(pcm)
+                rx = self._rx_queue
+                if len(rx) == rx.maxlen:
+                    self.rx_dropped += 1
+                rx.append(pcm)
+                self.last_rx_at = time.monotonic()
 
         def onFrameRequested(self, frame):
             """Called by PJSIP when it needs audio to send to remote party."""
             needed = self.audio_cfg.bytes_per_frame
             with self._tx_lock:
-                if len(self._tx_buffer) >= needed:
-                    chunk = self._tx_buffer[:needed]
-                    self._tx_buffer = self._tx_buffer[needed:]
+                tx = self._tx_buffer
+                available = len(tx) + self._tx_segment_bytes
+                marks = self._pending_marks
+                if available >= needed:
+                    if self._tx_segments:
+                        chunk = self._take(needed)
+                    else:
+                        chunk = tx[:needed]
+                        del tx[:needed]
+                    self._tx_short_ticks = 0
                     self._tx_total_consumed += needed
+                    if marks and marks[0][1] <= self._tx_total_consumed:
+                        self.marks_due.set()
+                elif available and (
+                    (marks and marks[-1][1] == self._tx_total_fed) or self._tx_short_ticks
+                ):
+                    # Reste d'une frame incomplète joué complété de silence
+                    # seulement en fin de segment connue (mark posée juste
+                    # après) ou s'il n'a pas été complété en un tick ;
+                    # sinon on attend la suite (coussin d'une frame)
+                    chunk = self._take(available) + self._silence[available:]
+                    self._tx_short_ticks = 0
+                    self._tx_total_consumed += available
+                    if marks and marks[0][1] <= self._tx_total_consumed:
+                        self.marks_due.set()
                 else:
-                    chunk = b"\x00" * needed
+                    if available:
+                        self._tx_short_ticks += 1
+                    chunk = self._silence
 
             frame.buf.resize(len(chunk))
             for i, b in enumerate(chunk):
@@ -1046,48 +4596,145 @@ if HAS_PJSIP:
             frame.size = len(chunk)
             frame.type = pj.PJMEDIA_FRAME_TYPE_AUDIO
 
+        def _take(self, n: int) -> bytes:
+            """n octets en tête de lecture : clips puis _tx_buffer (sous _tx_lock)."""
+            parts = []
+            segments = self._tx_segments
+            while n and segments:
+                entry = segments[0]
+                view, pos = entry
+                piece = view[pos:pos + n]
+                parts.append(piece)
+                n -= len(piece)
+                self._tx_segment_bytes -= len(piece)
+                if pos + len(piece) >= len(view):
+                    segments.popleft()
+                else:
+                    entry[1] = pos + len(piece)
+            if n:
+                tx = self._tx_buffer
+                parts.append(tx[:n])
+                del tx[:n]
+            return b"".join(parts)
+
+        def _tx_pending(self) -> int:
+            return self._tx_segment_bytes + len(self._tx_buffer)
+
+        def dsp_stats(self) -> dict:
+            return {
+                direction: chain.stats()
+                for direction, chain in (("rx", self._rx_dsp), ("tx", self._tx_dsp))
+                if chain is not None
+            }
+
+        def rx_backlog(self) -> int:
+            """Frames received from SIP not yet consumed by the WS session."""
+            return len(self._rx_queue)
+
         def get_frames(self) -> Optional[bytes]:
             """Non-blocking read of captured audio (SIP → us)."""
             try:
-                return self._rx_queue.get_nowait()
-            except queue.Empty:
+                return self._rx_queue.popleft()
+            except IndexError:
                 return None
 
         def feed_audio(self, pcm: bytes):
             """Push audio for playback (us → SIP)."""
+            if self._tx_dsp is not None:
+                pcm = self._tx_dsp.process(pcm)
             with self._tx_lock:
                 self._tx_buffer += pcm
                 self._tx_total_fed += len(pcm)
 
+        def play_clip(self, pcm) -> int:
+            """
+            Queue a pre-rendered clip (memoryview on the mmap) after the queued
+            audio, read in place by onFrameRequested — no tx DSP, clips are
+            already mastered. Returns the buffered byte count.
+            """
+            with self._tx_lock:
+                tx = self._tx_buffer
+                if tx:
+                    # Audio IA déjà en attente : il passe avant le clip
+                    self._tx_segments.append([bytes(tx), 0])
+                    self._tx_segment_bytes += len(tx)
+                    tx.clear()
+                self._tx_segments.append([pcm, 0])
+                self._tx_segment_bytes += len(pcm)
+                self._tx_total_fed += len(pcm)
+                return self._tx_pending()
+
         def clear_audio(self):
             """Clear playback buffer (barge-in). Also discards pending marks."""
             with self._tx_lock:
-                self._tx_buffer = b""
+                # L'audio vidé ne sera jamais joué : les marks suivantes se
+                # calent sur la position de lecture réelle
+                self._tx_total_fed -= self._tx_pending()
+                self._tx_buffer.clear()
+                self._tx_segments.clear()
+                self._tx_segment_bytes = 0
+                self._tx_short_ticks = 0
                 self._pending_marks.clear()
+                self.marks_due.clear()
 
         def queue_mark(self, mark_name: str):
             """Queue a mark to be echoed when all preceding audio has been played."""
             with self._tx_lock:
                 trigger_at = self._tx_total_fed
                 self._pending_marks.append((mark_name, trigger_at))
+                if trigger_at <= self._tx_total_consumed:
+                    self.marks_due.set()   # rien à jouer avant : écho immédiat
                 logger.debug(
-                    f"[{self.call_sid[:8]}] mark '{mark_name}' queued at byte {trigger_at} "
-                    f"(consumed={self._tx_total_consumed}, buffered={len(self._tx_buffer)})"
+                    "[%s] mark '%s' queued at byte %d (consumed=%d, buffered=%d)",
+                    self.call_sid[:8], mark_name, trigger_at,
+                    self._tx_total_consumed, self._tx_pending(),
+                    extra={"call_sid": self.call_sid},
                 )
 
-        def get_ready_marks(self) -> list[str]:
-            """Return marks whose audio has been fully consumed by SIP."""
+        def pending_marks(self) -> list[str]:
+            """Marks queued but whose audio has not been played yet."""
+            with self._tx_lock:
+                return [name for name, _ in self._pending_marks]
+
+        def get_ready_marks(self) -> list[dict]:
+            """
+            Return marks whose audio has been fully consumed by SIP, in order,
+            with the playout position: playedMs = audio played up to the mark,
+            bufferedMs = audio still queued behind it.
+            """
+            if not self.marks_due.is_set():
+                return []
             ready = []
+            to_ms = self.audio_cfg.bytes_to_ms
             with self._tx_lock:
-                remaining = []
-                for name, trigger_at in self._pending_marks:
-                    if self._tx_total_consumed >= trigger_at:
-                        ready.append(name)
-                    else:
-                        remaining.append((name, trigger_at))
-                self._pending_marks = remaining
+                self.marks_due.clear()
+                consumed = self._tx_total_consumed
+                buffered_ms = to_ms(self._tx_pending())
+                marks = self._pending_marks
+                while marks and marks[0][1] <= consumed:
+                    name, trigger_at = marks.popleft()
+                    ready.append({"name": name, "playedMs": to_ms(trigger_at), "bufferedMs": buffered_ms})
             return ready
 
+        def playout(self) -> dict:
+            """Position de lecture vers le client — GET /api/calls/{sid}/media."""
+            to_ms = self.audio_cfg.bytes_to_ms
+            with self._tx_lock:
+                consumed = self._tx_total_consumed
+                buffered = self._tx_pending()
+                marks = list(self._pending_marks)
+            return {
+                "playedMs": to_ms(consumed),
+                "bufferedMs": to_ms(buffered),
+                "pendingMarks": [
+                    {"name": name, "atMs": to_ms(trigger_at), "inMs": to_ms(trigger_at - consumed)}
+                    for name, trigger_at in marks
+                ],
+                "rxBacklogFrames": self.rx_backlog(),
+                "rxDroppedFrames": self.rx_dropped,
+                "lastRxAgoMs": round((time.monotonic() - self.last_rx_at) * 1000),
+            }
+
 
     class _SipCallHandler(pj.Call):
 
@@ -1096,23 +4743,44 @@ if HAS_PJSIP:
                      custom_params: dict = None,
                      ws_target: str = "",
                      callback_url: str = "", to_number: str = "",
+                     listen_targets: Optional[list] = None,
+                     media_format: str = "",
                      call_id=pj.PJSUA_INVALID_ID):
             super().__init__(account, call_id)
             self.bridge = bridge
             self.call_sid = str(uuid.uuid4())
             self.direction = direction
             self.custom_params = custom_params or dict(bridge.config.custom_params)
-            self.ws_target = ws_target or bridge.config.ws_target
+            self.ws_target = ws_target      # "" = pool de cibles média
             self.callback_url = callback_url
             self.to_number = to_number
+            self.listen_targets = (
+                list(listen_targets) if listen_targets is not None
+                else list(bridge.config.listen_targets)
+            )
+            self.media_format = media_format
             self.audio_port: Optional[_AudioPort] = None
             self.session: Optional[_WsSession] = None
             self._task: Optional[asyncio.Task] = None
             self._connected = False
+            self.ring_timed_out = False
+            # Ouverte au premier changement d'état (onCallState) : un appel
+            # qui n'aboutit jamais ne laisse pas de trace tronquée
+            self.trace: Optional[_CallTrace] = None
+            self._greeted = False
+            self.ptime_ms: Optional[int] = None
+            # Stream audio actif (stats RTP) — None hors média
+            self.media_idx: Optional[int] = None
+            self.codec = ""
 
         def onCallState(self, prm):
             ci = self.getInfo()
             logger.info(f"[{self.call_sid[:8]}] Call state: {ci.stateText} (SIP {ci.lastStatusCode})")
+            if self.trace is None and ci.state != pj.PJSIP_INV_STATE_DISCONNECTED:
+                self.trace = _CallTrace.open(self.bridge.config, self.call_sid, self.direction)
+                if self.trace is not None:
+                    # Pas d'I/O sur le thread pjsip : fichier créé dans l'executor
+                    self.bridge.loop.call_soon_threadsafe(self.bridge.trace_io, self.trace.create)
 
             status_map = {
                 pj.PJSIP_INV_STATE_CALLING: CallStatus.INITIATED,
@@ -1139,12 +4807,17 @@ if HAS_PJSIP:
                 sip_code = ci.lastStatusCode
                 if sip_code == 486 or sip_code == 600:
                     final_status = CallStatus.BUSY
-                elif sip_code == 408 or sip_code == 480:
+                elif sip_code == 408 or sip_code == 480 or self.ring_timed_out:
                     final_status = CallStatus.NO_ANSWER
                 elif sip_code >= 400:
                     final_status = CallStatus.FAILED
 
                 if record:
+                    # Relevé final avant le callback completed (le stream peut
+                    # déjà être détruit : on garde alors le dernier relevé)
+                    self.bridge.rtp_stats.collect(self, record)
+                    self.bridge.rtp_stats.call_ended(record)
+                    self.media_idx = None
                     now = datetime.now(timezone.utc)
                     record.status = final_status
                     record.ended_at = now.isoformat()
@@ -1157,9 +4830,12 @@ if HAS_PJSIP:
                         )
                     )
                     self.bridge.loop.call_soon_threadsafe(
-                        lambda sid=self.call_sid: asyncio.get_event_loop().call_later(
-                            30, lambda: self.bridge.active_calls.pop(sid, None)
-                        )
+                        self.bridge.dialer.on_call_ended, self.call_sid, final_status
+                    )
+                    self.bridge.loop.call_soon_threadsafe(
+                        self.bridge.timers.schedule,
+                        self.bridge.config.record_ttl_sec,
+                        self.bridge._evict_record, self.call_sid,
                     )
 
                 # Drop all references to AudioPort so Python's destructor runs.
@@ -1186,10 +4862,16 @@ if HAS_PJSIP:
                 if self._task and not self._task.done():
                     self.bridge.loop.call_soon_threadsafe(self._task.cancel)
 
+                if self.trace is not None:
+                    self.trace.record(_CallTrace.STATE, final_status.value.encode())
+                    self.bridge.loop.call_soon_threadsafe(self.bridge.trace_io, self.trace.close)
+
             elif ci.state in status_map and record:
                 new_status = status_map[ci.state]
                 if record.status != new_status:
                     record.status = new_status
+                    if self.trace is not None:
+                        self.trace.record(_CallTrace.STATE, new_status.value.encode())
                     if new_status in (CallStatus.ANSWERED, CallStatus.ACTIVE):
                         record.answered_at = datetime.now(timezone.utc).isoformat()
                     self.bridge.loop.call_soon_threadsafe(
@@ -1209,6 +4891,9 @@ if HAS_PJSIP:
 
                     audio_cfg = self.bridge.config.audio
                     self.audio_port = _AudioPort(self.call_sid, audio_cfg)
+                    if self.trace is not None:
+                        self.audio_port.trace = self.trace
+                        self.trace.record(_CallTrace.MEDIA_START)
 
                     fmt = pj.MediaFormatAudio()
                     fmt.type = pj.PJMEDIA_TYPE_AUDIO
@@ -1224,7 +4909,30 @@ if HAS_PJSIP:
 
                     caller = self._parse_caller(ci.remoteUri)
                     callee = self._parse_caller(ci.localUri)
-                    logger.info(f"[{self.call_sid[:8]}] Audio actif — {caller} → {callee}")
+                    self.media_idx = idx
+                    self._read_stream_info(idx)
+                    logger.info(f"[{self.call_sid[:8]}] Audio actif — {caller} → {callee} (ptime {self.ptime_ms or '?'}ms)")
+                    if self.ptime_ms and self.ptime_ms != audio_cfg.frame_ms:
+                        logger.warning(
+                            f"[{self.call_sid[:8]}] ptime du trunk {self.ptime_ms}ms ≠ frame du port "
+                            f"{audio_cfg.frame_ms}ms — pjmedia re-découpe les paquets"
+                        )
+
+                    # Accueil pré-rendu : le client l'entend pendant que le WS se
+                    # connecte (une fois par appel, pas à chaque re-INVITE)
+                    greeting = None
+                    clips = self.bridge.clips
+                    if not self._greeted and clips.root and self.bridge.config.greeting_clip:
+                        self._greeted = True
+                        # Thread pjsip : clip préchargé, pas d'I/O ; revalidé
+                        # ensuite dans l'executor pour les appels suivants
+                        greeting = clips.cached(self.bridge.config.greeting_clip, self.custom_params)
+                        self.bridge.loop.call_soon_threadsafe(
+                            clips.refresh, self.bridge.config.greeting_clip, dict(self.custom_params),
+                        )
+                        if greeting is not None:
+                            self.audio_port.play_clip(greeting.data)
+                            logger.info(f"[{self.call_sid[:8]}] Accueil '{greeting.name}' ({greeting.duration_ms}ms)")
 
                     self.session = _WsSession(
                         bridge=self.bridge,
@@ -1235,7 +4943,12 @@ if HAS_PJSIP:
                         custom_params=self.custom_params,
                         ws_target=self.ws_target,
                         audio_cfg=audio_cfg,
+                        listen_targets=self.listen_targets,
+                        media_format=self.media_format,
                     )
+                    self.session.trace = self.trace
+                    if greeting is not None:
+                        self.session.set_greeting(greeting, self.bridge.config.greeting_handoff == "cut")
                     self.bridge.loop.call_soon_threadsafe(self._start_session)
                     break
 
@@ -1250,6 +4963,23 @@ if HAS_PJSIP:
 
             self._task.add_done_callback(on_done)
 
+        def _read_stream_info(self, idx: int):
+            """Codec et ptime d'envoi retenus après la négociation SDP (a=ptime du trunk)."""
+            try:
+                info = self.getStreamInfo(idx)
+                self.codec = f"{info.codecName}/{info.codecClockRate}"
+                param = info.codecParam
+                self.ptime_ms = param.info.frameLen * param.setting.frmPerPkt
+            except Exception:
+                self.ptime_ms = None
+
+        def onStreamDestroyed(self, prm):
+            # Dernière occasion de lire les stats de ce stream (fin d'appel ou re-INVITE)
+            record = self.bridge.active_calls.get(self.call_sid)
+            if record is not None and prm.streamIdx == self.media_idx:
+                self.bridge.rtp_stats.collect(self, record)
+                self.media_idx = None
+
         @staticmethod
         def _parse_caller(sip_uri: str) -> str:
             try:
@@ -1263,9 +4993,10 @@ if HAS_PJSIP:
 
     class _SipAccountHandler(pj.Account):
 
-        def __init__(self, bridge: SipBridge):
+        def __init__(self, bridge: SipBridge, registrar: _Registrar):
             super().__init__()
             self.bridge = bridge
+            self.registrar = registrar
 
         def onIncomingCall(self, prm):
             call = _SipCallHandler(self.bridge, self, CallDirection.INBOUND, call_id=prm.callId)
@@ -1274,10 +5005,14 @@ if HAS_PJSIP:
             callee = _SipCallHandler._parse_caller(ci.localUri)
             logger.info(f"Appel entrant: {caller} → {callee}")
 
-            active_count = sum(
-                1 for r in self.bridge.active_calls.values()
-                if r.status in (CallStatus.ACTIVE, CallStatus.ANSWERED, CallStatus.RINGING)
-            )
+            if self.bridge.draining:
+                logger.warning("Drain en cours → rejeter (503)")
+                reject = pj.CallOpParam()
+                reject.statusCode = 503
+                call.hangup(reject)
+                return
+
+            active_count = self.bridge.active_call_count()
             if self.bridge.config.max_concurrent_calls > 0 and active_count >= self.bridge.config.max_concurrent_calls:
                 logger.warning(f"Max appels atteint ({active_count}) → rejeter")
                 reject = pj.CallOpParam()
@@ -1285,6 +5020,16 @@ if HAS_PJSIP:
                 call.hangup(reject)
                 return
 
+            if self.bridge.admission.admit(CallDirection.INBOUND):
+                reject = pj.CallOpParam()
+                reject.statusCode = 503
+                retry_after = pj.SipHeader()
+                retry_after.hName = "Retry-After"
+                retry_after.hValue = str(self.bridge.config.admission.retry_after_sec)
+                reject.txOption.headers.append(retry_after)
+                call.hangup(reject)
+                return
+
             record = CallRecord(
                 sid=call.call_sid,
                 direction=CallDirection.INBOUND,
@@ -1293,8 +5038,9 @@ if HAS_PJSIP:
                 status=CallStatus.RINGING,
                 custom_params=dict(self.bridge.config.custom_params),
                 created_at=datetime.now(timezone.utc).isoformat(),
-                ws_target=self.bridge.config.ws_target,
+                ws_target=self.bridge.default_ws_target,
                 callback_url="",
+                listen_targets=list(call.listen_targets),
                 _call_ref=call,
             )
             self.bridge.active_calls[call.call_sid] = record
@@ -1330,6 +5076,15 @@ if HAS_PJSIP:
                 if decision.get("callbackUrl"):
                     call.callback_url = decision["callbackUrl"]
                     record.callback_url = decision["callbackUrl"]
+                if isinstance(decision.get("listenTargets"), list):
+                    call.listen_targets = list(decision["listenTargets"])
+                    record.listen_targets = list(decision["listenTargets"])
+                if decision.get("mediaFormat"):
+                    try:
+                        _WsAudioCodec(_WsAudioFormat.parse(decision["mediaFormat"]), bridge.config.audio.clock_rate)
+                        call.media_format = decision["mediaFormat"]
+                    except (ValueError, RuntimeError) as e:
+                        logger.warning(f"[{call.call_sid[:8]}] mediaFormat du callback ignoré: {e}")
 
                 await bridge.fire_callback(record, "ringing")
 
@@ -1344,17 +5099,24 @@ if HAS_PJSIP:
 
         def onRegState(self, prm):
             ai = self.getInfo()
+            registrars = self.bridge.registrars
+            reg = self.registrar
             was_registered = self.bridge._sip_registered
-            # Cache registration state for thread-safe access from /health
-            self.bridge._sip_registered = bool(ai.regIsActive)
+            was_up = reg.registered
+            registrars.update(reg, bool(ai.regIsActive), ai.regStatus, ai.regStatusText)
             if ai.regIsActive:
-                logger.info(f"SIP REGISTERED — {ai.uri} (code {ai.regStatus}, expires {ai.regExpiresSec}s)")
+                self.bridge._mark_ready("registered")
+                if not (was_up and registrars.multi):
+                    logger.info(
+                        f"SIP REGISTERED — {ai.uri} via {reg.uri} (code {ai.regStatus}, "
+                        f"expires {ai.regExpiresSec}s, {reg.latency_ms or 0:.0f}ms)"
+                    )
             elif ai.regStatus // 100 == 2:
-                self.bridge._sip_registered = False
-                logger.info(f"SIP UNREGISTERED — {ai.uri} (code {ai.regStatus})")
+                logger.info(f"SIP UNREGISTERED — {ai.uri} via {reg.uri} (code {ai.regStatus})")
             else:
-                self.bridge._sip_registered = False
-                logger.error(f"SIP REGISTRATION FAILED — {ai.uri} (code {ai.regStatus}: {ai.regStatusText})")
-            # Alerte si on perd la registration (on était enregistré, on ne l'est plus)
-            if was_registered and not self.bridge._sip_registered:
-                logger.error(f"[ALERTE] Registration SIP PERDUE — les appels entrants ne seront plus recus ! (code {ai.regStatus}: {ai.regStatusText})")
+                logger.error(f"SIP REGISTRATION FAILED — {ai.uri} via {reg.uri} (code {ai.regStatus}: {ai.regStatusText})")
+            event = registrars.changed(reg, was_registered, was_up, ai.uri, ai.regStatus,
+                                       ai.regStatusText, ai.regExpiresSec)
+            if ai.regIsActive and was_up and registrars.multi:
+                return   # rafraîchissement de sonde : pas d'event
+            self.bridge.loop.call_soon_threadsafe(self.bridge.events.publish, "registration", event)
@@ -42,6 +42,7 @@ STUN_SERVER="${STUN_SERVER:-}"
 TURN_SERVER="${TURN_SERVER:-}"
 TURN_USERNAME="${TURN_USERNAME:-}"
 TURN_PASSWORD="${TURN_PASSWORD:-}"
+SIP_REGISTRARS="${SIP_REGISTRARS:-}"
 
 WS_TARGET="${WS_TARGET:-ws://localhost:5050/media-stream}"
 BRIDGE_API_PORT="${BRIDGE_API_PORT:-5060}"
@@ -53,6 +54,15 @@ INCOMING_CALLBACK_URL="${INCOMING_CALLBACK_URL:-}"
 MAX_CALL_DURATION="${MAX_CALL_DURATION:-600}"
 MAX_CONCURRENT_CALLS="${MAX_CONCURRENT_CALLS:-10}"
 
+# Passé par l'environnement, pas en argument : ni dans ps, ni dans le log ci-dessous
+export DEBUG_TOKEN="${DEBUG_TOKEN:-}"
+CLUSTER_DB="${CLUSTER_DB:-}"
+NODE_URL="${NODE_URL:-}"
+TRACE_DIR="${TRACE_DIR:-}"
+CLIPS_DIR="${CLIPS_DIR:-}"
+PTIME="${PTIME:-}"
+WS_AUDIO_FORMAT="${WS_AUDIO_FORMAT:-}"
+
 # ── Construction de la commande ────────────────────────────
 
 CMD=(
@@ -75,6 +85,15 @@ CMD=(
 [ -n "$TURN_PASSWORD" ]         && CMD+=(--turn-password "$TURN_PASSWORD")
 [ -n "$STATUS_CALLBACK_URL" ]   && CMD+=(--status-callback-url "$STATUS_CALLBACK_URL")
 [ -n "$INCOMING_CALLBACK_URL" ] && CMD+=(--incoming-callback-url "$INCOMING_CALLBACK_URL")
+[ -n "$CLUSTER_DB" ]            && CMD+=(--cluster-db "$CLUSTER_DB")
+[ -n "$NODE_URL" ]              && CMD+=(--node-url "$NODE_URL")
+[ -n "$TRACE_DIR" ]             && CMD+=(--trace-dir "$TRACE_DIR")
+[ -n "$PTIME" ]                 && CMD+=(--ptime "$PTIME")
+[ -n "$WS_AUDIO_FORMAT" ]       && CMD+=(--ws-audio-format "$WS_AUDIO_FORMAT")
+[ -n "$CLIPS_DIR" ]             && CMD+=(--clips-dir "$CLIPS_DIR" --clips-key restaurantId)
+for registrar in $SIP_REGISTRARS; do
+    CMD+=(--sip-registrar "$registrar")
+done
 
 echo "▶ ${CMD[*]}"
 exec "${CMD[@]}"